@@ -0,0 +1,147 @@
+"""
+Background agent calls for the Streamlit frontends.
+
+The agent HTTP call can take minutes; running it inside the Streamlit script
+thread freezes the page for that user. AgentCallWorker runs calls on a shared
+thread pool with a pooled HTTP session and publishes progress into an
+AgentJob that the script polls on each rerun.
+
+One worker is shared by all sessions of a Streamlit server (create it through
+st.cache_resource); jobs are addressed by id and kept in st.session_state.
+Finished jobs nobody collected (the browser tab was closed) are evicted after
+AGENT_JOB_TTL seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cassette import install_cassette
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+AGENT_WORKER_THREADS = int(os.getenv("AGENT_WORKER_THREADS", "16"))
+AGENT_REQUEST_TIMEOUT = float(os.getenv("AGENT_REQUEST_TIMEOUT", "900"))
+AGENT_JOB_TTL = float(os.getenv("AGENT_JOB_TTL", "3600"))
+
+# Agent display names used by the sidebar, mapped to their server URL variables
+AGENT_URL_ENV = {
+    "Supervisor Agent": "SUPERVISOR_AGENT_SERVER_URL",
+    "JIRA Agent": "JIRA_AGENT_SERVER_URL",
+    "Postman Agent": "POSTMAN_AGENT_SERVER_URL",
+    "GitHub Agent": "GITHUB_AGENT_SERVER_URL",
+}
+
+
+def agent_query_url(agent_name: str) -> Optional[str]:
+    """Return the /query URL for an agent, or None when it is not configured."""
+    base = os.getenv(AGENT_URL_ENV.get(agent_name, ""), "")
+    if not base:
+        return None
+    base = base.rstrip("/")
+    return base if base.endswith("/query") else f"{base}/query"
+
+
+class AgentJob:
+    """State of one background agent call, updated by the worker thread."""
+
+    def __init__(self, agent_name: str, query: str, session_id: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.agent_name = agent_name
+        self.query = query
+        self.session_id = session_id
+        self.status = "queued"
+        self.progress = "Queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    @property
+    def elapsed(self) -> float:
+        start = self.started_at or self.created_at
+        return (self.finished_at or time.time()) - start
+
+
+class AgentCallWorker:
+    """Thread pool that performs agent HTTP calls off the Streamlit script thread."""
+
+    def __init__(self, max_workers: int = AGENT_WORKER_THREADS, job_ttl: float = AGENT_JOB_TTL):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-call")
+        self._jobs: Dict[str, AgentJob] = {}
+        self.job_ttl = job_ttl
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        install_cassette(self.session, pool_connections=8, pool_maxsize=max_workers)
+
+    def submit(self, agent_name: str, url: str, query: str, session_id: Optional[str] = None) -> AgentJob:
+        job = AgentJob(agent_name, query, session_id)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, url)
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[AgentJob]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def _evict_expired(self) -> None:
+        # Called with the lock held; running jobs are never evicted
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            logger.info(f"Evicted {len(expired)} uncollected agent jobs")
+
+    def pop(self, job_id: str) -> Optional[AgentJob]:
+        """Remove a finished job once its result has been stored in the chat."""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def _run(self, job: AgentJob, url: str) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.progress = f"{job.agent_name} is working..."
+        try:
+            response = self.session.post(
+                url,
+                json={"query": job.query, "session_id": job.session_id},
+                timeout=AGENT_REQUEST_TIMEOUT,
+            )
+            job.progress = "Formatting response..."
+            response.raise_for_status()
+            # Large results parse several times faster with orjson
+            payload = orjson.loads(response.content) if orjson is not None else response.json()
+            job.result = payload.get("result", payload) if isinstance(payload, dict) else payload
+            job.status = "succeeded"
+            job.progress = f"Completed in {job.elapsed:.1f}s"
+        except Exception as e:
+            logger.error(f"Agent call to {job.agent_name} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+            job.progress = "Failed"
+        finally:
+            job.finished_at = time.time()
@@ -0,0 +1,329 @@
+"""
+Deterministic assertion engine for API test responses.
+
+Generated test cases carry declarative assertions that are compiled once and
+evaluated locally against each response, so the LLM is only needed to
+explain failures instead of reading every raw response.
+
+Assertion format (list under a case's "assertions" key):
+    {"path": "$status", "op": "in", "value": [200, 201]}
+    {"path": "$.data[].id", "op": "exists"}
+    {"path": "data[*].overrideSortOrder", "op": "type", "value": "string"}
+    {"path": "data[0].exceptionId", "op": "eq", "value": "28"}
+    {"path": "$headers.Content-Type", "op": "matches", "value": "json"}
+    {"path": "$elapsed_ms", "op": "lt", "value": 2000}
+    {"schema": {"type": "object", "required": ["data"], ...}}
+
+Paths starting with $status, $headers or $elapsed_ms address the response
+metadata; anything else addresses the parsed JSON body. "[]" and "[*]" fan
+out over list items; by default every matched value must satisfy the
+operator ("quantifier": "any" relaxes that to at least one).
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_PATH_TOKEN = re.compile(r"\[(\*|\d*)\]|([^.\[\]]+)")
+_MISSING = object()
+
+_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+class AssertionSpecError(ValueError):
+    """Raised when an assertion cannot be compiled."""
+
+
+# -- paths -----------------------------------------------------------------
+
+def compile_path(path: str) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Compile a path into (root, steps).
+
+    Steps are dict keys (str), list indexes (int) or None for a fan-out.
+    """
+    text = path.strip()
+    root = "body"
+    for meta in ("$status", "$headers", "$elapsed_ms"):
+        if text == meta or text.startswith(meta + "."):
+            root = meta[1:]
+            text = text[len(meta):]
+            break
+    else:
+        if text.startswith("$"):
+            text = text[1:]
+    steps: List[Any] = []
+    for index, key in _PATH_TOKEN.findall(text.lstrip(".")):
+        if key:
+            steps.append(key)
+        elif index in ("", "*"):
+            steps.append(None)
+        else:
+            steps.append(int(index))
+    return root, tuple(steps)
+
+
+def resolve(steps: Tuple[Any, ...], data: Any) -> List[Any]:
+    """Return every value a compiled path matches (empty when nothing matches)."""
+    values = [data]
+    for step in steps:
+        next_values = []
+        for value in values:
+            if step is None:
+                if isinstance(value, list):
+                    next_values.extend(value)
+            elif isinstance(step, int):
+                if isinstance(value, list) and -len(value) <= step < len(value):
+                    next_values.append(value[step])
+            elif isinstance(value, dict):
+                found = value.get(step, _MISSING)
+                if found is _MISSING and step not in value:
+                    # Header names are case-insensitive
+                    found = next((v for k, v in value.items() if k.lower() == step.lower()), _MISSING)
+                if found is not _MISSING:
+                    next_values.append(found)
+            elif isinstance(value, list) and step.isdigit() and int(step) < len(value):
+                next_values.append(value[int(step)])
+        values = next_values
+    return values
+
+
+# -- JSON schema subset ----------------------------------------------------
+
+def compile_schema(schema: Dict[str, Any], where: str = "$") -> Callable[[Any], List[str]]:
+    """
+    Compile a JSON schema subset into a validator returning error messages.
+
+    Supports type, enum, const, required, properties, additionalProperties
+    (false), items, minItems/maxItems, minLength/maxLength, pattern and
+    minimum/maximum.
+    """
+    checks: List[Callable[[Any, str], List[str]]] = []
+
+    expected_type = schema.get("type")
+    if expected_type is not None:
+        names = expected_type if isinstance(expected_type, list) else [expected_type]
+        unknown = [n for n in names if n not in _TYPES]
+        if unknown:
+            raise AssertionSpecError(f"Unknown schema type {unknown} at {where}")
+        type_checks = [_TYPES[n] for n in names]
+        checks.append(lambda v, at: [] if any(t(v) for t in type_checks)
+                      else [f"{at}: expected type {expected_type}, got {type(v).__name__}"])
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+        if not isinstance(allowed, list):
+            raise AssertionSpecError(f"Schema enum at {where} must be a list")
+        checks.append(lambda v, at: [] if v in allowed else [f"{at}: {v!r} not in enum {allowed}"])
+    if "const" in schema:
+        const = schema["const"]
+        checks.append(lambda v, at: [] if v == const else [f"{at}: expected {const!r}, got {v!r}"])
+
+    for key, op, label in (("minimum", lambda v, b: v >= b, ">="), ("maximum", lambda v, b: v <= b, "<=")):
+        if key in schema:
+            bound = schema[key]
+            checks.append(lambda v, at, b=bound, op=op, label=label: [] if not _TYPES["number"](v) or op(v, b)
+                          else [f"{at}: {v} is not {label} {b}"])
+
+    for key, op in (("minLength", lambda n, b: n >= b), ("maxLength", lambda n, b: n <= b)):
+        if key in schema:
+            bound = schema[key]
+            checks.append(lambda v, at, b=bound, op=op, key=key: [] if not isinstance(v, str) or op(len(v), b)
+                          else [f"{at}: length {len(v)} violates {key} {b}"])
+
+    if "pattern" in schema:
+        pattern = _compile_pattern(schema["pattern"], where)
+        checks.append(lambda v, at: [] if not isinstance(v, str) or pattern.search(v)
+                      else [f"{at}: {v!r} does not match /{pattern.pattern}/"])
+
+    required = schema.get("required") or []
+    properties = {name: compile_schema(sub, f"{where}.{name}")
+                  for name, sub in (schema.get("properties") or {}).items()}
+    closed = schema.get("additionalProperties") is False
+    if required or properties or closed:
+        def check_object(v, at):
+            if not isinstance(v, dict):
+                return []
+            errors = [f"{at}: missing required field '{name}'" for name in required if name not in v]
+            for name, validator in properties.items():
+                if name in v:
+                    errors.extend(validator(v[name]))
+            if closed:
+                extra = sorted(set(v) - set(properties))
+                if extra:
+                    errors.append(f"{at}: unexpected fields {extra}")
+            return errors
+        checks.append(check_object)
+
+    if "items" in schema:
+        item_validator = compile_schema(schema["items"], f"{where}[]")
+        checks.append(lambda v, at: [e for item in v for e in item_validator(item)] if isinstance(v, list) else [])
+    for key, op in (("minItems", lambda n, b: n >= b), ("maxItems", lambda n, b: n <= b)):
+        if key in schema:
+            bound = schema[key]
+            checks.append(lambda v, at, b=bound, op=op, key=key: [] if not isinstance(v, list) or op(len(v), b)
+                          else [f"{at}: {len(v)} items violates {key} {b}"])
+
+    def validate(value: Any) -> List[str]:
+        errors: List[str] = []
+        for check in checks:
+            errors.extend(check(value, where))
+            if errors and check is checks[0] and expected_type is not None:
+                # Further checks are meaningless once the type is wrong
+                break
+        return errors
+
+    return validate
+
+
+# -- operators -------------------------------------------------------------
+
+def _number(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compare(op: Callable[[float, float], bool]) -> Callable[[Any, Any], bool]:
+    def check(actual, expected):
+        a, e = _number(actual), _number(expected)
+        return a is not None and e is not None and op(a, e)
+    return check
+
+
+def _compile_pattern(pattern: Any, where: str) -> "re.Pattern":
+    if not isinstance(pattern, str):
+        raise AssertionSpecError(f"Pattern at {where} must be a string")
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise AssertionSpecError(f"Invalid pattern /{pattern}/ at {where}: {e}")
+
+
+def _contains(value: Any, expected: Any) -> bool:
+    if isinstance(value, list):
+        return expected in value
+    # Substrings and dict keys only make sense for string values
+    return isinstance(value, (str, dict)) and isinstance(expected, str) and expected in value
+
+
+def _compile_operator(op: str, expected: Any) -> Callable[[Any], bool]:
+    if op == "eq":
+        return lambda v: v == expected
+    if op == "ne":
+        return lambda v: v != expected
+    if op in ("gt", "gte", "lt", "lte"):
+        compare = _compare({
+            "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+        }[op])
+        if _number(expected) is None:
+            raise AssertionSpecError(f"Operator '{op}' needs a numeric value, got {expected!r}")
+        return lambda v: compare(v, expected)
+    if op in ("in", "not_in"):
+        if not isinstance(expected, list):
+            raise AssertionSpecError(f"Operator '{op}' needs a list value, got {expected!r}")
+        if op == "in":
+            return lambda v: v in expected
+        return lambda v: v not in expected
+    if op == "contains":
+        if expected is None:
+            raise AssertionSpecError("Operator 'contains' needs a value")
+        return lambda v: _contains(v, expected)
+    if op == "matches":
+        pattern = _compile_pattern(expected, "operator 'matches'")
+        return lambda v: isinstance(v, str) and bool(pattern.search(v))
+    if op == "type":
+        if expected not in _TYPES:
+            raise AssertionSpecError(f"Unknown type '{expected}'")
+        return _TYPES[expected]
+    if op in ("length", "min_length", "max_length"):
+        if not isinstance(expected, int) or isinstance(expected, bool):
+            raise AssertionSpecError(f"Operator '{op}' needs an integer value, got {expected!r}")
+        compare = {"length": lambda n: n == expected, "min_length": lambda n: n >= expected,
+                   "max_length": lambda n: n <= expected}[op]
+        return lambda v: hasattr(v, "__len__") and compare(len(v))
+    raise AssertionSpecError(f"Unknown assertion operator '{op}'")
+
+
+class CompiledAssertion:
+    """A single assertion compiled for repeated evaluation."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.description = spec.get("description")
+        if "schema" in spec:
+            self.root, self.steps = compile_path(spec.get("path", "$"))
+            self.schema = compile_schema(spec["schema"])
+            self.op = "schema"
+            return
+        if "path" not in spec:
+            raise AssertionSpecError(f"Assertion needs a 'path' or 'schema': {spec}")
+        self.root, self.steps = compile_path(spec["path"])
+        self.op = spec.get("op", "exists")
+        self.expected = spec.get("value")
+        self.any = spec.get("quantifier", "all") == "any"
+        self.schema = None
+        if self.op not in ("exists", "not_exists"):
+            self.check = _compile_operator(self.op, self.expected)
+
+    def evaluate(self, response: Dict[str, Any]) -> Optional[str]:
+        """Return None when the assertion holds, otherwise a failure message."""
+        source = {
+            "body": response.get("body"),
+            "status": response.get("status_code"),
+            "headers": response.get("headers") or {},
+            "elapsed_ms": response.get("elapsed_ms"),
+        }[self.root]
+        values = resolve(self.steps, source)
+        label = self.description or self.spec.get("path", "$")
+
+        if self.op == "schema":
+            errors = [e for value in values for e in self.schema(value)] if values else ["value missing"]
+            return None if not errors else f"{label}: schema violations: {'; '.join(errors[:5])}"
+        if self.op == "exists":
+            return None if values else f"{label}: expected a value, found none"
+        if self.op == "not_exists":
+            return None if not values else f"{label}: expected no value, found {_preview(values)}"
+        if not values:
+            return f"{label}: no value found for {self.op} {self.expected!r}"
+        results = [self.check(v) for v in values]
+        if any(results) if self.any else all(results):
+            return None
+        bad = [v for v, ok in zip(values, results) if not ok]
+        return f"{label}: {self.op} {self.expected!r} failed for {_preview(bad)}"
+
+
+def _preview(values: List[Any], limit: int = 200) -> str:
+    text = json.dumps(values[:5] if len(values) > 1 else values[0], default=str)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+@lru_cache(maxsize=4096)
+def _compile_cached(key: str) -> CompiledAssertion:
+    return CompiledAssertion(json.loads(key))
+
+
+def compile_assertions(specs: List[Dict[str, Any]]) -> List[CompiledAssertion]:
+    """Compile a case's assertions, reusing identical specs across cases."""
+    return [_compile_cached(json.dumps(spec, sort_keys=True)) for spec in specs or []]
+
+
+def evaluate_assertions(compiled: List[CompiledAssertion], response: Dict[str, Any]) -> List[str]:
+    """Evaluate compiled assertions against a response and return failure messages."""
+    failures = []
+    for assertion in compiled:
+        message = assertion.evaluate(response)
+        if message:
+            failures.append(message)
+    return failures
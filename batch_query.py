@@ -0,0 +1,190 @@
+"""
+Batch query execution shared by the agent servers.
+
+Runs a list of queries against an agent callable with a per-batch parallelism
+limit and yields per-item results as newline-delimited JSON in completion
+order. Optionally merges several queries into a single agent call so bulk
+lookups (many JIRA issues, many BRD files) need fewer LLM round-trips.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fast_json import dumps_line
+
+logger = logging.getLogger(__name__)
+
+# Hard ceiling for the per-batch parallelism a client may request
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "8"))
+# Hard ceiling for the number of queries accepted in one batch
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+# Hard ceiling for the number of queries merged into one agent prompt
+BATCH_MAX_MERGE = int(os.getenv("BATCH_MAX_MERGE", "10"))
+
+_MERGED_SPLIT = re.compile(r"^###\s*RESULT\s+(\d+)\s*$", re.MULTILINE)
+
+
+def validate_batch(queries: List[str], max_parallel: int, merge_size: int = 1) -> Optional[str]:
+    """Return an error message if the batch cannot be executed, else None."""
+    if not queries:
+        return "Batch must contain at least one query"
+    if len(queries) > BATCH_MAX_QUERIES:
+        return f"Batch exceeds the maximum of {BATCH_MAX_QUERIES} queries"
+    if any(not q or not q.strip() for q in queries):
+        return "Queries cannot be empty"
+    if max_parallel < 1:
+        return "max_parallel must be at least 1"
+    if merge_size < 1:
+        return "merge_size must be at least 1"
+    if merge_size > BATCH_MAX_MERGE:
+        return f"merge_size exceeds the maximum of {BATCH_MAX_MERGE}"
+    return None
+
+
+def build_merged_prompt(queries: List[str]) -> str:
+    """Combine several queries into one prompt with numbered answer sections."""
+    lines = [
+        "Answer each of the following requests independently.",
+        "Start every answer on its own line with the exact header "
+        "'### RESULT <number>' matching the request number, and do not add "
+        "any text before the first header.",
+        "",
+    ]
+    for index, query in enumerate(queries, start=1):
+        lines.append(f"{index}. {query}")
+    return "\n".join(lines)
+
+
+def split_merged_response(response: Any, count: int) -> Optional[List[str]]:
+    """
+    Split a merged agent response back into per-query answers.
+
+    Returns None when the response does not contain exactly one section per
+    query, so the caller can fall back to individual execution.
+    """
+    text = response if isinstance(response, str) else str(response)
+    matches = list(_MERGED_SPLIT.finditer(text))
+    sections: Dict[int, str] = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections[int(match.group(1))] = text[match.end():end].strip()
+    if sorted(sections) != list(range(1, count + 1)):
+        return None
+    return [sections[i] for i in range(1, count + 1)]
+
+
+def _chunk(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _item_session_id(session_id: Optional[str], index: int) -> Optional[str]:
+    # Concurrent items must not interleave turns in one conversation
+    if not session_id:
+        return None
+    return f"{session_id}:batch:{index}"
+
+
+async def stream_batch(
+    queries: List[str],
+    run_query: Callable[[str, Optional[str]], Any],
+    executor: Executor,
+    session_id: Optional[str] = None,
+    max_parallel: int = 4,
+    merge_size: int = 1,
+    format_result: Optional[Callable[[Any], Any]] = None,
+) -> AsyncIterator[str]:
+    """
+    Execute a batch of queries and yield NDJSON lines in completion order.
+
+    Args:
+        queries: The queries to execute
+        run_query: Synchronous agent call taking (query, session_id)
+        executor: Thread pool used to run the synchronous agent calls
+        session_id: Optional parent session id; each item gets a derived id
+        max_parallel: Maximum concurrent agent calls for this batch
+        merge_size: Number of queries combined into one agent call (1 = no merging)
+        format_result: Optional formatter applied to each raw agent response
+
+    Yields:
+        One JSON line per query, followed by a final summary line
+    """
+    batch_start = time.time()
+    semaphore = asyncio.Semaphore(max(1, min(max_parallel, BATCH_MAX_PARALLEL)))
+    loop = asyncio.get_event_loop()
+    fmt = format_result or (lambda r: r)
+    agent_calls = 0
+
+    async def call_agent(prompt: str, sid: Optional[str]) -> Any:
+        nonlocal agent_calls
+        async with semaphore:
+            agent_calls += 1
+            return await loop.run_in_executor(executor, lambda: run_query(prompt, sid))
+
+    def item(index: int, result: Any = None, error: Optional[str] = None,
+             started: float = 0.0, merged: bool = False) -> Dict[str, Any]:
+        entry = {
+            "index": index,
+            "query": queries[index],
+            "execution_time": round(time.time() - started, 2),
+            "merged": merged,
+        }
+        if error is not None:
+            entry["error"] = error
+        else:
+            entry["result"] = fmt(result) if result else {"message": "No response received from the agent."}
+        return entry
+
+    async def run_single(index: int) -> List[Dict[str, Any]]:
+        started = time.time()
+        try:
+            result = await call_agent(queries[index], _item_session_id(session_id, index))
+            return [item(index, result=result, started=started)]
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {str(e)}")
+            return [item(index, error=str(e), started=started)]
+
+    async def run_group(indexes: List[int]) -> List[Dict[str, Any]]:
+        if len(indexes) == 1:
+            return await run_single(indexes[0])
+        started = time.time()
+        try:
+            prompt = build_merged_prompt([queries[i] for i in indexes])
+            response = await call_agent(prompt, _item_session_id(session_id, indexes[0]))
+            parts = split_merged_response(response, len(indexes))
+        except Exception as e:
+            logger.warning(f"Merged batch call failed, retrying items individually: {str(e)}")
+            parts = None
+        if parts is None:
+            logger.info(f"Could not split merged response for items {indexes}; running individually")
+            results: List[Dict[str, Any]] = []
+            for single in await asyncio.gather(*(run_single(i) for i in indexes)):
+                results.extend(single)
+            return results
+        return [item(i, result=part, started=started, merged=True) for i, part in zip(indexes, parts)]
+
+    groups = _chunk(list(range(len(queries))), max(1, min(merge_size, BATCH_MAX_MERGE)))
+    tasks = [asyncio.ensure_future(run_group(group)) for group in groups]
+
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for entry in await next_done:
+                if "error" in entry:
+                    failed += 1
+                yield dumps_line(entry)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield dumps_line({
+        "done": True,
+        "count": len(queries),
+        "failed": failed,
+        "agent_calls": agent_calls,
+        "execution_time": round(time.time() - batch_start, 2),
+    })
@@ -0,0 +1,432 @@
+"""
+Shared governor for Bedrock calls made by the agent servers.
+
+Each server used to call Bedrock with only botocore's per-call retries
+(BEDROCK_MAX_ATTEMPTS=3), so a burst tripped throttling and every client
+retried into it. All Bedrock traffic in a process now goes through one
+BedrockGateway:
+
+- Token bucket per model (BEDROCK_RPS / BEDROCK_BURST, overridable per
+  model with BEDROCK_MODEL_LIMITS) smooths bursts before they reach AWS
+- Adaptive concurrency per model (AIMD): the in-flight limit grows by one
+  per window of successful calls and halves on a throttle response
+- Retries use exponential backoff with full jitter and draw from a global
+  retry budget that successful calls refill, so retries cannot multiply
+  load during an outage
+- Interactive calls are admitted before queued batch calls, and batch calls
+  may only use BEDROCK_BATCH_SHARE of a model's concurrency
+
+The gateway hooks into botocore's event system. Clients created from
+governed_boto_session() with BEDROCK_CLIENT_CONFIG (botocore retries off)
+are governed, e.g. strands' BedrockModel(boto_session=governed_boto_session(),
+boto_client_config=BEDROCK_CLIENT_CONFIG); such sessions also get prompt
+caching checkpoints (prompt_cache). Callers mark batch work with
+`with bedrock_priority("batch"):`; the priority follows the calling context.
+The agents in src build their own Bedrock clients, so only governed clients
+(e.g. the query router's fast path) are admitted through the gateway today;
+priority wrappers belong next to governed calls only.
+For streaming responses a call holds its concurrency slot until the response
+headers arrive.
+
+Environment variables:
+    BEDROCK_RPS               Requests per second per model (default: 5)
+    BEDROCK_BURST             Token bucket size per model (default: 10)
+    BEDROCK_MODEL_LIMITS      Per-model overrides, "model_id=rps:burst,..."
+    BEDROCK_MAX_CONCURRENCY   Upper bound of the AIMD limit per model (default: 16)
+    BEDROCK_BATCH_SHARE       Fraction of concurrency batch calls may use (default: 0.5)
+    BEDROCK_MAX_RETRIES       Retries per call (default: 4)
+    BEDROCK_RETRY_RATIO       Retry budget refilled per successful call (default: 0.2)
+    BEDROCK_ADMIT_TIMEOUT     Seconds a call may wait for admission (default: 120)
+    SERVE_WORKERS             Worker processes of this server (set by serve.py, default: 1)
+
+The rate, burst and concurrency limits are per server: each worker process
+enforces its share, the configured value divided by SERVE_WORKERS.
+"""
+
+import contextvars
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BEDROCK_RPS = float(os.getenv("BEDROCK_RPS", "5"))
+BEDROCK_BURST = float(os.getenv("BEDROCK_BURST", "10"))
+BEDROCK_MODEL_LIMITS = os.getenv("BEDROCK_MODEL_LIMITS", "")
+BEDROCK_MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "16"))
+BEDROCK_BATCH_SHARE = float(os.getenv("BEDROCK_BATCH_SHARE", "0.5"))
+BEDROCK_MAX_RETRIES = int(os.getenv("BEDROCK_MAX_RETRIES", "4"))
+BEDROCK_RETRY_RATIO = float(os.getenv("BEDROCK_RETRY_RATIO", "0.2"))
+BEDROCK_ADMIT_TIMEOUT = float(os.getenv("BEDROCK_ADMIT_TIMEOUT", "120"))
+SERVE_WORKERS = max(1, int(os.getenv("SERVE_WORKERS", "1")))
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+TRANSIENT_CODES = {"ServiceUnavailableException", "ModelNotReadyException", "InternalServerException",
+                   "ModelTimeoutException"}
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("bedrock_priority", default=INTERACTIVE)
+_MODEL_IN_PATH = re.compile(r"/model/([^/]+)/")
+
+
+@contextmanager
+def bedrock_priority(priority: str):
+    """Run the enclosed Bedrock calls with the given priority (interactive/batch)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def classify_error(error: Optional[BaseException] = None, status: Optional[int] = None,
+                   code: Optional[str] = None) -> str:
+    """Return 'throttle', 'transient' or 'fatal' for a failed call."""
+    if error is not None and code is None:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        status = status or getattr(error, "response", {}).get("ResponseMetadata", {}).get("HTTPStatusCode")
+    if code in THROTTLE_CODES or status == 429:
+        return "throttle"
+    if code in TRANSIENT_CODES or (status is not None and status >= 500):
+        return "transient"
+    if error is not None and code is None:
+        # Connection resets, read timeouts and similar transport errors
+        return "transient"
+    return "fatal"
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline: float) -> bool:
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """Adaptive in-flight limit with interactive-before-batch admission."""
+
+    def __init__(self, max_limit: int, batch_share: float, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.batch_share = batch_share
+        self.limit = float(max_limit)
+        self.inflight = {INTERACTIVE: 0, BATCH: 0}
+        self.waiting = {INTERACTIVE: 0, BATCH: 0}
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _admissible(self, priority: str) -> bool:
+        total = self.inflight[INTERACTIVE] + self.inflight[BATCH]
+        if total >= math.floor(self.limit):
+            return False
+        if priority == BATCH:
+            if self.waiting[INTERACTIVE]:
+                return False
+            return self.inflight[BATCH] < max(1, math.floor(self.limit * self.batch_share))
+        return True
+
+    def acquire(self, priority: str, deadline: float) -> bool:
+        with self._cond:
+            self.waiting[priority] += 1
+            try:
+                while not self._admissible(priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.inflight[priority] += 1
+                return True
+            finally:
+                self.waiting[priority] -= 1
+
+    def release(self, priority: str, outcome: str) -> None:
+        with self._cond:
+            self.inflight[priority] -= 1
+            now = time.monotonic()
+            if outcome == "throttle":
+                # Halve at most once per second so one burst of throttles is one decrease
+                if now - self._last_decrease > 1.0:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+            elif outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RetryBudget:
+    """Global retry allowance: each success deposits `ratio`, each retry spends 1."""
+
+    def __init__(self, ratio: float, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """Exponential backoff with full jitter for the given retry number (1-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _parse_model_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rps, _, burst = values.partition(":")
+        limits[model.strip()] = (float(rps), float(burst or rps))
+    return limits
+
+
+class BedrockGateway:
+    """Per-model admission control plus a shared retry budget."""
+
+    def __init__(self, rps: float = BEDROCK_RPS, burst: float = BEDROCK_BURST,
+                 max_concurrency: int = BEDROCK_MAX_CONCURRENCY, batch_share: float = BEDROCK_BATCH_SHARE,
+                 max_retries: int = BEDROCK_MAX_RETRIES, retry_ratio: float = BEDROCK_RETRY_RATIO,
+                 model_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 admit_timeout: float = BEDROCK_ADMIT_TIMEOUT, workers: int = SERVE_WORKERS):
+        self.workers = max(1, workers)
+        self.rps = rps
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.batch_share = batch_share
+        self.max_retries = max_retries
+        self.admit_timeout = admit_timeout
+        self.model_limits = model_limits if model_limits is not None else _parse_model_limits(BEDROCK_MODEL_LIMITS)
+        self.budget = RetryBudget(retry_ratio)
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._attempts = threading.local()
+
+    def _model(self, model_id: str) -> Dict[str, Any]:
+        with self._lock:
+            model = self._models.get(model_id)
+            if model is None:
+                rps, burst = self.model_limits.get(model_id, (self.rps, self.burst))
+                # Every worker process runs its own gateway; each takes an equal share
+                model = {
+                    "bucket": TokenBucket(rps / self.workers, max(1.0, burst / self.workers)),
+                    "limiter": AIMDLimiter(max(1, self.max_concurrency // self.workers), self.batch_share),
+                    "stats": {"calls": 0, "ok": 0, "throttled": 0, "transient": 0, "fatal": 0,
+                              "retries": 0, "budget_exhausted": 0, "rejected": 0, "wait_ms": 0.0},
+                }
+                self._models[model_id] = model
+            return model
+
+    # -- admission ---------------------------------------------------------
+
+    def admit(self, model_id: str, priority: Optional[str] = None) -> str:
+        """Block until a call to model_id may start; returns the priority used."""
+        priority = priority or _priority.get()
+        model = self._model(model_id)
+        started = time.monotonic()
+        deadline = started + self.admit_timeout
+        if not model["limiter"].acquire(priority, deadline):
+            model["stats"]["rejected"] += 1
+            raise TimeoutError(f"Bedrock admission timed out for {model_id} ({priority})")
+        if not model["bucket"].acquire(deadline):
+            model["limiter"].release(priority, "rejected")
+            model["stats"]["rejected"] += 1
+            raise TimeoutError(f"Bedrock rate limit wait timed out for {model_id} ({priority})")
+        model["stats"]["calls"] += 1
+        model["stats"]["wait_ms"] += (time.monotonic() - started) * 1000
+        return priority
+
+    def complete(self, model_id: str, priority: str, outcome: str) -> None:
+        """Record the outcome of an admitted call ('ok', 'throttle', 'transient', 'fatal')."""
+        model = self._model(model_id)
+        model["limiter"].release(priority, outcome)
+        key = {"throttle": "throttled"}.get(outcome, outcome)
+        model["stats"][key] = model["stats"].get(key, 0) + 1
+        if outcome == "ok":
+            self.budget.deposit()
+
+    def retry_delay(self, model_id: str, outcome: str, attempt: int) -> Optional[float]:
+        """Seconds to wait before retry number `attempt`, or None when it should not be retried."""
+        if outcome not in ("throttle", "transient") or attempt > self.max_retries:
+            return None
+        model = self._model(model_id)
+        if not self.budget.withdraw():
+            model["stats"]["budget_exhausted"] += 1
+            logger.warning(f"Bedrock retry budget exhausted; not retrying {model_id}")
+            return None
+        model["stats"]["retries"] += 1
+        return backoff_delay(attempt)
+
+    def call(self, model_id: str, fn: Callable[[], Any], priority: Optional[str] = None) -> Any:
+        """Run fn() (one Bedrock request) under admission control with budgeted retries."""
+        priority = priority or _priority.get()
+        attempt = 0
+        while True:
+            self.admit(model_id, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                outcome = classify_error(e)
+                self.complete(model_id, priority, outcome)
+                attempt += 1
+                delay = self.retry_delay(model_id, outcome, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.complete(model_id, priority, "ok")
+            return result
+
+    # -- botocore integration ----------------------------------------------
+
+    def _before_send(self, request, **kwargs):
+        match = _MODEL_IN_PATH.search(request.url)
+        model_id = match.group(1) if match else "unknown"
+        priority = self.admit(model_id)
+        self._attempts.current = (model_id, priority)
+        return None
+
+    def _needs_retry(self, response=None, caught_exception=None, attempts=1, **kwargs):
+        current = getattr(self._attempts, "current", None)
+        if current is None:
+            return None
+        self._attempts.current = None
+        model_id, priority = current
+        if caught_exception is not None:
+            outcome = classify_error(caught_exception)
+        else:
+            http_response, parsed = response
+            status = http_response.status_code
+            code = (parsed or {}).get("Error", {}).get("Code")
+            outcome = "ok" if status < 400 else classify_error(status=status, code=code)
+        self.complete(model_id, priority, outcome)
+        if outcome == "ok":
+            return None
+        return self.retry_delay(model_id, outcome, attempts)
+
+    def install(self, boto_session) -> None:
+        """Govern every bedrock-runtime client subsequently created from boto_session."""
+        events = boto_session.events
+        events.register("before-send.bedrock-runtime", self._before_send,
+                        unique_id="bedrock-gateway-before-send")
+        events.register_first("needs-retry.bedrock-runtime", self._needs_retry,
+                              unique_id="bedrock-gateway-needs-retry")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            models = dict(self._models)
+        return {
+            "workers": self.workers,
+            "retry_budget": round(self.budget.tokens, 2),
+            "models": {
+                model_id: dict(
+                    model["stats"],
+                    wait_ms=round(model["stats"]["wait_ms"], 1),
+                    concurrency_limit=round(model["limiter"].limit, 2),
+                    inflight=dict(model["limiter"].inflight),
+                    waiting=dict(model["limiter"].waiting),
+                )
+                for model_id, model in models.items()
+            },
+        }
+
+
+def _client_config():
+    try:
+        from botocore.config import Config
+    except ImportError:
+        return None
+    # Retries are decided by the gateway, so botocore makes a single attempt
+    return Config(retries={"total_max_attempts": 1, "mode": "standard"})
+
+
+BEDROCK_CLIENT_CONFIG = _client_config()
+
+_gateway: Optional[BedrockGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_bedrock_gateway() -> BedrockGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = BedrockGateway()
+        return _gateway
+
+
+def governed_boto_session(**session_kwargs):
+    """Create a boto3 Session whose bedrock-runtime clients go through the gateway."""
+    import boto3
+    from prompt_cache import install_prompt_caching
+    session = boto3.Session(**session_kwargs)
+    get_bedrock_gateway().install(session)
+    install_prompt_caching(session)
+    return session
+
+
+_clients: Dict[str, Tuple[Any, bool]] = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_client(region_name: Optional[str]) -> Tuple[Any, bool]:
+    region_name = region_name or os.getenv("AWS_REGION", "us-west-2")
+    with _clients_lock:
+        entry = _clients.get(region_name)
+        if entry is None:
+            session = governed_boto_session()
+            credentials = session.get_credentials()
+            if credentials is not None:
+                credentials.get_frozen_credentials()
+            client = session.client("bedrock-runtime", region_name=region_name, config=BEDROCK_CLIENT_CONFIG)
+            entry = _clients[region_name] = (client, credentials is not None)
+        return entry
+
+
+def governed_bedrock_client(region_name: Optional[str] = None):
+    """Process-wide governed bedrock-runtime client per region (boto3 clients are thread-safe)."""
+    return _shared_client(region_name)[0]
+
+
+def warm_bedrock_client(region_name: Optional[str] = None) -> bool:
+    """Build the shared client ahead of the first call; returns whether AWS credentials were found."""
+    return _shared_client(region_name)[1]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialize + transfer time of large agent payloads.
+
+Builds synthetic agent results (a JIRA issue with many comments and
+attachments, a swagger excerpt) of increasing size and measures, per
+encoding:
+  - serialize: stdlib json.dumps vs orjson (fast_json.dumps)
+  - compress:  identity, gzip and (when installed) brotli, with the same
+               settings as CompressionMiddleware
+  - end to end: a real HTTP request against a local uvicorn server using
+               the servers' response class and middleware
+Transfer time is estimated from the body size at --mbps (the UI-to-agent
+link), since loopback transfer is effectively free.
+
+Usage:
+    python benchmarks/bench_json_transfer.py [--sizes 100 1000 5000] [--mbps 50]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import socket
+import string
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_payload(items: int) -> dict:
+    """A JIRA-issue-shaped result with `items` comments and attachments plus a swagger excerpt."""
+    rng = random.Random(items)
+
+    def words(n):
+        return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(n))
+
+    return {
+        "result": {
+            "key": "TBAPI-1",
+            "fields": {
+                "summary": words(8),
+                "description": words(200),
+                "status": {"name": "In Progress", "id": "3"},
+                "comment": {"comments": [
+                    {"id": str(i), "author": {"displayName": f"user{i % 17}", "accountId": f"acc-{i % 17}"},
+                     "body": words(40), "created": "2024-05-01T10:00:00.000+0000"}
+                    for i in range(items)
+                ]},
+                "attachment": [
+                    {"id": str(i), "filename": f"brd_{i}.pdf", "size": rng.randint(1000, 10 ** 6),
+                     "mimeType": "application/pdf", "content": f"https://jira.example.com/attachment/{i}"}
+                    for i in range(items)
+                ],
+            },
+            "swagger_excerpt": {
+                f"/v1/resource{i}": {"post": {"parameters": [
+                    {"name": "orgLevelId", "in": "query", "required": True, "type": "integer"}],
+                    "responses": {"200": {"description": words(6)}, "400": {"description": words(6)}}}}
+                for i in range(items // 5 + 1)
+            },
+        },
+        "execution_time": 12.3,
+        "session_id": "bench",
+    }
+
+
+def timed(fn, repeat: int = 3):
+    best, value = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(payloads: dict) -> int:
+    import uvicorn
+    from fastapi import FastAPI
+    from fast_json import CompressionMiddleware, FastJSONResponse
+
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/payload/{items}")
+    def payload(items: int):
+        return payloads[items]
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--mbps", type=float, default=50.0, help="Link speed used to estimate transfer time")
+    args = parser.parse_args()
+
+    import requests
+    import fast_json
+
+    payloads = {items: build_payload(items) for items in args.sizes}
+    port = start_server(payloads)
+    bytes_per_s = args.mbps * 1_000_000 / 8
+    encodings = ["identity", "gzip"] + (["br"] if fast_json.brotli is not None else [])
+
+    print(f"orjson={'yes' if fast_json.orjson else 'no'} brotli={'yes' if fast_json.brotli else 'no'} "
+          f"link={args.mbps:g} Mbit/s")
+    print(f"{'items':>6} {'json_ms':>8} {'orjson_ms':>10} {'encoding':>9} {'bytes':>10} "
+          f"{'compress_ms':>12} {'http_ms':>8} {'est_total_ms':>13}")
+    for items, payload in payloads.items():
+        json_s, _ = timed(lambda: json.dumps(payload).encode("utf-8"))
+        fast_s, body = timed(lambda: fast_json.dumps(payload))
+        for encoding in encodings:
+            if encoding == "gzip":
+                compress_s, wire = timed(lambda: gzip.compress(body, compresslevel=fast_json.GZIP_LEVEL))
+            elif encoding == "br":
+                compress_s, wire = timed(lambda: fast_json.brotli.compress(body, quality=fast_json.BROTLI_QUALITY))
+            else:
+                compress_s, wire = 0.0, body
+            http_s, _ = timed(lambda: requests.get(f"http://127.0.0.1:{port}/payload/{items}",
+                                                   headers={"Accept-Encoding": encoding}).content)
+            total_ms = (http_s + len(wire) / bytes_per_s) * 1000
+            print(f"{items:>6} {json_s * 1000:>8.1f} {fast_s * 1000:>10.1f} {encoding:>9} {len(wire):>10} "
+                  f"{compress_s * 1000:>12.1f} {http_s * 1000:>8.1f} {total_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-threaded vs page-parallel BRD PDF extraction.
+
+Generates synthetic text PDFs of 10/100/500 pages and times
+  - baseline: pdfplumber over every page in the calling thread
+  - parallel: pdf_extract.iter_pages on the process pool (cold page cache)
+  - cached:   the same document again (warm page cache)
+
+Usage:
+    python benchmarks/bench_pdf_extract.py [--pages 10 100 500]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """Write a minimal multi-page text PDF without third-party libraries."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1
+    objects.append(b"")  # placeholder for the page tree
+    kids = []
+    for p in range(pages):
+        lines = [f"BRD section {p + 1}.{n + 1}: the API shall validate field_{n} "
+                 f"and return 400 when it is missing." for n in range(lines_per_page)]
+        stream = "BT /F1 9 Tf 36 800 Td 11 TL " + " ".join(
+            f"({line}) Tj T*" for line in lines) + " ET"
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode()))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+def baseline(content: bytes) -> int:
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        return len("\n\n".join(page.extract_text() or "" for page in pdf.pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    os.environ["PDF_PAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="pdf_pages_")
+    import pdf_extract
+
+    print(f"workers={pdf_extract.PDF_WORKERS}")
+    print(f"{'pages':>6} {'baseline_s':>11} {'parallel_s':>11} {'cached_s':>9} {'first_page_s':>13}")
+    for pages in args.pages:
+        content = build_pdf(pages)
+
+        start = time.perf_counter()
+        baseline(content)
+        base_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_page_s = None
+        for _ in pdf_extract.iter_pages(content):
+            if first_page_s is None:
+                first_page_s = time.perf_counter() - start
+        parallel_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pdf_extract.extract_pdf_text(content)
+        cached_s = time.perf_counter() - start
+
+        print(f"{pages:>6} {base_s:>11.2f} {parallel_s:>11.2f} {cached_s:>9.3f} {first_page_s:>13.2f}")
+
+    pdf_extract.shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Profile: import cost of each server entry point.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter per
+entry point and prints the slowest imports by cumulative time, so heavy
+modules that land on the startup path are easy to spot.
+
+Usage:
+    python benchmarks/profile_imports.py [--top 15] [modules ...]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["github_agent_server", "jira_agent_server", "supervisor_agent_server"]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+
+def profile(module: str):
+    """Return (rows, error) where rows are (cumulative_us, self_us, depth, name)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(cumulative_us), int(self_us), len(indent) // 2, name.strip()))
+    error = None
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+    return rows, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        rows, error = profile(module)
+        total = next((row[0] for row in rows if row[3] == module), sum(r[0] for r in rows if r[2] == 0))
+        print(f"\n=== {module}: {total / 1000:.1f} ms total ===")
+        if error:
+            print(f"  (import did not complete: {error})")
+        print(f"  {'cumulative ms':>13}  {'self ms':>8}  module")
+        for cumulative_us, self_us, _, name in sorted(rows, reverse=True)[:args.top]:
+            print(f"  {cumulative_us / 1000:>13.1f}  {self_us / 1000:>8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
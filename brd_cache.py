@@ -0,0 +1,269 @@
+"""
+Content-addressed cache for BRD documents fetched from GitHub.
+
+Files are stored under their git blob sha, so an unchanged BRD is never
+downloaded or parsed twice:
+
+- Metadata requests carry the last ETag (If-None-Match); a 304 answer is
+  served straight from the local blob store and does not count against the
+  GitHub rate limit
+- When GitHub reports a sha that is already stored, the body is not decoded
+  or written again
+- Extracted text (PDF parsing is the expensive part) is memoized per sha in
+  memory (the BRD_TEXT_MEMO_MAX most recent documents) and on disk; PDFs go
+  through the page-parallel pipeline in pdf_extract, which also caches
+  individual pages
+- Worker processes share the index: each save re-reads it under a file lock
+  and merges, so one worker never drops ETags another worker stored
+
+Environment variables:
+    BRD_CACHE_DIR   Cache directory (default: cache/brd)
+    BRD_TEXT_MEMO_MAX  Documents whose text is kept in memory (default: 32)
+    GITHUB_TOKEN    Optional token for private repositories / higher rate limits
+    GITHUB_API_URL  API base URL (default: https://api.github.com)
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+
+import pdf_extract
+from http_cassette import install_cassette
+
+try:
+    import fcntl
+except ImportError:  # Windows: index saves from several processes are not coordinated
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BRD_CACHE_DIR = os.getenv("BRD_CACHE_DIR", os.path.join("cache", "brd"))
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+BRD_TEXT_MEMO_MAX = int(os.getenv("BRD_TEXT_MEMO_MAX", "32"))
+
+
+def git_blob_sha(content: bytes) -> str:
+    """Compute the git blob sha GitHub reports for a file's content."""
+    header = f"blob {len(content)}\0".encode("utf-8")
+    return hashlib.sha1(header + content).hexdigest()
+
+
+def extract_text(path: str, content: bytes, sha: Optional[str] = None) -> str:
+    """Turn a fetched document into text based on its extension."""
+    if path.lower().endswith(".pdf"):
+        return pdf_extract.extract_pdf_text(content, sha)
+    return content.decode("utf-8", errors="replace")
+
+
+class BRDCache:
+    """Local blob store plus ETag index for GitHub-hosted BRD documents."""
+
+    def __init__(self, cache_dir: str = BRD_CACHE_DIR, token: Optional[str] = None,
+                 session: Optional[requests.Session] = None):
+        self.cache_dir = cache_dir
+        self.token = token if token is not None else os.getenv("GITHUB_TOKEN")
+        if session is None:
+            session = requests.Session()
+            install_cassette(session)
+        self.session = session
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._text_memo: "OrderedDict[str, str]" = OrderedDict()
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "text"), exist_ok=True)
+        self._index = self._load_index()
+        self.stats = {"not_modified": 0, "sha_hits": 0, "downloads": 0,
+                      "text_hits": 0, "extractions": 0}
+
+    # -- storage helpers -------------------------------------------------
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, key: str, entry: Dict[str, Any]) -> None:
+        """Store one index entry; called with self._lock held."""
+        with open(self._index_path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Other workers may have added entries since we loaded the index
+            index = self._load_index()
+            for other_key, other in self._index.items():
+                if other.get("fetched_at", 0) > index.get(other_key, {}).get("fetched_at", 0):
+                    index[other_key] = other
+            index[key] = entry
+            self._index = index
+            # Worker processes share the cache directory, so each writes its own temp file
+            tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self._index_path)
+
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", sha[:2], sha)
+
+    def _text_path(self, sha: str) -> str:
+        return os.path.join(self.cache_dir, "text", f"{sha}.txt")
+
+    def has_blob(self, sha: str) -> bool:
+        return os.path.exists(self._blob_path(sha))
+
+    def read_blob(self, sha: str) -> bytes:
+        with open(self._blob_path(sha), "rb") as f:
+            return f.read()
+
+    def write_blob(self, content: bytes) -> str:
+        sha = git_blob_sha(content)
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return sha
+
+    # -- GitHub access ----------------------------------------------------
+
+    def _headers(self, etag: Optional[str] = None) -> Dict[str, str]:
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if etag:
+            headers["If-None-Match"] = etag
+        return headers
+
+    def fetch(self, repo: str, path: str, ref: str = "main") -> Dict[str, Any]:
+        """
+        Fetch a file, skipping the download when the cached copy is current.
+
+        Args:
+            repo: Repository in "owner/name" form
+            path: File path inside the repository
+            ref: Branch, tag or commit
+
+        Returns:
+            Dict with sha, content (bytes) and source ("not_modified", "sha_hit" or "download")
+        """
+        key = f"{repo}@{ref}:{path}"
+        with self._lock:
+            entry = dict(self._index.get(key, {}))
+        cached_sha = entry.get("sha")
+        etag = entry.get("etag") if cached_sha and self.has_blob(cached_sha) else None
+
+        url = f"{GITHUB_API_URL}/repos/{repo}/contents/{path.lstrip('/')}"
+        response = self.session.get(url, params={"ref": ref}, headers=self._headers(etag), timeout=30)
+
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            return {"sha": cached_sha, "content": self.read_blob(cached_sha), "source": "not_modified"}
+
+        response.raise_for_status()
+        meta = response.json()
+        sha = meta["sha"]
+
+        if self.has_blob(sha):
+            self.stats["sha_hits"] += 1
+            content = self.read_blob(sha)
+            source = "sha_hit"
+        else:
+            self.stats["downloads"] += 1
+            if meta.get("content") and meta.get("encoding") == "base64":
+                content = base64.b64decode(meta["content"])
+            else:
+                # Files over 1 MB come without inline content
+                raw = self.session.get(meta["download_url"], headers=self._headers(), timeout=120)
+                raw.raise_for_status()
+                content = raw.content
+            stored_sha = self.write_blob(content)
+            if stored_sha != sha:
+                logger.warning(f"Blob sha mismatch for {key}: GitHub {sha}, local {stored_sha}")
+                sha = stored_sha
+            source = "download"
+
+        with self._lock:
+            self._save_index(key, {"sha": sha, "etag": response.headers.get("ETag"),
+                                   "fetched_at": round(time.time(), 3)})
+        return {"sha": sha, "content": content, "source": source}
+
+    # -- parsed text -------------------------------------------------------
+
+    def text_for_blob(self, sha: str, path: str, content: Optional[bytes] = None) -> str:
+        """Return the extracted text for a blob, parsing it at most once."""
+        with self._lock:
+            text = self._text_memo.get(sha)
+            if text is not None:
+                self._text_memo.move_to_end(sha)
+        if text is not None:
+            self.stats["text_hits"] += 1
+            return text
+        text_path = self._text_path(sha)
+        if os.path.exists(text_path):
+            with open(text_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            self.stats["text_hits"] += 1
+        else:
+            self.stats["extractions"] += 1
+            text = extract_text(path, content if content is not None else self.read_blob(sha), sha)
+            tmp_path = f"{text_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, text_path)
+        self._memoize_text(sha, text)
+        return text
+
+    def _memoize_text(self, sha: str, text: str) -> None:
+        with self._lock:
+            self._text_memo[sha] = text
+            self._text_memo.move_to_end(sha)
+            while len(self._text_memo) > BRD_TEXT_MEMO_MAX:
+                self._text_memo.popitem(last=False)
+
+    def get_text(self, repo: str, path: str, ref: str = "main") -> Dict[str, Any]:
+        """Fetch a BRD document and return its text with cache provenance."""
+        fetched = self.fetch(repo, path, ref)
+        text = self.text_for_blob(fetched["sha"], path, fetched["content"])
+        return {"sha": fetched["sha"], "source": fetched["source"], "text": text}
+
+    def iter_pages(self, repo: str, path: str, ref: str = "main") -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_number, text) for a BRD as pages become available.
+
+        Non-PDF documents and documents whose text is already memoized come
+        back as a single page 0.
+        """
+        fetched = self.fetch(repo, path, ref)
+        sha = fetched["sha"]
+        if not path.lower().endswith(".pdf") or sha in self._text_memo or os.path.exists(self._text_path(sha)):
+            yield 0, self.text_for_blob(sha, path, fetched["content"])
+            return
+        pages = []
+        for page, text in pdf_extract.iter_pages(fetched["content"], sha):
+            pages.append(text)
+            yield page, text
+        # Every page is done, so the full-document text is now free to memoize
+        self._memoize_text(sha, "\n\n".join(pages))
+
+
+_cache: Optional[BRDCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_brd_cache() -> BRDCache:
+    """Return the process-wide BRD cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BRDCache()
+        return _cache
@@ -0,0 +1,328 @@
+"""
+Local execution engine for generated API test cases.
+
+Takes the positive/negative case list produced by the agents and runs it
+directly against the target API instead of one request at a time through the
+Postman MCP endpoint:
+
+- Independent cases run concurrently on a pooled HTTP session, capped by a
+  global limit and a per-host limit; client-requested limits are clamped to
+  EXECUTOR_MAX_CONCURRENCY / EXECUTOR_PER_HOST_LIMIT, and every run shares
+  one process-wide worker pool
+- Cases listing depends_on wait for those cases (e.g. auth first, then the
+  GET/POST chain) and are skipped if a dependency failed
+- Values extracted from earlier responses ("extract") are substituted into
+  later requests through {{name}} placeholders; {{env.NAME}} reads the
+  environment
+- Responses are checked by expected_status and the compiled "assertions"
+  (see assertions.py); an optional reviewer is consulted only for failures
+
+Case format:
+    {
+        "id": "get-sortoverride",
+        "name": "Get sort overrides",
+        "method": "GET",
+        "url": "{{env.SMARTLINX_API_BASE_URL}}/taappend/paycodeexceptions/sortoverride/",
+        "headers": {"Authorization": "Bearer {{token}}"},
+        "params": {"subscription-key": "{{env.SMARTLINX_SUBSCRIPTION_KEY}}"},
+        "json": null,
+        "depends_on": ["auth"],
+        "expected_status": [200],
+        "extract": {"token": "data.response.token"},
+        "assertions": [{"path": "$.data[].exceptionId", "op": "exists"}]
+    }
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from assertions import compile_assertions, evaluate_assertions
+from http_cassette import install_cassette
+
+logger = logging.getLogger(__name__)
+
+# Hard ceilings (and defaults) for the limits a client may request per run
+EXECUTOR_MAX_CONCURRENCY = int(os.getenv("EXECUTOR_MAX_CONCURRENCY", "32"))
+EXECUTOR_PER_HOST_LIMIT = int(os.getenv("EXECUTOR_PER_HOST_LIMIT", "8"))
+EXECUTOR_TIMEOUT_SECONDS = float(os.getenv("EXECUTOR_TIMEOUT_SECONDS", "30"))
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([\w.\-]+)\s*\}\}")
+_PATH_TOKEN = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide session with a connection pool sized for concurrent cases."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=EXECUTOR_MAX_CONCURRENCY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            # Record/replay SmartLinx traffic when HTTP_CASSETTE_MODE is set
+            install_cassette(_session, pool_connections=16, pool_maxsize=EXECUTOR_MAX_CONCURRENCY)
+        return _session
+
+
+def get_case_pool() -> ThreadPoolExecutor:
+    """Process-wide worker pool for case requests, shared by concurrent runs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=EXECUTOR_MAX_CONCURRENCY, thread_name_prefix="case")
+        return _pool
+
+
+def parse_cases(text: str) -> List[Dict[str, Any]]:
+    """Parse a case list from agent output (plain JSON or a fenced code block)."""
+    stripped = text.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", stripped, re.DOTALL)
+    if fenced:
+        stripped = fenced.group(1).strip()
+    start = stripped.find("[")
+    end = stripped.rfind("]")
+    if start == -1 or end == -1:
+        raise ValueError("No JSON array of test cases found in agent output")
+    cases = json.loads(stripped[start:end + 1])
+    if not isinstance(cases, list):
+        raise ValueError("Test cases must be a JSON array")
+    return cases
+
+
+def lookup_path(data: Any, path: str) -> Any:
+    """Resolve a dotted path such as data.response.token or data[0].id."""
+    current = data
+    for key, index in _PATH_TOKEN.findall(path.lstrip("$.")):
+        if index:
+            current = current[int(index)]
+        elif isinstance(current, list) and key.isdigit():
+            current = current[int(key)]
+        else:
+            current = current[key]
+    return current
+
+
+def render(value: Any, context: Dict[str, Any]) -> Any:
+    """Substitute {{name}} placeholders in strings, dicts and lists."""
+    if isinstance(value, str):
+        full = _PLACEHOLDER.fullmatch(value.strip())
+        if full:
+            # Keep the original type when the whole value is one placeholder
+            return _resolve(full.group(1), context)
+        return _PLACEHOLDER.sub(lambda m: str(_resolve(m.group(1), context)), value)
+    if isinstance(value, dict):
+        return {k: render(v, context) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render(v, context) for v in value]
+    return value
+
+
+def _resolve(name: str, context: Dict[str, Any]) -> Any:
+    if name.startswith("env."):
+        return os.getenv(name[4:], "")
+    if name in context:
+        return context[name]
+    raise KeyError(f"Unresolved placeholder '{{{{{name}}}}}'")
+
+
+def _order_cases(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Assign ids, validate dependencies and reject cycles."""
+    ids = set()
+    for index, case in enumerate(cases):
+        case.setdefault("id", f"case-{index + 1}")
+        if case["id"] in ids:
+            raise ValueError(f"Duplicate test case id '{case['id']}'")
+        ids.add(case["id"])
+    for case in cases:
+        for dep in case.get("depends_on") or []:
+            if dep not in ids:
+                raise ValueError(f"Case '{case['id']}' depends on unknown case '{dep}'")
+
+    by_id = {case["id"]: case for case in cases}
+    state: Dict[str, int] = {}
+
+    def visit(case_id: str, chain: List[str]) -> None:
+        if state.get(case_id) == 2:
+            return
+        if state.get(case_id) == 1:
+            raise ValueError(f"Dependency cycle: {' -> '.join(chain + [case_id])}")
+        state[case_id] = 1
+        for dep in by_id[case_id].get("depends_on") or []:
+            visit(dep, chain + [case_id])
+        state[case_id] = 2
+
+    for case in cases:
+        visit(case["id"], [])
+    return cases
+
+
+class CaseExecutor:
+    """Runs a list of test cases concurrently and returns a pass/fail report."""
+
+    def __init__(self, max_concurrency: int = EXECUTOR_MAX_CONCURRENCY,
+                 per_host_limit: int = EXECUTOR_PER_HOST_LIMIT,
+                 timeout: float = EXECUTOR_TIMEOUT_SECONDS,
+                 session: Optional[requests.Session] = None):
+        self.max_concurrency = max(1, min(max_concurrency, EXECUTOR_MAX_CONCURRENCY))
+        self.per_host_limit = max(1, min(per_host_limit, EXECUTOR_PER_HOST_LIMIT))
+        self.timeout = timeout
+        self.session = session or get_http_session()
+
+    def _send(self, method: str, url: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response = self.session.request(
+            method, url,
+            headers=request.get("headers"),
+            params=request.get("params"),
+            json=request.get("json"),
+            data=request.get("data"),
+            timeout=self.timeout,
+        )
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        return {"status_code": response.status_code, "body": body,
+                "headers": dict(response.headers), "elapsed_ms": elapsed_ms}
+
+    def check(self, case: Dict[str, Any], response: Dict[str, Any]) -> List[str]:
+        """Return failure messages for a response; empty means the case passed."""
+        failures = []
+        expected = case.get("expected_status")
+        if expected is not None:
+            allowed = expected if isinstance(expected, list) else [expected]
+            if response["status_code"] not in [int(s) for s in allowed]:
+                failures.append(f"expected status {allowed}, got {response['status_code']}")
+        failures.extend(evaluate_assertions(case.get("_compiled", []), response))
+        return failures
+
+    async def run(self, cases: List[Dict[str, Any]],
+                  context: Optional[Dict[str, Any]] = None,
+                  review_failures: Optional[Callable[[List[Dict[str, Any]]], Any]] = None) -> Dict[str, Any]:
+        """
+        Execute the cases and return a structured report.
+
+        Args:
+            cases: Test case dicts (see module docstring)
+            context: Optional initial placeholder values
+            review_failures: Optional synchronous callback (typically an LLM call)
+                invoked once with the failed results; skipped when everything passes
+
+        Returns:
+            Report with totals, duration and one result per case in input order
+        """
+        cases = _order_cases([dict(case) for case in cases])
+        for case in cases:
+            # Compile up front so malformed assertions fail the whole run early
+            case["_compiled"] = compile_assertions(case.get("assertions"))
+        context = dict(context or {})
+        loop = asyncio.get_event_loop()
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        pool = get_case_pool()
+        tasks: Dict[str, asyncio.Task] = {}
+        batch_started = time.perf_counter()
+
+        async def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+            result = {"id": case["id"], "name": case.get("name", case["id"]),
+                      "method": case.get("method", "GET").upper(), "passed": False}
+            deps = case.get("depends_on") or []
+            dep_results = await asyncio.gather(*(tasks[d] for d in deps))
+            failed_deps = [r["id"] for r in dep_results if not r["passed"]]
+            if failed_deps:
+                result.update(skipped=True, error=f"dependency failed: {', '.join(failed_deps)}")
+                return result
+
+            try:
+                url = render(case["url"], context)
+                request = {key: render(case.get(key), context) for key in ("headers", "params", "json", "data")}
+            except KeyError as e:
+                result.update(error=str(e.args[0]))
+                return result
+            result["url"] = url
+
+            host = urlparse(url).netloc
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+            try:
+                # Host slot first: cases queued on a saturated host must not hold global slots
+                async with host_limit, global_limit:
+                    response = await loop.run_in_executor(
+                        pool, self._send, result["method"], url, request)
+            except Exception as e:
+                result.update(error=f"request failed: {e}")
+                return result
+
+            try:
+                failures = self.check(case, response)
+            except Exception as e:
+                # A broken assertion fails its own case, not the whole run
+                failures = [f"assertion error: {e}"]
+            for name, path in (case.get("extract") or {}).items():
+                try:
+                    context[name] = lookup_path(response["body"], path)
+                except (KeyError, IndexError, TypeError):
+                    failures.append(f"could not extract '{name}' from '{path}'")
+            result.update(status_code=response["status_code"],
+                          elapsed_ms=response["elapsed_ms"],
+                          passed=not failures,
+                          response=response)
+            if failures:
+                result["failures"] = failures
+            return result
+
+        # Create every task first so dependents can await their dependencies
+        for case in cases:
+            tasks[case["id"]] = asyncio.ensure_future(run_case(case))
+        results = await asyncio.gather(*tasks.values())
+
+        for result in results:
+            # Keep the report compact; the body is only useful on failure
+            response = result.pop("response", None)
+            if response is not None and not result["passed"]:
+                result["response_body"] = response["body"]
+
+        passed = sum(1 for r in results if r["passed"])
+        skipped = sum(1 for r in results if r.get("skipped"))
+        report = {
+            "total": len(results),
+            "passed": passed,
+            "failed": len(results) - passed - skipped,
+            "skipped": skipped,
+            "duration_s": round(time.perf_counter() - batch_started, 3),
+            "results": list(results),
+            "review_calls": 0,
+        }
+
+        failed = [r for r in results if not r["passed"] and not r.get("skipped")]
+        if failed and review_failures is not None:
+            report["review_calls"] = 1
+            try:
+                report["review"] = await loop.run_in_executor(None, review_failures, failed)
+            except Exception as e:
+                logger.error(f"Failure review failed: {e}")
+                report["review"] = f"Failure review failed: {e}"
+        return report
+
+
+def execute_cases(cases: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+    """Synchronous wrapper around CaseExecutor.run for tools and scripts."""
+    context = kwargs.pop("context", None)
+    review_failures = kwargs.pop("review_failures", None)
+    return asyncio.run(CaseExecutor(**kwargs).run(cases, context, review_failures))
@@ -0,0 +1,419 @@
+"""
+Change-impact index for differential re-testing.
+
+A supervisor regression run used to regenerate and execute the whole suite
+even when a single swagger operation or BRD section had changed. This
+module keeps, per suite, a snapshot of the last run and re-tests only what
+a change can affect:
+
+- Fingerprints: one hash per swagger operation (dereferenced, so a changed
+  shared definition changes every operation using it) plus one for the
+  global parts (host, base path, security), and one hash per BRD section
+  (whitespace-normalized, so re-extracted PDFs do not count as changes)
+- Impact index: each case maps to the swagger operations its method and URL
+  match and to the BRD sections it covers ("brd_sections" on the case, or
+  sections that mention its endpoint)
+- Diff: added / changed / removed operations and sections since the snapshot
+
+run_differential() then regenerates swagger cases only for changed
+operations, asks an optional callback (the supervisor LLM) for new
+business-rule cases only for changed BRD sections, executes the affected
+cases plus their dependencies and reuses the previous results of everything
+else. The first run of a suite, a change to the global swagger parts or
+full=True fall back to a complete run.
+
+Environment variables:
+    CHANGE_IMPACT_DIR   Snapshot directory (default: cache/change_impact)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from swagger_cases import HTTP_METHODS, deref, generate_cases
+
+logger = logging.getLogger(__name__)
+
+CHANGE_IMPACT_DIR = os.getenv("CHANGE_IMPACT_DIR", os.path.join("cache", "change_impact"))
+
+# Bump when the snapshot layout changes; older snapshots trigger a full run
+SNAPSHOT_VERSION = 1
+# Fingerprint key of the swagger parts every operation depends on
+GLOBAL_KEY = "*"
+PREAMBLE_SECTION = "(preamble)"
+
+_GLOBAL_FIELDS = ("host", "basePath", "schemes", "servers", "security", "securityDefinitions")
+# Markdown headings, numbered headings ("3.2 Sort override rules") and short upper-case titles
+_HEADING = re.compile(
+    r"^\s*(?:#{1,6}\s+(?P<md>\S.*?)|(?P<num>\d+(?:\.\d+)*\.?\s+[A-Z].{0,100}?)|(?P<caps>[A-Z][A-Z0-9 /&(),\-]{3,80}))\s*$")
+_WHITESPACE = re.compile(r"\s+")
+_LEADING_PLACEHOLDER = re.compile(r"^\{\{[^}]+\}\}")
+
+
+def _digest(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def operation_key(method: str, path: str) -> str:
+    return f"{method.upper()} {path}"
+
+
+def swagger_fingerprints(spec: Dict[str, Any]) -> Dict[str, str]:
+    """One hash per operation ("METHOD /path") plus GLOBAL_KEY for document-wide settings."""
+    global_parts = {field: spec.get(field) for field in _GLOBAL_FIELDS}
+    global_parts["securitySchemes"] = (spec.get("components") or {}).get("securitySchemes")
+    fingerprints = {GLOBAL_KEY: _digest(global_parts)}
+    for path, path_item in (spec.get("paths") or {}).items():
+        shared = deref(spec, path_item.get("parameters", []))
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if operation:
+                fingerprints[operation_key(method, path)] = _digest(
+                    {"parameters": shared, "operation": deref(spec, operation)})
+    return fingerprints
+
+
+def split_brd_sections(text: str) -> Dict[str, str]:
+    """Split BRD text into {heading: body}; text before the first heading is the preamble."""
+    sections: Dict[str, List[str]] = {}
+    current = PREAMBLE_SECTION
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            heading = _normalize(match.group("md") or match.group("num") or match.group("caps"))
+            current, count = heading, 2
+            while current in sections:
+                current = f"{heading} ({count})"
+                count += 1
+            sections[current] = []
+        else:
+            sections.setdefault(current, []).append(line)
+    return {heading: "\n".join(lines).strip() for heading, lines in sections.items()
+            if heading != PREAMBLE_SECTION or "".join(lines).strip()}
+
+
+def brd_fingerprints(sections: Dict[str, str]) -> Dict[str, str]:
+    """One hash per BRD section (see split_brd_sections)."""
+    return {heading: _digest(_normalize(body)) for heading, body in sections.items()}
+
+
+def diff_fingerprints(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+    return {
+        "added": sorted(set(new) - set(old)),
+        "changed": sorted(key for key in set(new) & set(old) if new[key] != old[key]),
+        "removed": sorted(set(old) - set(new)),
+    }
+
+
+def _segments(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+def _case_path(url: str) -> str:
+    """Path of a case URL, ignoring a leading {{env.BASE_URL}} placeholder and the query string."""
+    url = _LEADING_PLACEHOLDER.sub("", url or "")
+    if "://" in url:
+        url = url.split("://", 1)[1]
+        url = url[url.find("/"):] if "/" in url else "/"
+    return url.split("?", 1)[0].rstrip("/") or "/"
+
+
+class ImpactIndex:
+    """Maps test cases to the swagger operations and BRD sections they exercise."""
+
+    def __init__(self, operations: List[str], sections: Dict[str, str]):
+        self._templates = []
+        for key in operations:
+            if key != GLOBAL_KEY:
+                method, path = key.split(" ", 1)
+                self._templates.append((method, _segments(path), key))
+        self._sections = {heading: body.lower() for heading, body in sections.items()}
+
+    def endpoints(self, case: Dict[str, Any]) -> List[str]:
+        if case.get("operation"):
+            return [case["operation"]]
+        method = (case.get("method") or "GET").upper()
+        path = _segments(_case_path(case.get("url", "")))
+        best, best_rank = None, (0, 0)
+        for template_method, template, key in self._templates:
+            # Compared from the end, so base paths on either side (basePath, the base URL
+            # variable) do not matter; literal segments must match, {params} match anything
+            length = min(len(path), len(template))
+            if template_method != method or not length:
+                continue
+            pairs = zip(template[-length:], path[-length:])
+            if all(t == p or t.startswith("{") for t, p in pairs):
+                literals = sum(1 for t in template[-length:] if not t.startswith("{"))
+                if literals and (literals, length) > best_rank:
+                    best, best_rank = key, (literals, length)
+        return [best] if best else []
+
+    def sections(self, case: Dict[str, Any]) -> List[str]:
+        if case.get("brd_sections"):
+            return [s for s in case["brd_sections"] if s in self._sections] or list(case["brd_sections"])
+        segments = [s.lower() for s in _case_path(case.get("url", "")).split("/")
+                    if len(s) > 3 and not s.startswith("{") and not s.isdigit()]
+        if not segments:
+            return []
+        # Sections naming the most specific path segment of the endpoint
+        return sorted(h for h, body in self._sections.items() if segments[-1] in body)
+
+    def build(self, cases: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, List[str]]]:
+        return {case_id: {"endpoints": self.endpoints(case), "brd_sections": self.sections(case)}
+                for case_id, case in cases.items()}
+
+
+class SnapshotStore:
+    """Last-run snapshots (fingerprints, cases, impact index, results), one JSON file per suite."""
+
+    def __init__(self, directory: str = CHANGE_IMPACT_DIR):
+        self.directory = directory
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def lock(self, suite: str) -> asyncio.Lock:
+        """Serializes runs of one suite (runs are driven from the server's event loop)."""
+        return self._locks.setdefault(suite, asyncio.Lock())
+
+    def _path(self, suite: str) -> str:
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', suite)}.json")
+
+    def load(self, suite: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(suite), "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return snapshot if snapshot.get("version") == SNAPSHOT_VERSION else None
+
+    def save(self, suite: str, snapshot: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(suite)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(tmp_path, path)
+
+
+def _with_dependencies(case_ids: Set[str], cases: Dict[str, Dict[str, Any]]) -> Set[str]:
+    selected, pending = set(), list(case_ids)
+    while pending:
+        case_id = pending.pop()
+        if case_id in selected or case_id not in cases:
+            continue
+        selected.add(case_id)
+        pending.extend(cases[case_id].get("depends_on") or [])
+    return selected
+
+
+async def run_differential(
+    executor,
+    suite: str,
+    spec: Dict[str, Any],
+    brd_text: Optional[str] = None,
+    cases: Optional[List[Dict[str, Any]]] = None,
+    generate_options: Optional[Dict[str, Any]] = None,
+    regenerate_brd: Optional[Callable[[Dict[str, str]], List[Dict[str, Any]]]] = None,
+    context: Optional[Dict[str, Any]] = None,
+    review_failures: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    full: bool = False,
+    rerun_failed: bool = True,
+    dry_run: bool = False,
+    store: Optional["SnapshotStore"] = None,
+) -> Dict[str, Any]:
+    """
+    Re-test only what changed since the suite's last run.
+
+    Args:
+        executor: CaseExecutor used for the affected cases
+        suite: Snapshot name (one per swagger/BRD pair)
+        spec: Current swagger document
+        brd_text: Current BRD text; None keeps the previous BRD fingerprints
+        cases: Hand-written or LLM cases to add or update (matched by id)
+        generate_options: Extra generate_cases arguments (url, auth_headers, auth_case_id)
+        regenerate_brd: Synchronous callback returning new cases for {heading: text}
+            of the changed BRD sections (typically a supervisor LLM call)
+        context: Optional initial placeholder values for the executor
+        review_failures: Passed through to the executor
+        full: Ignore the snapshot and run everything
+        rerun_failed: Also execute cases that failed or were skipped last time
+        dry_run: Plan only; nothing is generated by the LLM, executed or saved
+
+    Returns:
+        Report with the diff, the plan and the merged per-case results
+    """
+    store = store or get_snapshot_store()
+    generate_options = generate_options or {}
+    started = time.perf_counter()
+
+    async with store.lock(suite):
+        previous = store.load(suite)
+        old_swagger = (previous or {}).get("swagger", {})
+        old_brd = (previous or {}).get("brd", {})
+        swagger_prints = swagger_fingerprints(spec)
+        sections = split_brd_sections(brd_text) if brd_text is not None else {}
+        brd_prints = brd_fingerprints(sections) if brd_text is not None else old_brd
+        swagger_diff = diff_fingerprints(old_swagger, swagger_prints)
+        brd_diff = diff_fingerprints(old_brd, brd_prints)
+        rebuild = full or previous is None
+        # Host, base path or security changes invalidate every swagger case but no BRD section
+        full_run = rebuild or GLOBAL_KEY in swagger_diff["changed"]
+
+        suite_cases: Dict[str, Dict[str, Any]] = {c["id"]: c for c in (previous or {}).get("cases", [])}
+        old_cases = dict(suite_cases)
+        affected: Set[str] = set()
+
+        # Swagger cases: regenerate only the changed operations
+        changed_ops = set(swagger_prints) - {GLOBAL_KEY} if full_run else \
+            set(swagger_diff["added"] + swagger_diff["changed"])
+        gone_ops = set(swagger_diff["removed"]) | changed_ops
+        for case_id, case in list(suite_cases.items()):
+            if case.get("source") == "swagger" and case.get("operation") in gone_ops:
+                del suite_cases[case_id]
+        if changed_ops:
+            paths = sorted({key.split(" ", 1)[1] for key in changed_ops})
+            # operations= matches path substrings, so unchanged neighbours are filtered out here
+            for case in generate_cases(spec, operations=paths, **generate_options):
+                case["operation"] = _generated_operation(case, paths)
+                if case["operation"] in changed_ops:
+                    suite_cases[case["id"]] = case
+                    affected.add(case["id"])
+
+        # Caller supplied cases are new or updated when their content differs
+        for case in cases or []:
+            if not case.get("id"):
+                raise ValueError("Cases need an 'id' to be tracked across runs")
+            case = dict(case)
+            if full_run or _digest(old_cases.get(case["id"])) != _digest(case):
+                affected.add(case["id"])
+            suite_cases[case["id"]] = case
+
+        # BRD cases: drop the ones covering removed sections, regenerate changed ones
+        changed_sections = set(brd_prints) if rebuild and brd_text is not None else \
+            set(brd_diff["added"] + brd_diff["changed"])
+        regenerate = regenerate_brd is not None and not dry_run
+        replaced = set(brd_diff["removed"]) | (changed_sections if regenerate else set())
+        for case_id, case in list(suite_cases.items()):
+            covered = set(case.get("brd_sections") or [])
+            if case.get("source") == "brd" and covered and covered <= replaced:
+                del suite_cases[case_id]
+        regenerated = 0
+        if changed_sections and regenerate:
+            changed_text = {h: sections[h] for h in sorted(changed_sections)}
+            new_cases = await asyncio.get_event_loop().run_in_executor(None, regenerate_brd, changed_text)
+            for case in new_cases or []:
+                case = dict(case, source="brd")
+                base_id = case.get("id") or "brd-case"
+                case_id, count = base_id, 2
+                while case_id in suite_cases:
+                    case_id, count = f"{base_id}-{count}", count + 1
+                case["id"] = case_id
+                suite_cases[case_id] = case
+                affected.add(case_id)
+                regenerated += 1
+
+        index = ImpactIndex(list(swagger_prints), sections).build(suite_cases)
+        changed_endpoints = set(swagger_diff["changed"]) | set(swagger_diff["removed"]) | changed_ops
+        something_changed = bool(changed_endpoints or changed_sections or brd_diff["removed"] or affected)
+        previous_results = {r["id"]: r for r in (previous or {}).get("results", [])}
+        for case_id, impact in index.items():
+            if full_run or case_id not in previous_results:
+                affected.add(case_id)
+            elif changed_endpoints & set(impact["endpoints"]) or changed_sections & set(impact["brd_sections"]):
+                affected.add(case_id)
+            elif not impact["endpoints"] and not impact["brd_sections"] and something_changed:
+                # Nothing ties this case to a source, so any change may affect it
+                affected.add(case_id)
+            elif rerun_failed and not previous_results[case_id].get("passed"):
+                affected.add(case_id)
+        affected &= set(suite_cases)
+        to_run = _with_dependencies(affected, suite_cases)
+
+        plan = {
+            "full_run": full_run,
+            "swagger_diff": swagger_diff,
+            "brd_diff": brd_diff,
+            "total_cases": len(suite_cases),
+            "affected": sorted(affected),
+            "dependencies": sorted(to_run - affected),
+            "regenerated_swagger_operations": sorted(changed_ops),
+            "regenerated_brd_cases": regenerated,
+        }
+        logger.info(f"Differential run '{suite}': {len(to_run)}/{len(suite_cases)} cases to execute "
+                    f"(full: {full_run}, operations changed: {len(changed_endpoints)}, "
+                    f"sections changed: {len(changed_sections)})")
+        if dry_run:
+            plan["duration_s"] = round(time.perf_counter() - started, 3)
+            return {"suite": suite, "plan": plan}
+
+        ordered = [suite_cases[case_id] for case_id in suite_cases if case_id in to_run]
+        report = await executor.run(ordered, context, review_failures) if ordered else {
+            "results": [], "review_calls": 0}
+        executed = {r["id"]: r for r in report["results"]}
+        results = []
+        for case_id in suite_cases:
+            if case_id in executed:
+                results.append(executed[case_id])
+            elif case_id in previous_results:
+                results.append(dict(previous_results[case_id], reused=True))
+
+        store.save(suite, {
+            "version": SNAPSHOT_VERSION,
+            "suite": suite,
+            "updated_at": round(time.time(), 3),
+            "swagger": swagger_prints,
+            "brd": brd_prints,
+            "cases": list(suite_cases.values()),
+            "impact": index,
+            "results": results,
+        })
+
+    passed = sum(1 for r in results if r["passed"])
+    skipped = sum(1 for r in results if r.get("skipped"))
+    summary = {
+        "suite": suite,
+        "plan": plan,
+        "total": len(results),
+        "executed": len(executed),
+        "reused": len(results) - len(executed),
+        "passed": passed,
+        "failed": len(results) - passed - skipped,
+        "skipped": skipped,
+        "duration_s": round(time.perf_counter() - started, 3),
+        "results": results,
+        "review_calls": report.get("review_calls", 0),
+    }
+    if "review" in report:
+        summary["review"] = report["review"]
+    return summary
+
+
+def _generated_operation(case: Dict[str, Any], paths: List[str]) -> Optional[str]:
+    """Operation a generate_cases case was built from (its name starts with "METHOD /path:")."""
+    for path in sorted(paths, key=len, reverse=True):
+        if case.get("name", "").startswith(f"{case['method']} {path}:"):
+            return operation_key(case["method"], path)
+    return None
+
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Return the process-wide snapshot store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
@@ -0,0 +1,230 @@
+"""
+Compact chat history storage and paged rendering for the Streamlit frontends.
+
+Long test sessions used to keep every raw agent response in
+st.session_state and re-render the whole history on every rerun. Here:
+
+- Messages hold only role, display text and an optional reference to the raw
+  payload, which is written gzip-compressed under sessions/raw/
+- At most CHAT_MAX_MESSAGES stay in memory per session; older ones are
+  appended to an on-disk archive and loaded again only when paged into view
+- render_history() draws the newest CHAT_PAGE_SIZE messages and a
+  "Show older messages" button that pages further back; frontends that draw
+  the in-memory history themselves use render_archived() for the archive
+- Storage is keyed by session id; without one, browser_session_id() gives
+  each browser session its own id so archives are never shared
+- Archives and raw payloads untouched for CHAT_RETENTION_DAYS are deleted;
+  the sweep runs at most once an hour, piggybacking on append_message()
+
+Environment variables:
+    CHAT_HISTORY_DIR    Storage directory (default: sessions)
+    CHAT_MAX_MESSAGES   Messages kept in memory per session (default: 100)
+    CHAT_PAGE_SIZE      Messages rendered per page (default: 20)
+    CHAT_RETENTION_DAYS Days before an untouched archive or raw payload is deleted (default: 30)
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+CHAT_HISTORY_DIR = os.getenv("CHAT_HISTORY_DIR", "sessions")
+CHAT_MAX_MESSAGES = int(os.getenv("CHAT_MAX_MESSAGES", "100"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+CHAT_RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", "30"))
+
+# Page counters of render_history() and render_archived(), reset by clear_history()
+PAGE_KEYS = ("chat_history_pages", "chat_archive_pages")
+CLEANUP_INTERVAL = 3600.0
+
+logger = logging.getLogger(__name__)
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+
+def browser_session_id() -> str:
+    """Id of the current browser session, created on first use."""
+    if "chat_session_id" not in st.session_state:
+        st.session_state.chat_session_id = uuid.uuid4().hex
+    return st.session_state.chat_session_id
+
+
+def _safe(session_id: Optional[str]) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", session_id or browser_session_id())
+
+
+def store_raw_payload(session_id: str, payload: Any) -> str:
+    """Write a raw agent payload to disk and return its reference."""
+    ref = f"{_safe(session_id)}/{uuid.uuid4().hex}.json.gz"
+    path = os.path.join(CHAT_HISTORY_DIR, "raw", ref)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, default=str)
+    return ref
+
+
+def load_raw_payload(ref: str) -> Any:
+    """Load a raw payload previously written by store_raw_payload."""
+    with gzip.open(os.path.join(CHAT_HISTORY_DIR, "raw", ref), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_message(role: str, content: str, session_id: Optional[str] = None,
+                 raw: Any = None) -> Dict[str, Any]:
+    """Build a compact message; the raw payload (if any) is kept on disk."""
+    message = {"role": role, "content": content}
+    if raw is not None and raw != content:
+        message["raw_ref"] = store_raw_payload(session_id, raw)
+    return message
+
+
+def _archive_path(session_id: str) -> str:
+    return os.path.join(CHAT_HISTORY_DIR, "history", f"{_safe(session_id)}.jsonl")
+
+
+def cap_history(messages: List[Dict[str, Any]], session_id: str,
+                max_messages: int = CHAT_MAX_MESSAGES) -> int:
+    """
+    Move messages beyond max_messages from memory to the on-disk archive.
+
+    Mutates the list in place so it works with lists owned by session state.
+    Returns the number of messages archived by this call.
+    """
+    overflow = len(messages) - max_messages
+    if overflow <= 0:
+        return 0
+    path = _archive_path(session_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for message in messages[:overflow]:
+            f.write(json.dumps(message, default=str) + "\n")
+    del messages[:overflow]
+    return overflow
+
+
+def append_message(messages: List[Dict[str, Any]], message: Dict[str, Any], session_id: str,
+                   max_messages: int = CHAT_MAX_MESSAGES) -> None:
+    """Append a message and keep the in-memory history bounded."""
+    messages.append(message)
+    cap_history(messages, session_id, max_messages)
+    _maybe_cleanup()
+
+
+def cleanup_expired(max_age_days: float = CHAT_RETENTION_DAYS) -> int:
+    """Delete archives and raw payloads not modified for max_age_days; returns the files removed."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for root in (os.path.join(CHAT_HISTORY_DIR, "history"), os.path.join(CHAT_HISTORY_DIR, "raw")):
+        # Bottom-up, so directories emptied by the sweep can be removed too
+        for directory, _, files in os.walk(root, topdown=False):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+            if directory != root and not os.listdir(directory):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+    return removed
+
+
+def _maybe_cleanup() -> None:
+    global _last_cleanup
+    with _cleanup_lock:
+        if CHAT_RETENTION_DAYS <= 0 or time.time() - _last_cleanup < CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.time()
+    try:
+        removed = cleanup_expired()
+        if removed:
+            logger.info(f"Removed {removed} expired chat history files")
+    except Exception as e:
+        logger.warning(f"Chat history cleanup failed: {e}")
+
+
+def archived_count(session_id: str) -> int:
+    path = _archive_path(session_id)
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 16), b""))
+
+
+def load_archived(session_id: str, count: int) -> List[Dict[str, Any]]:
+    """Return the newest `count` archived messages for a session, oldest first."""
+    path = _archive_path(session_id)
+    if count <= 0 or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    return [json.loads(line) for line in lines[-count:]]
+
+
+def clear_history(messages: List[Dict[str, Any]], session_id: str) -> None:
+    """Drop in-memory messages, the session's archive, its raw payloads and the paging state."""
+    messages.clear()
+    path = _archive_path(session_id)
+    if os.path.exists(path):
+        os.remove(path)
+    shutil.rmtree(os.path.join(CHAT_HISTORY_DIR, "raw", _safe(session_id)), ignore_errors=True)
+    for key in PAGE_KEYS:
+        st.session_state.pop(key, None)
+
+
+def render_history(messages: List[Dict[str, Any]], session_id: str,
+                   page_size: int = CHAT_PAGE_SIZE, key: str = "chat_history") -> None:
+    """Render the newest page(s) of a chat history, with a button to page further back."""
+    pages_key = f"{key}_pages"
+    pages = st.session_state.get(pages_key, 1)
+    wanted = pages * page_size
+
+    visible = messages[-wanted:]
+    archived_needed = wanted - len(messages)
+    older = load_archived(session_id, archived_needed) if archived_needed > 0 else []
+    has_more = len(messages) > wanted or archived_count(session_id) > max(0, archived_needed)
+
+    if has_more and st.button("⬆️ Show older messages", key=f"{key}_older"):
+        st.session_state[pages_key] = pages + 1
+        st.rerun()
+
+    for message in older + visible:
+        _render_message(message, key)
+
+
+def render_archived(session_id: Optional[str], page_size: int = CHAT_PAGE_SIZE,
+                    key: str = "chat_archive") -> None:
+    """Render archived messages on demand, for frontends that draw the in-memory history themselves."""
+    total = archived_count(session_id)
+    if not total:
+        return
+    pages_key = f"{key}_pages"
+    shown = min(total, st.session_state.get(pages_key, 0) * page_size)
+
+    if shown < total and st.button(f"⬆️ Load older messages ({total - shown} archived)", key=f"{key}_older"):
+        st.session_state[pages_key] = st.session_state.get(pages_key, 0) + 1
+        st.rerun()
+
+    for message in load_archived(session_id, shown):
+        _render_message(message, key)
+
+
+def _render_message(message: Dict[str, Any], key: str) -> None:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        ref = message.get("raw_ref")
+        if ref and st.checkbox("Show raw response (debug)", key=f"{key}_raw_{ref}"):
+            st.json(load_raw_payload(ref))
@@ -6,6 +6,7 @@ Simple Chatbot Interface for JIRA Agent
 import streamlit as st
 import sys
 import os
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,6 +16,7 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.agent.jira_agent import create_jira_agent
+from chat_history import append_message, clear_history, make_message, render_history
 
 # Configure page
 st.set_page_config(
@@ -37,6 +39,14 @@ def initialize_chat():
     """Initialize chat history"""
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "chat_session_id" not in st.session_state:
+        st.session_state.chat_session_id = uuid.uuid4().hex
+
+def add_message(role, content, raw=None):
+    """Add a compact message to the bounded chat history"""
+    initialize_chat()
+    session_id = st.session_state.chat_session_id
+    append_message(st.session_state.messages, make_message(role, content, session_id, raw), session_id)
 
 def extract_response_text(response):
     """Extract clean text from agent response - handles complex nested structures"""
@@ -135,12 +145,13 @@ def main():
                 for question in questions:
                     if st.button(question, key=f"example_{question}"):
                         # Add the example question to chat
-                        st.session_state.messages.append({"role": "user", "content": question})
+                        add_message("user", question)
                         st.rerun()
         
         st.markdown("---")
         if st.button("🗑️ Clear Chat"):
-            st.session_state.messages = []
+            initialize_chat()
+            clear_history(st.session_state.messages, st.session_state.chat_session_id)
             st.rerun()
         
         # Debug section
@@ -158,15 +169,13 @@ def main():
     
     initialize_chat()
 
-    # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # Display only the newest page of chat messages
+    render_history(st.session_state.messages, st.session_state.chat_session_id)
 
     # Chat input
     if prompt := st.chat_input("Ask me about JIRA operations..."):
         # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message("user", prompt)
         
         # Display user message
         with st.chat_message("user"):
@@ -186,8 +195,8 @@ def main():
                     # Display the response
                     st.markdown(clean_response)
                     
-                    # Add to chat history
-                    st.session_state.messages.append({"role": "assistant", "content": clean_response})
+                    # Add to chat history; the raw response is kept on disk, not in session state
+                    add_message("assistant", clean_response, raw=raw_response)
                     
                     # Optional: Show raw response for debugging
                     if st.checkbox("Show raw response (debug)", key=f"debug_{len(st.session_state.messages)}"):
@@ -196,7 +205,7 @@ def main():
                 except Exception as e:
                     error_msg = f"Sorry, I encountered an error: {str(e)}"
                     st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                    add_message("assistant", error_msg)
                     
                     # Show the raw response for debugging
                     with st.expander("Debug Info"):
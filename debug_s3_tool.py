@@ -31,6 +31,12 @@ def test_s3_swagger_tool():
         print("-" * 60)
         print(result)
         print("-" * 60)
+
+        # Show how much the compaction stage would trim before the Bedrock call
+        from prompt_compaction import compact_tool_result
+        _, stats = compact_tool_result(result)
+        print(f"Compaction: {stats['bytes_before']} -> {stats['bytes_after']} bytes "
+              f"(~{stats['tokens_saved']} tokens saved)")
         
         # Check for specific endpoint patterns
         if "execute-api.us-west-2.amazonaws.com" in result:
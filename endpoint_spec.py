@@ -0,0 +1,445 @@
+"""
+Indexed parser for free-text endpoint specification documents.
+
+Documents like endpoint_ta_smartlinx.txt describe each endpoint as a block of
+"METHOD : URL" lines, params/headers lists, requirement notes and a full
+sample response, separated by "=====" rules and titled "[] <title>". Sending
+the whole document to the model costs tens of thousands of tokens although a
+task usually touches one or two endpoints. This module turns such a document
+into an index:
+
+- One entry per endpoint: method, path, query params, headers, notes
+- Auth dependencies: endpoints marked "Bearer Token : required" point at the
+  token endpoint of the document
+- Sample request/response bodies are reduced to inferred JSON schemas
+- Secrets (subscription keys, JWTs) are replaced by case_executor
+  placeholders before anything is stored or rendered
+
+The index is cached on disk under the sha256 of the document, so an
+unchanged document is parsed once. relevant_context() scores the entries
+against a task with keyword matching and renders only the best sections
+(plus the auth endpoint they depend on) as compact prompt text.
+
+Environment variables:
+    ENDPOINT_SPEC_PATH        Specification document (default: endpoint_ta_smartlinx.txt)
+    ENDPOINT_SPEC_CACHE_DIR   Index cache directory (default: cache/endpoint_spec)
+    ENDPOINT_SPEC_TOP_K       Sections added to a supervisor prompt (default: 3)
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from prompt_compaction import estimate_tokens, redact_tokens
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_SPEC_PATH = os.getenv("ENDPOINT_SPEC_PATH", "endpoint_ta_smartlinx.txt")
+ENDPOINT_SPEC_CACHE_DIR = os.getenv("ENDPOINT_SPEC_CACHE_DIR", os.path.join("cache", "endpoint_spec"))
+ENDPOINT_SPEC_TOP_K = int(os.getenv("ENDPOINT_SPEC_TOP_K", "3"))
+
+# Bump when the index layout changes so stale cache files are ignored
+INDEX_VERSION = 1
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+# Placeholders resolved by case_executor at run time
+BASE_URL_PLACEHOLDER = "{{env.SMARTLINX_API_BASE_URL}}"
+SECRET_PLACEHOLDERS = {"subscription-key": "{{env.SMARTLINX_SUBSCRIPTION_KEY}}"}
+MAX_EXAMPLE_LENGTH = 40
+# Matches scoring below this share of the best match are left out
+RELATIVE_SCORE_CUTOFF = 0.5
+
+_SECTION_RULE = re.compile(r"^\s*={5,}\s*$")
+_TITLE_LINE = re.compile(r"^\s*\[\s*\]\s*(.+?)\s*$")
+_ENDPOINT_LINE = re.compile(r"^\s*(%s)\s*:\s*(\S+)\s*$" % "|".join(HTTP_METHODS), re.IGNORECASE)
+_KEY_VALUE_LINE = re.compile(r"^\s*key\s*:\s*(.+?)\s*\|\s*value\s*:\s*(.*?)\s*$", re.IGNORECASE)
+_BEARER_LINE = re.compile(r"^\s*bearer\s+token\s*:\s*(\w+)", re.IGNORECASE)
+_SECRET_NAME = re.compile(r"key|token|secret|password", re.IGNORECASE)
+# Hand-trimmed samples: "{......" elisions and the trailing commas they leave
+_ELLIPSIS = re.compile(r"\.{3,}|\u2026")
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_WORD = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "be", "by", "for", "from", "get", "in", "is", "it", "of", "on",
+    "or", "the", "this", "to", "we", "will", "with", "api", "v1", "https", "http", "net", "endpoint",
+    "url", "what", "does", "which",
+}
+
+
+def document_sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _slug(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-") or "endpoint"
+
+
+def _mask(name: str, value: str) -> str:
+    if name.lower() in SECRET_PLACEHOLDERS:
+        return SECRET_PLACEHOLDERS[name.lower()]
+    if _SECRET_NAME.search(name):
+        return "<redacted>"
+    return redact_tokens(value)
+
+
+def infer_schema(value: Any) -> Dict[str, Any]:
+    """Infer a JSON schema from a sample value; array items are merged into one schema."""
+    if isinstance(value, dict):
+        return {"type": "object", "properties": {key: infer_schema(item) for key, item in value.items()}}
+    if isinstance(value, list):
+        items = None
+        for item in value:
+            items = _merge_schema(items, infer_schema(item))
+        schema = {"type": "array"}
+        if items is not None:
+            schema["items"] = items
+        return schema
+    if value is None:
+        return {"type": "null"}
+    if isinstance(value, bool):
+        schema = {"type": "boolean"}
+    elif isinstance(value, int):
+        schema = {"type": "integer"}
+    elif isinstance(value, float):
+        schema = {"type": "number"}
+    else:
+        schema = {"type": "string"}
+    text = redact_tokens(str(value))
+    if len(text) <= MAX_EXAMPLE_LENGTH:
+        schema["example"] = value if text == str(value) else text
+    return schema
+
+
+def _types(schema: Dict[str, Any]) -> List[str]:
+    value = schema.get("type", [])
+    return list(value) if isinstance(value, list) else [value]
+
+
+def _merge_schema(left: Optional[Dict[str, Any]], right: Dict[str, Any]) -> Dict[str, Any]:
+    if left is None:
+        return right
+    types = sorted(set(_types(left)) | set(_types(right)))
+    merged = {"type": types[0] if len(types) == 1 else types}
+    if "properties" in left or "properties" in right:
+        properties = dict(left.get("properties", {}))
+        for key, schema in right.get("properties", {}).items():
+            properties[key] = _merge_schema(properties.get(key), schema)
+        merged["properties"] = properties
+    if "items" in left or "items" in right:
+        merged["items"] = _merge_schema(left.get("items"), right["items"]) if "items" in right else left["items"]
+    if "example" in left:
+        merged["example"] = left["example"]
+    return merged
+
+
+def describe_schema(schema: Optional[Dict[str, Any]], depth: int = 0, max_depth: int = 4) -> str:
+    """Render a schema as a compact shape, e.g. {data: [{id: integer}], meta: null}."""
+    if not schema:
+        return "none"
+    types = [t for t in _types(schema) if t != "null"] or ["null"]
+    nullable = "?" if "null" in _types(schema) and types != ["null"] else ""
+    if "object" in types and schema.get("properties") is not None:
+        if depth >= max_depth:
+            return "{...}" + nullable
+        fields = ", ".join(f"{key}: {describe_schema(child, depth + 1, max_depth)}"
+                           for key, child in schema["properties"].items())
+        return "{" + fields + "}" + nullable
+    if "array" in types:
+        if not schema.get("items"):
+            return "[]" + nullable
+        return "[" + describe_schema(schema.get("items"), depth + 1, max_depth) + "]" + nullable
+    return "|".join(types) + nullable
+
+
+def _split_sections(lines: List[str]) -> List[List[Tuple[int, str]]]:
+    sections, current = [], []
+    for number, line in enumerate(lines, 1):
+        if _SECTION_RULE.match(line):
+            sections.append(current)
+            current = []
+        else:
+            current.append((number, line))
+    sections.append(current)
+    return sections
+
+
+def _read_json_block(section: List[Tuple[int, str]], start: int) -> Tuple[Optional[Any], int]:
+    """Collect lines from start until the brackets balance; returns (value, next index)."""
+    depth, block, index = 0, [], start
+    while index < len(section):
+        line = section[index][1]
+        block.append(line)
+        index += 1
+        # Brackets inside string values are rare in samples; a parse failure below covers them
+        depth += line.count("{") + line.count("[") - line.count("}") - line.count("]")
+        if depth <= 0:
+            break
+    text = "\n".join(block)
+    try:
+        return json.loads(text), index
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", _ELLIPSIS.sub("", text))), index
+    except json.JSONDecodeError as e:
+        logger.warning(f"Unparseable JSON sample at line {section[start][0]}: {e}")
+        return None, index
+
+
+def _parse_section(section: List[Tuple[int, str]]) -> Optional[Dict[str, Any]]:
+    entry = {
+        "title": None, "method": None, "url": None, "path": None, "query": {}, "headers": {},
+        "auth_required": False, "notes": [], "request_schema": None, "response_schema": None,
+        "line": section[0][0] if section else 0,
+    }
+    block, label, index = None, None, 0
+    while index < len(section):
+        number, line = section[index]
+        text = line.strip()
+        lowered = text.lower()
+        if not text:
+            index += 1
+            continue
+        if text[0] in "{[" and not _TITLE_LINE.match(text):
+            value, index = _read_json_block(section, index)
+            if value is not None:
+                # Samples without a label are responses, like the one under "[] direct url..."
+                target = "request_schema" if label == "payload" else "response_schema"
+                entry[target] = infer_schema(value)
+            label = None
+            continue
+        index += 1
+        title = _TITLE_LINE.match(text)
+        endpoint = _ENDPOINT_LINE.match(text)
+        key_value = _KEY_VALUE_LINE.match(text)
+        bearer = _BEARER_LINE.match(text)
+        if title and entry["title"] is None:
+            entry["title"] = title.group(1)
+        elif endpoint and entry["method"] is None:
+            entry["method"] = endpoint.group(1).upper()
+            url = urlsplit(endpoint.group(2))
+            entry["url"] = f"{url.scheme}://{url.netloc}{url.path}"
+            entry["path"] = url.path
+            for name, value in parse_qsl(url.query, keep_blank_values=True):
+                entry["query"][name] = _mask(name, value)
+        elif key_value:
+            name, value = key_value.groups()
+            target = "headers" if block == "headers" else "query"
+            entry[target][name] = _mask(name, value)
+        elif bearer:
+            entry["auth_required"] = bearer.group(1).lower() == "required"
+        elif lowered in ("params", "headers"):
+            block = lowered
+        elif lowered.startswith("payload"):
+            label = "payload"
+        elif lowered.startswith("response"):
+            label = "response"
+        else:
+            entry["notes"].append(redact_tokens(text))
+    if entry["method"] is None:
+        return None
+    entry["title"] = entry["title"] or f"{entry['method']} {entry['path']}"
+    return entry
+
+
+def _terms(text: str) -> List[str]:
+    words = [w.lower() for w in _WORD.findall(text or "")]
+    return [w for w in words if w not in _STOPWORDS and len(w) > 1]
+
+
+def _endpoint_terms(entry: Dict[str, Any]) -> Dict[str, float]:
+    """Weighted terms of one entry; title and path count double."""
+    weights: Dict[str, float] = {}
+
+    def add(text: str, weight: float) -> None:
+        for term in _terms(text):
+            weights[term] = weights.get(term, 0.0) + weight
+
+    add(entry["title"], 2.0)
+    add(entry["path"].replace("/", " "), 2.0)
+    add(" ".join(entry["notes"]), 1.0)
+    add(" ".join(entry["headers"]), 1.0)
+    add(" ".join(entry["query"]), 0.5)
+    for schema_key in ("request_schema", "response_schema"):
+        add(" ".join(_schema_fields(entry[schema_key])), 0.5)
+    return weights
+
+
+def _schema_fields(schema: Optional[Dict[str, Any]]) -> List[str]:
+    if not schema:
+        return []
+    fields = []
+    for key, child in (schema.get("properties") or {}).items():
+        fields.append(key)
+        fields.extend(_schema_fields(child))
+    fields.extend(_schema_fields(schema.get("items")))
+    return fields
+
+
+def parse_spec(text: str) -> Dict[str, Any]:
+    """
+    Parse a specification document into an index.
+
+    Returns:
+        Dict with sha, base_url, endpoints (see _parse_section) and per-endpoint terms
+    """
+    lines = text.splitlines()
+    endpoints = [entry for entry in map(_parse_section, _split_sections(lines)) if entry]
+
+    seen = {}
+    for entry in endpoints:
+        slug = _slug(entry["title"])
+        seen[slug] = seen.get(slug, 0) + 1
+        entry["id"] = slug if seen[slug] == 1 else f"{slug}-{seen[slug]}"
+
+    # The token endpoint is the one the document describes as issuing the bearer token
+    auth_ids = [e["id"] for e in endpoints if not e["auth_required"] and (
+        "auth" in e["path"].lower().split("/") or any("token" in n.lower() for n in e["notes"]))]
+    for entry in endpoints:
+        entry["depends_on"] = [i for i in auth_ids[:1] if i != entry["id"]] if entry["auth_required"] else []
+        entry["terms"] = _endpoint_terms(entry)
+
+    urls = [entry["url"] for entry in endpoints]
+    base_url = os.path.commonprefix(urls).rsplit("/", 1)[0] if len(urls) > 1 else ""
+    return {
+        "version": INDEX_VERSION,
+        "sha": document_sha(text),
+        "base_url": base_url,
+        "source_tokens": estimate_tokens(text),
+        "endpoints": endpoints,
+    }
+
+
+class EndpointSpecIndex:
+    """Parsed specification with keyword retrieval and prompt rendering."""
+
+    def __init__(self, index: Dict[str, Any]):
+        self.index = index
+        self.endpoints = index["endpoints"]
+        self._by_id = {entry["id"]: entry for entry in self.endpoints}
+        total = len(self.endpoints)
+        frequency: Dict[str, int] = {}
+        for entry in self.endpoints:
+            for term in entry["terms"]:
+                frequency[term] = frequency.get(term, 0) + 1
+        self._idf = {term: math.log(1 + total / count) for term, count in frequency.items()}
+
+    def get(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(endpoint_id)
+
+    def search(self, query: str, top_k: int = ENDPOINT_SPEC_TOP_K) -> List[Tuple[Dict[str, Any], float]]:
+        """Rank endpoints against a task; words glued together in paths match by substring."""
+        query_terms = set(_terms(query))
+        scored = []
+        for entry in self.endpoints:
+            score = 0.0
+            for term in query_terms:
+                if term in entry["terms"]:
+                    score += entry["terms"][term] * self._idf[term]
+                elif len(term) >= 4:
+                    partial = [t for t in entry["terms"] if term in t]
+                    score += 0.5 * sum(entry["terms"][t] * self._idf[t] for t in partial)
+            if entry["method"] and entry["method"].lower() in query_terms:
+                score += 0.5
+            if score > 0:
+                scored.append((entry, round(score, 3)))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        if scored:
+            cutoff = scored[0][1] * RELATIVE_SCORE_CUTOFF
+            scored = [pair for pair in scored if pair[1] >= cutoff]
+        return scored[:top_k]
+
+    def _relative_url(self, entry: Dict[str, Any]) -> str:
+        base = self.index["base_url"]
+        if base and entry["url"].startswith(base):
+            return BASE_URL_PLACEHOLDER + entry["url"][len(base):]
+        return entry["url"]
+
+    def render(self, entry: Dict[str, Any]) -> str:
+        lines = [f"### {entry['title']}", f"{entry['method']} {self._relative_url(entry)}"]
+        if entry["query"]:
+            lines.append("Query: " + ", ".join(f"{k}={v}" for k, v in entry["query"].items()))
+        if entry["headers"]:
+            lines.append("Headers: " + ", ".join(f"{k}: {v}" for k, v in entry["headers"].items()))
+        if entry["auth_required"]:
+            sources = [self._by_id[i]["title"] for i in entry["depends_on"]]
+            lines.append("Auth: Bearer {{token}}" + (f" from '{sources[0]}'" if sources else ""))
+        if entry["notes"]:
+            lines.append("Notes: " + " ".join(entry["notes"]))
+        if entry["request_schema"]:
+            lines.append("Request body: " + describe_schema(entry["request_schema"]))
+        if entry["response_schema"]:
+            lines.append("Response: " + describe_schema(entry["response_schema"]))
+        return "\n".join(lines)
+
+    def relevant_sections(self, query: str, top_k: int = ENDPOINT_SPEC_TOP_K) -> List[Dict[str, Any]]:
+        """Best matching endpoints, preceded by the auth endpoints they depend on."""
+        selected, ids = [], set()
+        for entry, _ in self.search(query, top_k):
+            for dependency in entry["depends_on"] + [entry["id"]]:
+                if dependency not in ids:
+                    ids.add(dependency)
+                    selected.append(self._by_id[dependency])
+        # Dependencies go first so the prompt reads in call order
+        return sorted(selected, key=lambda e: (bool(e["depends_on"]), self.endpoints.index(e)))
+
+    def relevant_context(self, query: str, top_k: int = ENDPOINT_SPEC_TOP_K) -> str:
+        """Prompt text for the sections relevant to a task ("" when nothing matches)."""
+        sections = self.relevant_sections(query, top_k)
+        if not sections:
+            return ""
+        header = "Relevant endpoint specification"
+        if self.index["base_url"]:
+            header += f" ({BASE_URL_PLACEHOLDER} = {self.index['base_url']})"
+        return header + ":\n\n" + "\n\n".join(self.render(entry) for entry in sections)
+
+
+def load_spec_index(path: str = ENDPOINT_SPEC_PATH,
+                    cache_dir: str = ENDPOINT_SPEC_CACHE_DIR) -> EndpointSpecIndex:
+    """Parse a specification document, reusing the on-disk index when its content is unchanged."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    sha = document_sha(text)
+    cache_path = os.path.join(cache_dir, f"{sha}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return EndpointSpecIndex(index)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    index = parse_spec(text)
+    logger.info(f"Indexed {len(index['endpoints'])} endpoints from {path}")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write endpoint spec index {cache_path}: {e}")
+    return EndpointSpecIndex(index)
+
+
+_indexes: Dict[str, Tuple[float, EndpointSpecIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_endpoint_spec(path: str = ENDPOINT_SPEC_PATH) -> Optional[EndpointSpecIndex]:
+    """Index of the specification at path, reloaded when the file changes (None if it is missing)."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load_spec_index(path))
+            _indexes[path] = cached
+        return cached[1]
@@ -0,0 +1,163 @@
+"""
+Fast JSON encoding and response compression for the agent servers.
+
+Agent results (full JIRA issues with attachments, swagger excerpts, batch
+NDJSON streams) can be several megabytes. The servers now:
+
+- Render responses with orjson (FastJSONResponse), falling back to a
+  compact json.dumps when orjson is not installed
+- Compress responses of at least COMPRESSION_MIN_SIZE bytes, using Brotli
+  when the client accepts it and the brotli package is installed, else gzip;
+  streamed responses are compressed chunk by chunk and flushed per chunk
+- Bodies or chunks of COMPRESSION_THREAD_MIN_SIZE bytes and more are
+  compressed on a worker thread so the event loop keeps serving requests
+
+requests (used by the Streamlit frontends) decodes gzip transparently and
+advertises br itself when brotli is installed on the client.
+
+Environment variables:
+    COMPRESSION_MIN_SIZE   Smallest body worth compressing in bytes (default: 1024)
+    GZIP_LEVEL             gzip compression level (default: 6)
+    BROTLI_QUALITY         Brotli quality; low values favour speed (default: 4)
+    COMPRESSION_THREAD_MIN_SIZE  Smallest body compressed off the event loop (default: 131072)
+"""
+
+import json
+import os
+from typing import Any
+
+import anyio.to_thread
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", str(128 * 1024)))
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize to compact JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder handles them
+            pass
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_line(value: Any) -> str:
+    """Serialize one NDJSON line."""
+    return dumps(value).decode("utf-8") + "\n"
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class _BrotliResponder:
+    """Compresses one response with Brotli (mirrors starlette's GZipResponder)."""
+
+    def __init__(self, app, minimum_size: int, quality: int,
+                 thread_minimum_size: int = COMPRESSION_THREAD_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_minimum_size = thread_minimum_size
+        self.compressor = brotli.Compressor(quality=quality)
+        self.start_message = None
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_brotli)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        chunk = self.compressor.process(body)
+        return chunk + (self.compressor.flush() if more_body else self.compressor.finish())
+
+    async def apply_compression(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            # Compressing large bodies inline would block the event loop
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    async def send_with_brotli(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = ("content-encoding" in headers
+                                or headers.get("content-type", "").startswith("text/event-stream"))
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            if not self.started and self.start_message is not None:
+                self.started = True
+                await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = "br"
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                compressed = await self.apply_compression(body, False)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        chunk = await self.apply_compression(body, more_body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    """Negotiates Brotli or gzip for responses above a size threshold."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, gzip_level: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and brotli is not None:
+            accept = Headers(scope=scope).get("accept-encoding", "")
+            if "br" in [part.split(";")[0].strip() for part in accept.split(",")]:
+                responder = _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+                await responder(scope, receive, send)
+                return
+        # GZipMiddleware checks Accept-Encoding itself and passes other requests through
+        await self.gzip(scope, receive, send)
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Depends, HTTPException, Request, Header, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import os
@@ -10,9 +11,16 @@ import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-# Import GitHub agent functions
-from src.agent import get_github_agent, get_execute_custom_task, get_execute_predefined_task
-from src.prompts.github_agent_prompt import PREDEFINED_TASKS
+from batch_query import stream_batch, validate_batch
+from fast_json import CompressionMiddleware, FastJSONResponse
+from bedrock_gateway import get_bedrock_gateway
+from session_store import prepare_session_query, record_session_turn
+from mcp_pool import get_mcp_pool
+from mcp_tool_cache import get_mcp_tool_cache, warm_mcp_tools
+from prompt_cache import get_prompt_cache_stats
+from prompt_compaction import get_compaction_stats
+from brd_cache import get_brd_cache
+from startup import Readiness, warm_aws_credentials
 
 # Configure logging
 logging.basicConfig(
@@ -24,10 +32,34 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Get GitHub agent functions using lazy loading - but only store the functions, not the instances
-get_agent_fn = get_github_agent
-get_execute_custom_task_fn = get_execute_custom_task
-get_execute_predefined_task_fn = get_execute_predefined_task
+# GitHub agent functions are imported in the background at startup (see load_agent_stack)
+# so the server starts listening before the agent stack is loaded - only the functions
+# are stored, not the instances
+get_agent_fn = None
+get_execute_custom_task_fn = None
+get_execute_predefined_task_fn = None
+PREDEFINED_TASKS = {}
+
+readiness = Readiness("github-agent")
+
+
+def load_agent_stack():
+    """Import the agent stack and pre-warm one agent so the first query is fast"""
+    global get_agent_fn, get_execute_custom_task_fn, get_execute_predefined_task_fn
+    from src.agent import get_github_agent, get_execute_custom_task, get_execute_predefined_task
+    from src.prompts.github_agent_prompt import PREDEFINED_TASKS as predefined_tasks
+
+    PREDEFINED_TASKS.update(predefined_tasks)
+    get_agent_fn = get_github_agent
+    get_execute_custom_task_fn = get_execute_custom_task
+    get_execute_predefined_task_fn = get_execute_predefined_task
+    try:
+        get_agent_fn()
+    except Exception as e:
+        # Requests create their own agents, so a failed warm-up is not fatal
+        logger.warning(f"GitHub agent warm-up failed: {str(e)}")
+        return "agent stack loaded (warm-up failed)"
+    return "agent ready"
 
 # Create a thread pool for running LLM operations in parallel
 # Adjust the max_workers based on your server's capacity
@@ -38,8 +70,12 @@ app = FastAPI(
     title="GitHub Agent API",
     description="API for querying the GitHub agent and executing predefined tasks",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
+# Large agent results are compressed (br/gzip) when the client accepts it
+app.add_middleware(CompressionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -59,6 +95,19 @@ class QueryRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    session_id: Optional[str] = None
+    max_parallel: int = 4
+    merge_size: int = 1
+
+
+class BRDRequest(BaseModel):
+    repo: str
+    path: str
+    ref: str = "main"
+
+
 class PredefinedTaskRequest(BaseModel):
     task_key: str
     session_id: Optional[str] = None
@@ -84,6 +133,29 @@ async def verify_token(x_api_token: str = Header(None)):
     return True
 
 
+# Agent endpoints wait for startup to finish instead of failing during warm-up
+async def require_ready():
+    if not await readiness.wait():
+        raise HTTPException(
+            status_code=503,
+            detail="Agent is not ready",
+        )
+    return True
+
+
+AGENT_DEPENDENCIES = ([Depends(verify_token)] if API_TOKEN else []) + [Depends(require_ready)]
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Load the agent stack and AWS credentials in parallel without blocking startup"""
+    readiness.start({
+        "agent": load_agent_stack,
+        "aws_credentials": warm_aws_credentials,
+        "mcp_tools": lambda: warm_mcp_tools(["github"]),
+    }, optional=("aws_credentials", "mcp_tools"))
+
+
 # Helper function to format response
 def format_response(result):
     """Format the response for better readability."""
@@ -130,7 +202,44 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
-@app.get("/tasks", dependencies=[Depends(verify_token)] if API_TOKEN else [])
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once the agent stack is loaded, 503 while warming up"""
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/metrics/compaction")
+async def compaction_metrics():
+    """Bytes and estimated tokens saved by prompt/tool-result compaction"""
+    return get_compaction_stats()
+
+
+@app.get("/metrics/mcp-tools")
+async def mcp_tool_metrics():
+    """Cached MCP tool schemas and cache hit/refresh counters"""
+    return get_mcp_tool_cache().status()
+
+
+@app.get("/metrics/mcp-pool")
+async def mcp_pool_metrics():
+    """Live MCP sessions, in-flight calls and handshake/call latency per endpoint"""
+    return get_mcp_pool().metrics()
+
+
+@app.get("/metrics/bedrock")
+async def bedrock_metrics():
+    """Per-model admission, throttling and retry-budget state of the Bedrock gateway"""
+    return get_bedrock_gateway().metrics()
+
+
+@app.get("/metrics/prompt-cache")
+async def prompt_cache_metrics():
+    """Bedrock prompt cache hit rate and tokens read from the cache"""
+    return get_prompt_cache_stats()
+
+
+@app.get("/tasks", dependencies=AGENT_DEPENDENCIES)
 async def list_tasks():
     """Get a list of all predefined tasks available in the GitHub agent"""
     tasks = {}
@@ -143,7 +252,7 @@ async def list_tasks():
     }
 
 
-@app.post("/query", dependencies=[Depends(verify_token)] if API_TOKEN else [])
+@app.post("/query", dependencies=AGENT_DEPENDENCIES)
 async def query(request: QueryRequest):
     """Execute a custom query using the GitHub agent"""
     try:
@@ -158,22 +267,27 @@ async def query(request: QueryRequest):
         # Get a fresh execute_custom_task function for each request
         execute_custom_task = get_execute_custom_task_fn()
 
+        # Session history lives in the session store and the agent is sent a
+        # bounded window of it. Store reads and writes may hit Redis or SQLite,
+        # so they run on the thread pool too
+        prompt = await asyncio.get_event_loop().run_in_executor(
+            thread_pool, prepare_session_query, request.session_id, request.query)
+
         # Run the agent in a separate thread to avoid blocking the event loop
         # This allows multiple requests to be processed concurrently
-        if request.session_id:
-            raw_response = await asyncio.get_event_loop().run_in_executor(
-                thread_pool,
-                lambda: execute_custom_task(request.query, request.session_id)
-            )
-        else:
-            raw_response = await asyncio.get_event_loop().run_in_executor(
-                thread_pool,
-                lambda: execute_custom_task(request.query)
-            )
+        raw_response = await asyncio.get_event_loop().run_in_executor(
+            thread_pool,
+            # The agent keeps its own state per session id, so users never share one conversation
+            lambda: execute_custom_task(prompt, request.session_id) if request.session_id
+            else execute_custom_task(prompt)
+        )
 
         if not raw_response:
             return {"message": "No response received from the agent."}
 
+        await asyncio.get_event_loop().run_in_executor(
+            thread_pool, record_session_turn, request.session_id, request.query, raw_response)
+
         # Format the response for better readability
         response = format_response(raw_response)
 
@@ -191,7 +305,86 @@ async def query(request: QueryRequest):
             status_code=500, detail=f"Error processing query: {str(e)}")
 
 
-@app.post("/tasks/{task_key}", dependencies=[Depends(verify_token)] if API_TOKEN else [])
+@app.post("/query/batch", dependencies=AGENT_DEPENDENCIES)
+async def query_batch(request: BatchQueryRequest):
+    """Execute a batch of custom queries concurrently, streaming NDJSON results in completion order"""
+    error = validate_batch(request.queries, request.max_parallel, request.merge_size)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    logger.info(
+        f"Processing batch of {len(request.queries)} queries "
+        f"(parallel: {request.max_parallel}, merge: {request.merge_size}, session: {request.session_id})")
+
+    # One agent factory call per batch instead of one per query
+    execute_custom_task = get_execute_custom_task_fn()
+
+    def run_query(query_text, session_id):
+        # Like /query, history comes from the session store: items read the
+        # parent session for context and record their turn under the derived
+        # per-item id, so concurrent items never interleave in one conversation
+        prompt = prepare_session_query(request.session_id, query_text)
+        # The agent keeps its own state per session id; items use their derived id
+        raw_response = execute_custom_task(prompt, session_id) if session_id else execute_custom_task(prompt)
+        if raw_response:
+            record_session_turn(session_id, query_text, raw_response)
+        return raw_response
+
+    return StreamingResponse(
+        stream_batch(
+            request.queries,
+            run_query,
+            thread_pool,
+            session_id=request.session_id,
+            max_parallel=request.max_parallel,
+            merge_size=request.merge_size,
+            format_result=format_response,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/brd", dependencies=[Depends(verify_token)] if API_TOKEN else [])
+async def fetch_brd(request: BRDRequest):
+    """Return the text of a BRD document, served from the content-hash cache when unchanged"""
+    try:
+        start_time = time.time()
+        brd = await asyncio.get_event_loop().run_in_executor(
+            thread_pool,
+            lambda: get_brd_cache().get_text(request.repo, request.path, request.ref)
+        )
+        logger.info(
+            f"BRD {request.repo}/{request.path}@{request.ref} served via {brd['source']} (sha: {brd['sha'][:8]})")
+        return {
+            **brd,
+            "execution_time": round(time.time() - start_time, 2),
+            "cache": get_brd_cache().stats,
+        }
+    except Exception as e:
+        logger.error(f"Error fetching BRD: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching BRD: {str(e)}")
+
+
+@app.post("/brd/pages", dependencies=[Depends(verify_token)] if API_TOKEN else [])
+async def stream_brd_pages(request: BRDRequest):
+    """Stream a BRD document page by page as NDJSON while PDF extraction runs in parallel"""
+    pages = get_brd_cache().iter_pages(request.repo, request.path, request.ref)
+    loop = asyncio.get_event_loop()
+
+    async def page_lines():
+        while True:
+            # Pull each page in the thread pool so extraction never blocks the event loop
+            item = await loop.run_in_executor(thread_pool, next, pages, None)
+            if item is None:
+                break
+            page, text = item
+            yield json.dumps({"page": page, "text": text}) + "\n"
+
+    return StreamingResponse(page_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/tasks/{task_key}", dependencies=AGENT_DEPENDENCIES)
 async def run_predefined_task(task_key: str, request: PredefinedTaskRequest):
     """Execute a predefined task using the GitHub agent"""
     try:
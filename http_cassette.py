@@ -0,0 +1,312 @@
+"""
+Record/replay of HTTP traffic for SmartLinx and agent backends.
+
+A cassette is a transport adapter mounted on a requests.Session. In record
+mode real responses are passed through and saved; in replay mode matching
+requests are answered from disk without touching the network, so test
+generation and benchmark runs are fast, offline and reproducible.
+
+Interactions are indexed by method, URL (query parameters sorted, volatile
+ones such as subscription-key dropped) and a normalized body (JSON re-dumped
+with sorted keys). Each cassette is one gzip-compressed JSON-lines file;
+repeated identical requests are replayed in recorded order. There is one
+Cassette per file in a process (get_cassette); worker processes append to
+the file under a file lock and pick up each other's recordings on a miss. Secrets are not
+written to disk: JSON fields named like passwords or tokens and JWTs in
+request and response bodies are redacted, and binary bodies (BRD PDFs) are
+stored base64-encoded. Replayed tokens are placeholders, which is enough
+because headers are not part of the match key.
+
+Environment variables:
+    HTTP_CASSETTE_MODE       off | record | replay | auto (default: off)
+                             auto replays known requests and records new ones
+    HTTP_CASSETTE_PATH       Cassette file (default: cache/cassettes/default.jsonl.gz)
+    HTTP_CASSETTE_EXHAUSTED  repeat | miss (default: repeat); what a request gets once
+                             its recorded interactions are used up: the last one again,
+                             or a miss (CassetteMiss in replay mode, a new recording in auto)
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+
+from prompt_compaction import redact_tokens
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several processes are not coordinated
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_CASSETTE_MODE = os.getenv("HTTP_CASSETTE_MODE", "off").lower()
+HTTP_CASSETTE_PATH = os.getenv("HTTP_CASSETTE_PATH", os.path.join("cache", "cassettes", "default.jsonl.gz"))
+HTTP_CASSETTE_EXHAUSTED = os.getenv("HTTP_CASSETTE_EXHAUSTED", "repeat").lower()
+
+# Query parameters and headers that carry secrets
+IGNORED_PARAMS = {"subscription-key", "sig", "signature", "api_key", "access_token"}
+REDACTED_HEADERS = {"authorization", "ocp-apim-subscription-key", "x-api-token", "cookie", "set-cookie"}
+# JSON body fields whose values are replaced before a body is written to disk
+REDACTED_FIELDS = {"password", "passwd", "secret", "client_secret", "token", "access_token",
+                   "refresh_token", "api_key", "apikey", "subscription-key"}
+REDACTED = "<redacted>"
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Raised in replay mode when no recorded interaction matches a request."""
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip("/") or "/",
+                       urlencode(query), ""))
+
+
+def normalize_body(body: Any) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return str(body)
+
+
+def _redact_fields(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: REDACTED if k.lower() in REDACTED_FIELDS and v not in (None, "")
+                else _redact_fields(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_fields(v) for v in value]
+    return value
+
+
+def redact_body(text: str) -> str:
+    """Remove credentials from a text body before it is stored."""
+    try:
+        text = json.dumps(_redact_fields(json.loads(text)), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        pass
+    return redact_tokens(text)
+
+
+def encode_body(content: bytes) -> Tuple[str, Optional[str]]:
+    """Return (stored body, encoding); text is redacted, binary content is base64-encoded."""
+    try:
+        return redact_body(content.decode("utf-8")), None
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode("ascii"), "base64"
+
+
+def request_key(method: str, url: str, body: Any) -> str:
+    """Stable index key for a request."""
+    material = "\n".join([method.upper(), normalize_url(url), normalize_body(body)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """On-disk store of recorded interactions."""
+
+    def __init__(self, path: str = HTTP_CASSETTE_PATH, exhausted: str = HTTP_CASSETTE_EXHAUSTED):
+        if exhausted not in ("repeat", "miss"):
+            raise ValueError(f"Unknown cassette exhaustion policy '{exhausted}'")
+        self.path = path
+        self.exhausted = exhausted
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._seen: set = set()
+        self._offset = 0
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0, "exhausted": 0}
+        self._load()
+
+    def _load(self) -> None:
+        self._read_new()
+        logger.info(f"Loaded {len(self)} interactions from {self.path}")
+
+    def _read_new(self) -> int:
+        """Index gzip members appended since the last read (by any process); returns the count."""
+        try:
+            if os.path.getsize(self.path) <= self._offset:
+                return 0
+            with open(self.path, "rb") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        self._offset += len(data)
+        added = 0
+        for line in gzip.decompress(data).decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            # Our own appends come back on the next read; skip them by id
+            if entry.get("id") in self._seen:
+                continue
+            if entry.get("id"):
+                self._seen.add(entry["id"])
+            self._interactions.setdefault(entry["key"], []).append(entry)
+            added += 1
+        return added
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._interactions.values())
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key not in self._interactions:
+                # Another worker process may have recorded it since we loaded
+                self._read_new()
+            entries = self._interactions.get(key)
+            if not entries:
+                self.stats["misses"] += 1
+                return None
+            index = self._cursor.get(key, 0)
+            # Repeated requests replay in recorded order
+            if index >= len(entries):
+                self.stats["exhausted"] += 1
+                if self.exhausted == "miss":
+                    self.stats["misses"] += 1
+                    return None
+                if index == len(entries):
+                    logger.warning(f"Recorded interactions exhausted for {entries[-1].get('method')} "
+                                   f"{entries[-1].get('url')}; repeating the last one")
+            self._cursor[key] = index + 1
+            self.stats["hits"] += 1
+            return entries[min(index, len(entries) - 1)]
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        entry = dict(entry, id=uuid.uuid4().hex)
+        with self._lock:
+            self._seen.add(entry["id"])
+            entries = self._interactions.setdefault(entry["key"], [])
+            entries.append(entry)
+            # A recording made after exhaustion is the next one to replay
+            self._cursor[entry["key"]] = len(entries)
+            self.stats["recorded"] += 1
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # gzip members can be appended; readers see one continuous stream.
+            # The lock keeps members from several processes from interleaving
+            member = gzip.compress((json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8"))
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(member)
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter that records or replays through a Cassette."""
+
+    def __init__(self, cassette: Cassette, mode: str = "replay", **kwargs):
+        super().__init__(**kwargs)
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.cassette = cassette
+        self.mode = mode
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        key = request_key(request.method, request.url, request.body)
+        if self.mode in ("replay", "auto"):
+            entry = self.cassette.lookup(key)
+            if entry is not None:
+                return self._build_response(request, entry)
+            if self.mode == "replay":
+                raise CassetteMiss(f"No recorded interaction for {request.method} {normalize_url(request.url)}",
+                                   request=request)
+
+        response = super().send(request, **kwargs)
+        body, body_encoding = encode_body(response.content)
+        request_body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        self.cassette.record({
+            "key": key,
+            "method": request.method,
+            "url": normalize_url(request.url),
+            "request_body": encode_body(request_body)[0] if request_body else "",
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items()
+                        if k.lower() not in REDACTED_HEADERS
+                        and k.lower() not in ("content-encoding", "transfer-encoding", "content-length")},
+            "body": body,
+            "body_encoding": body_encoding,
+            "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+        })
+        return response
+
+    def _build_response(self, request: PreparedRequest, entry: Dict[str, Any]) -> Response:
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        if entry.get("body_encoding") == "base64":
+            content = base64.b64decode(entry["body"])
+        else:
+            content = entry["body"].encode("utf-8")
+        # Fully read, as after a non-streamed request; raw serves stream=True readers
+        response._content = content
+        response._content_consumed = True
+        response.raw = io.BytesIO(content)
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: Optional[str] = None) -> Cassette:
+    """The process-wide Cassette for a file, shared by every session that mounts it."""
+    path = os.path.abspath(path or HTTP_CASSETTE_PATH)
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path)
+            _cassettes[path] = cassette
+        return cassette
+
+
+def install_cassette(session: requests.Session, mode: Optional[str] = None,
+                     path: Optional[str] = None, **adapter_kwargs) -> Optional[Cassette]:
+    """
+    Mount a cassette on a session according to HTTP_CASSETTE_MODE.
+
+    Returns the Cassette, or None when cassettes are off.
+    """
+    mode = (mode or HTTP_CASSETTE_MODE).lower()
+    if mode in ("", "off"):
+        return None
+    cassette = get_cassette(path)
+    adapter = CassetteAdapter(cassette, mode, **adapter_kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logger.info(f"HTTP cassette in {mode} mode ({len(cassette)} recorded interactions)")
+    return cassette
+
+
+def cassette_session(mode: str, path: Optional[str] = None) -> Tuple[requests.Session, Optional[Cassette]]:
+    """Create a new session with a cassette mounted, for scripts and benchmarks."""
+    session = requests.Session()
+    return session, install_cassette(session, mode, path)
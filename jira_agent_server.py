@@ -6,11 +6,20 @@ FastAPI Server for JIRA Agent
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import time
-from src.agent.jira_agent import create_jira_agent
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import uvicorn
+from typing import Optional, Dict, Any, List
+from batch_query import stream_batch, validate_batch
+from fast_json import CompressionMiddleware, FastJSONResponse
+from bedrock_gateway import get_bedrock_gateway
+from session_store import prepare_session_query, record_session_turn
+from mcp_pool import get_mcp_pool
+from mcp_tool_cache import get_mcp_tool_cache, warm_mcp_tools
+from prompt_cache import get_prompt_cache_stats
+from prompt_compaction import get_compaction_stats
+from query_router import QueryRouter
+from startup import Readiness, warm_aws_credentials
 import logging
 import sys
 import os
@@ -26,12 +35,23 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="JIRA Agent Server",
     description="FastAPI server for JIRA Agent with MCP tools integration",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
+# Large agent results are compressed (br/gzip) when the client accepts it
+app.add_middleware(CompressionMiddleware)
+
 # Initialize single agent
 jira_agent = None
 
+readiness = Readiness("jira-agent")
+
+# Direct issue/project lookups skip the agent loop (see query_router)
+query_router = QueryRouter(
+    "JIRA agent", tool_server="jira",
+    capabilities="It looks up, searches, creates and comments on JIRA issues and projects.")
+
 
 # Match Snowflake agent's request model
 class QueryRequest(BaseModel):
@@ -39,17 +59,31 @@ class QueryRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    session_id: Optional[str] = None
+    max_parallel: int = 4
+    merge_size: int = 1
+
+
+def initialize_agent():
+    """Import the agent stack and create the agent (runs in a startup thread)"""
+    global jira_agent
+    logger.info("Initializing JIRA Agent...")
+    from src.agent.jira_agent import create_jira_agent
+    jira_agent = create_jira_agent()
+    logger.info("JIRA Agent initialized successfully")
+    return "agent ready"
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize agent on startup"""
-    global jira_agent
-    try:
-        logger.info("Initializing JIRA Agent...")
-        jira_agent = create_jira_agent()
-        logger.info("JIRA Agent initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize agent: {e}")
-        raise
+    """Initialize agent and AWS credentials in parallel, without blocking startup"""
+    readiness.start({
+        "agent": initialize_agent,
+        "aws_credentials": warm_aws_credentials,
+        "mcp_tools": lambda: warm_mcp_tools(["jira"]),
+    }, optional=("aws_credentials", "mcp_tools"))
 
 
 @app.get("/health")
@@ -58,6 +92,49 @@ async def health_check():
     return {"status": "healthy", "service": "jira-agent"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once the agent is initialized, 503 while warming up"""
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/metrics/compaction")
+async def compaction_metrics():
+    """Bytes and estimated tokens saved by prompt/tool-result compaction"""
+    return get_compaction_stats()
+
+
+@app.get("/metrics/mcp-tools")
+async def mcp_tool_metrics():
+    """Cached MCP tool schemas and cache hit/refresh counters"""
+    return get_mcp_tool_cache().status()
+
+
+@app.get("/metrics/mcp-pool")
+async def mcp_pool_metrics():
+    """Live MCP sessions, in-flight calls and handshake/call latency per endpoint"""
+    return get_mcp_pool().metrics()
+
+
+@app.get("/metrics/bedrock")
+async def bedrock_metrics():
+    """Per-model admission, throttling and retry-budget state of the Bedrock gateway"""
+    return get_bedrock_gateway().metrics()
+
+
+@app.get("/metrics/prompt-cache")
+async def prompt_cache_metrics():
+    """Bedrock prompt cache hit rate and tokens read from the cache"""
+    return get_prompt_cache_stats()
+
+
+@app.get("/metrics/routing")
+async def routing_metrics():
+    """Requests, fallbacks and latency percentiles per query route"""
+    return query_router.metrics()
+
+
 # Match Snowflake agent's /query endpoint and response style
 
 # Thread pool for sync agent calls (if needed)
@@ -67,6 +144,8 @@ thread_pool = ThreadPoolExecutor(max_workers=10)
 @app.post("/query")
 async def query_endpoint(request: QueryRequest):
     """Main query endpoint for JIRA agent (Snowflake style)"""
+    if not await readiness.wait():
+        raise HTTPException(status_code=503, detail="Agent not ready")
     try:
         if jira_agent is None:
             raise HTTPException(
@@ -76,26 +155,34 @@ async def query_endpoint(request: QueryRequest):
         logger.info(
             f"Processing JIRA query: {request.query} (session: {request.session_id})")
 
+        # History is kept in the session store and sent as a bounded window;
+        # store access can block on Redis or SQLite, so it runs on the thread pool
+        prompt = await asyncio.get_event_loop().run_in_executor(
+            thread_pool, prepare_session_query, request.session_id, request.query)
+
         # Run the agent in a thread pool for concurrency (sync calls only)
-        if request.session_id:
-            raw_response = await asyncio.get_event_loop().run_in_executor(
-                thread_pool,
-                lambda: jira_agent.chat(request.query, request.session_id)
-            )
-        else:
-            raw_response = await asyncio.get_event_loop().run_in_executor(
-                thread_pool,
-                lambda: jira_agent.chat(request.query)
-            )
+        raw_response, route = await asyncio.get_event_loop().run_in_executor(
+            thread_pool,
+            lambda: query_router.run(
+                request.query,
+                # The shared agent keeps conversation state per session id; without
+                # it every user would land in the agent's default conversation
+                lambda: jira_agent.chat(prompt, request.session_id) if request.session_id
+                else jira_agent.chat(prompt))
+        )
 
         if not raw_response:
             return {"result": "No response received from the agent."}
 
+        await asyncio.get_event_loop().run_in_executor(
+            thread_pool, record_session_turn, request.session_id, request.query, raw_response)
+
         execution_time = time.time() - start_time
         return {
             "result": raw_response,
             "execution_time": round(execution_time, 2),
-            "session_id": request.session_id
+            "session_id": request.session_id,
+            "route": route
         }
 
     except Exception as e:
@@ -103,6 +190,46 @@ async def query_endpoint(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/batch")
+async def query_batch_endpoint(request: BatchQueryRequest):
+    """Batch query endpoint, streams NDJSON results in completion order"""
+    if not await readiness.wait():
+        raise HTTPException(status_code=503, detail="Agent not ready")
+    if jira_agent is None:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+
+    error = validate_batch(request.queries, request.max_parallel, request.merge_size)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    logger.info(
+        f"Processing JIRA batch of {len(request.queries)} queries "
+        f"(parallel: {request.max_parallel}, merge: {request.merge_size}, session: {request.session_id})")
+
+    def run_query(query_text, session_id):
+        # Like /query, history comes from the session store: items read the
+        # parent session for context and record their turn under the derived
+        # per-item id, so concurrent items never interleave in one conversation
+        prompt = prepare_session_query(request.session_id, query_text)
+        # The agent keeps its own state per session id; items use their derived id
+        raw_response = jira_agent.chat(prompt, session_id) if session_id else jira_agent.chat(prompt)
+        if raw_response:
+            record_session_turn(session_id, query_text, raw_response)
+        return raw_response
+
+    return StreamingResponse(
+        stream_batch(
+            request.queries,
+            run_query,
+            thread_pool,
+            session_id=request.session_id,
+            max_parallel=request.max_parallel,
+            merge_size=request.merge_size,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
 @app.get("/agents")
 async def list_agents():
     """List available agent and status"""
@@ -113,6 +240,7 @@ async def list_agents():
     }
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "jira_agent_server:app",
         host="0.0.0.0",
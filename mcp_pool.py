@@ -0,0 +1,441 @@
+"""
+Process-wide pool of MCP client sessions.
+
+Agents used to open their own MCP session (the GitHub server even built one
+per request), so every tool call could pay for a TCP/TLS connect plus the
+MCP initialize handshake. The pool keeps up to MCP_POOL_MAX_SESSIONS live
+sessions per endpoint and multiplexes concurrent tool calls over them:
+
+- MCP is JSON-RPC, so one session carries several requests at once; a new
+  session is opened only when every existing one already has
+  MCP_POOL_MAX_INFLIGHT calls in flight
+- Idle sessions are pinged every MCP_POOL_PING_INTERVAL seconds; sessions
+  that fail a ping or whose transport breaks during a call are closed and
+  replaced on demand, and that call is retried once on a fresh session.
+  Errors the server itself returns (McpError, tool failures) are raised
+  as-is: the session is healthy and tools such as "create issue" must not
+  run twice
+- All sessions live on one background event loop, so the pool can be used
+  from sync code (call_tool) and from any thread
+- Each session is owned by its own task, which enters and later exits the
+  transport context: anyio cancel scopes must be exited by the task that
+  entered them, so closing never happens from the health check or caller
+- Pools are keyed on the endpoint plus the request headers, so callers with
+  different credentials never share a session; sessions idle for longer than
+  MCP_POOL_IDLE_TIMEOUT are closed and empty pools dropped
+
+PooledMCPClient exposes the call_tool_sync / call_tool_async interface that
+strands' MCPAgentTool expects, so cached tool schemas (mcp_tool_cache) can
+be bound to pooled sessions instead of a dedicated MCPClient.
+
+Environment variables:
+    MCP_POOL_MAX_SESSIONS   Live sessions per endpoint (default: 4)
+    MCP_POOL_MAX_INFLIGHT   Concurrent calls per session (default: 8)
+    MCP_POOL_PING_INTERVAL  Seconds between idle health checks (default: 60)
+    MCP_POOL_IDLE_TIMEOUT   Close sessions unused for this many seconds (default: 900)
+    MCP_TOOL_TIMEOUT        Tool call timeout in seconds (default: 300)
+"""
+
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from mcp_tool_cache import MCP_SERVERS, mcp_endpoint
+
+logger = logging.getLogger(__name__)
+
+MCP_POOL_MAX_SESSIONS = int(os.getenv("MCP_POOL_MAX_SESSIONS", "4"))
+MCP_POOL_MAX_INFLIGHT = int(os.getenv("MCP_POOL_MAX_INFLIGHT", "8"))
+MCP_POOL_PING_INTERVAL = float(os.getenv("MCP_POOL_PING_INTERVAL", "60"))
+MCP_POOL_IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "900"))
+MCP_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "300"))
+
+
+async def open_mcp_session(endpoint: str, headers: Optional[Dict[str, str]] = None):
+    """Connect and initialize an MCP session; returns (session, exit_stack)."""
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    stack = AsyncExitStack()
+    try:
+        read, write, _ = await stack.enter_async_context(streamablehttp_client(endpoint, headers=headers))
+        session = await stack.enter_async_context(ClientSession(read, write))
+        await session.initialize()
+    except BaseException:
+        await stack.aclose()
+        raise
+    return session, stack
+
+
+def _transport_errors() -> tuple:
+    """Exception types meaning the connection broke, as opposed to a server-side error."""
+    errors = [ConnectionError, EOFError]
+    try:
+        import anyio
+        errors += [anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream]
+    except ImportError:
+        pass
+    try:
+        import httpx
+        errors.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+TRANSPORT_ERRORS = _transport_errors()
+
+
+class PooledSession:
+    """One live MCP session and its bookkeeping."""
+
+    def __init__(self, session, stack: AsyncExitStack):
+        self.session = session
+        self.stack = stack
+        self.inflight = 0
+        self.calls = 0
+        self.last_used = time.time()
+        self.healthy = True
+        self.owner: Optional[asyncio.Task] = None
+        self.stop = asyncio.Event()
+
+
+class EndpointPool:
+    """Sessions for a single MCP endpoint. Only used from the pool's event loop."""
+
+    def __init__(self, endpoint: str, headers: Optional[Dict[str, str]], max_sessions: int,
+                 max_inflight: int, connect=open_mcp_session):
+        self.endpoint = endpoint
+        self.headers = headers
+        self.max_sessions = max_sessions
+        self.max_inflight = max_inflight
+        self._connect = connect
+        self.sessions: List[PooledSession] = []
+        self._connecting = 0
+        self._changed = asyncio.Condition()
+        self.stats = {"calls": 0, "errors": 0, "retries": 0, "handshakes": 0, "closed": 0,
+                      "handshake_ms": 0.0, "call_ms": 0.0, "wait_ms": 0.0}
+
+    async def _own(self, opened: asyncio.Future) -> None:
+        """Owner task of one session: opens it, waits for stop, then closes it from this same task."""
+        try:
+            session, stack = await self._connect(self.endpoint, self.headers)
+        except asyncio.CancelledError:
+            opened.cancel()
+            raise
+        except Exception as e:
+            opened.set_exception(e)
+            return
+        pooled = PooledSession(session, stack)
+        pooled.owner = asyncio.current_task()
+        opened.set_result(pooled)
+        try:
+            await pooled.stop.wait()
+        finally:
+            try:
+                await stack.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing MCP session for {self.endpoint}: {e}")
+
+    async def _open(self) -> PooledSession:
+        started = time.perf_counter()
+        opened = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().create_task(self._own(opened), name=f"mcp-session {self.endpoint}")
+        try:
+            pooled = await asyncio.shield(opened)
+        except asyncio.CancelledError:
+            # The owner may still finish connecting; make it close straight away
+            opened.add_done_callback(lambda f: f.cancelled() or f.exception() or f.result().stop.set())
+            raise
+        self.stats["handshakes"] += 1
+        self.stats["handshake_ms"] += (time.perf_counter() - started) * 1000
+        return pooled
+
+    async def _close(self, pooled: PooledSession) -> None:
+        pooled.healthy = False
+        if pooled in self.sessions:
+            self.sessions.remove(pooled)
+            self.stats["closed"] += 1
+        pooled.stop.set()
+        if pooled.owner is not None and pooled.owner is not asyncio.current_task():
+            try:
+                await pooled.owner
+            except Exception as e:
+                logger.debug(f"Error closing MCP session for {self.endpoint}: {e}")
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def acquire(self) -> PooledSession:
+        """Return the least-loaded session, opening a new one only when all are busy."""
+        started = time.perf_counter()
+        async with self._changed:
+            while True:
+                available = [s for s in self.sessions if s.healthy and s.inflight < self.max_inflight]
+                if available:
+                    pooled = min(available, key=lambda s: s.inflight)
+                    pooled.inflight += 1
+                    self.stats["wait_ms"] += (time.perf_counter() - started) * 1000
+                    return pooled
+                if len(self.sessions) + self._connecting < self.max_sessions:
+                    self._connecting += 1
+                    break
+                await self._changed.wait()
+
+        # Handshake outside the lock so calls on existing sessions keep flowing
+        try:
+            pooled = await self._open()
+        finally:
+            async with self._changed:
+                self._connecting -= 1
+                self._changed.notify_all()
+        async with self._changed:
+            pooled.inflight += 1
+            self.sessions.append(pooled)
+            self._changed.notify_all()
+        self.stats["wait_ms"] += (time.perf_counter() - started) * 1000
+        return pooled
+
+    async def release(self, pooled: PooledSession) -> None:
+        async with self._changed:
+            pooled.inflight -= 1
+            pooled.last_used = time.time()
+            self._changed.notify()
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]], timeout: float):
+        for attempt in range(2):
+            pooled = await self.acquire()
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(pooled.session.call_tool(name, arguments or {}), timeout)
+            except asyncio.TimeoutError:
+                self.stats["errors"] += 1
+                await self.release(pooled)
+                raise
+            except TRANSPORT_ERRORS as e:
+                self.stats["errors"] += 1
+                await self.release(pooled)
+                # A broken transport: drop the session and retry once on a fresh one
+                await self._close(pooled)
+                if attempt:
+                    raise
+                self.stats["retries"] += 1
+                logger.warning(f"MCP call '{name}' on {self.endpoint} failed ({e}); reconnecting")
+                continue
+            except Exception:
+                # An application error from a healthy session: keep it, never re-send
+                self.stats["errors"] += 1
+                await self.release(pooled)
+                raise
+            self.stats["calls"] += 1
+            self.stats["call_ms"] += (time.perf_counter() - started) * 1000
+            pooled.calls += 1
+            await self.release(pooled)
+            return result
+
+    async def health_check(self, idle_for: float, idle_timeout: float = MCP_POOL_IDLE_TIMEOUT) -> None:
+        for pooled in list(self.sessions):
+            if pooled.inflight or time.time() - pooled.last_used < idle_for:
+                continue
+            if idle_timeout > 0 and time.time() - pooled.last_used >= idle_timeout:
+                await self._close(pooled)
+                continue
+            try:
+                await asyncio.wait_for(pooled.session.send_ping(), 10)
+                pooled.last_used = time.time()
+            except Exception as e:
+                logger.info(f"Dropping unhealthy MCP session for {self.endpoint}: {e}")
+                await self._close(pooled)
+
+    async def close(self) -> None:
+        for pooled in list(self.sessions):
+            await self._close(pooled)
+
+    def idle(self) -> bool:
+        return not self.sessions and not self._connecting
+
+    def metrics(self) -> Dict[str, Any]:
+        calls = self.stats["calls"] or 1
+        handshakes = self.stats["handshakes"] or 1
+        return {
+            "sessions": len(self.sessions),
+            "inflight": sum(s.inflight for s in self.sessions),
+            "calls": self.stats["calls"],
+            "errors": self.stats["errors"],
+            "retries": self.stats["retries"],
+            "handshakes": self.stats["handshakes"],
+            "closed_sessions": self.stats["closed"],
+            "avg_handshake_ms": round(self.stats["handshake_ms"] / handshakes, 1),
+            "avg_call_ms": round(self.stats["call_ms"] / calls, 1),
+            "avg_wait_ms": round(self.stats["wait_ms"] / calls, 1),
+        }
+
+
+class MCPSessionPool:
+    """Bounded MCP sessions per endpoint, driven by a background event loop."""
+
+    def __init__(self, max_sessions: int = MCP_POOL_MAX_SESSIONS,
+                 max_inflight: int = MCP_POOL_MAX_INFLIGHT,
+                 ping_interval: float = MCP_POOL_PING_INTERVAL, connect=open_mcp_session):
+        self.max_sessions = max_sessions
+        self.max_inflight = max_inflight
+        self.ping_interval = ping_interval
+        self._connect = connect
+        self._pools: Dict[Tuple[str, FrozenSet], EndpointPool] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+        if ping_interval > 0:
+            asyncio.run_coroutine_threadsafe(self._health_loop(), self._loop)
+
+    def _pool(self, endpoint: str, headers: Optional[Dict[str, str]]) -> EndpointPool:
+        key = (endpoint, frozenset((headers or {}).items()))
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = EndpointPool(endpoint, dict(headers) if headers else None, self.max_sessions,
+                                self.max_inflight, self._connect)
+            self._pools[key] = pool
+        return pool
+
+    @staticmethod
+    def _label(key: Tuple[str, FrozenSet]) -> str:
+        """Metrics name for a pool; header values are hashed so credentials never leak."""
+        endpoint, headers = key
+        if not headers:
+            return endpoint
+        digest = hashlib.sha256(json.dumps(sorted(headers)).encode("utf-8")).hexdigest()[:12]
+        return f"{endpoint}#{digest}"
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for key, pool in list(self._pools.items()):
+                try:
+                    await pool.health_check(self.ping_interval)
+                except Exception as e:
+                    logger.warning(f"MCP health check for {pool.endpoint} failed: {e}")
+                if pool.idle() and pool.headers:
+                    self._pools.pop(key, None)
+
+    def _resolve(self, server_or_endpoint: str) -> str:
+        if server_or_endpoint in MCP_SERVERS:
+            endpoint = mcp_endpoint(server_or_endpoint)
+            if not endpoint:
+                raise ValueError(f"No MCP endpoint configured for '{server_or_endpoint}'")
+            return endpoint
+        return server_or_endpoint
+
+    async def _call(self, endpoint: str, headers, name, arguments, timeout):
+        return await self._pool(endpoint, headers).call_tool(name, arguments, timeout)
+
+    def call_tool(self, server_or_endpoint: str, name: str, arguments: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None, timeout: float = MCP_TOOL_TIMEOUT):
+        """Call a tool from any thread (blocking); returns the mcp CallToolResult."""
+        endpoint = self._resolve(server_or_endpoint)
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(endpoint, headers, name, arguments, timeout), self._loop)
+        return future.result()
+
+    async def acall_tool(self, server_or_endpoint: str, name: str, arguments: Optional[Dict[str, Any]] = None,
+                         headers: Optional[Dict[str, str]] = None, timeout: float = MCP_TOOL_TIMEOUT):
+        """Call a tool from another event loop without blocking it."""
+        endpoint = self._resolve(server_or_endpoint)
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(endpoint, headers, name, arguments, timeout), self._loop)
+        return await asyncio.wrap_future(future)
+
+    def client(self, server_or_endpoint: str, headers: Optional[Dict[str, str]] = None) -> "PooledMCPClient":
+        return PooledMCPClient(self, server_or_endpoint, headers)
+
+    def metrics(self) -> Dict[str, Any]:
+        future = asyncio.run_coroutine_threadsafe(self._metrics(), self._loop)
+        return future.result(timeout=5)
+
+    async def _metrics(self) -> Dict[str, Any]:
+        return {
+            "max_sessions": self.max_sessions,
+            "max_inflight": self.max_inflight,
+            "endpoints": {self._label(key): pool.metrics() for key, pool in self._pools.items()},
+        }
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+
+        async def close_all():
+            for pool in list(self._pools.values()):
+                await pool.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(timeout=10)
+        except Exception as e:
+            logger.debug(f"Error closing MCP pool: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def to_tool_result(tool_use_id: str, result) -> Dict[str, Any]:
+    """Convert an mcp CallToolResult into the strands tool result format."""
+    content = []
+    for item in result.content or []:
+        if getattr(item, "type", None) == "text":
+            content.append({"text": item.text})
+        else:
+            content.append({"text": json.dumps(item.model_dump(mode="json"), default=str)})
+    tool_result = {
+        "status": "error" if result.isError else "success",
+        "toolUseId": tool_use_id,
+        "content": content,
+    }
+    structured = getattr(result, "structuredContent", None)
+    if structured:
+        tool_result["structuredContent"] = structured
+    return tool_result
+
+
+class PooledMCPClient:
+    """MCPClient-compatible facade that routes tool calls through the pool."""
+
+    def __init__(self, pool: MCPSessionPool, server_or_endpoint: str,
+                 headers: Optional[Dict[str, str]] = None):
+        self.pool = pool
+        self.target = server_or_endpoint
+        self.headers = headers
+
+    def call_tool_sync(self, tool_use_id: str, name: str, arguments: Optional[Dict[str, Any]] = None,
+                       read_timeout_seconds=None) -> Dict[str, Any]:
+        timeout = read_timeout_seconds.total_seconds() if read_timeout_seconds else MCP_TOOL_TIMEOUT
+        try:
+            result = self.pool.call_tool(self.target, name, arguments, self.headers, timeout)
+        except Exception as e:
+            logger.error(f"MCP tool '{name}' failed: {e}")
+            return {"status": "error", "toolUseId": tool_use_id, "content": [{"text": f"Tool execution failed: {e}"}]}
+        return to_tool_result(tool_use_id, result)
+
+    async def call_tool_async(self, tool_use_id: str, name: str, arguments: Optional[Dict[str, Any]] = None,
+                              read_timeout_seconds=None) -> Dict[str, Any]:
+        timeout = read_timeout_seconds.total_seconds() if read_timeout_seconds else MCP_TOOL_TIMEOUT
+        try:
+            result = await self.pool.acall_tool(self.target, name, arguments, self.headers, timeout)
+        except Exception as e:
+            logger.error(f"MCP tool '{name}' failed: {e}")
+            return {"status": "error", "toolUseId": tool_use_id, "content": [{"text": f"Tool execution failed: {e}"}]}
+        return to_tool_result(tool_use_id, result)
+
+
+_pool: Optional[MCPSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_mcp_pool() -> MCPSessionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = MCPSessionPool()
+            atexit.register(_pool.close)
+        return _pool
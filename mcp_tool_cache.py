@@ -0,0 +1,317 @@
+"""
+Local cache of MCP tool schemas.
+
+Creating an agent used to start with a list_tools round-trip to every remote
+MCP server (Postman, GitHub, JIRA). The discovered schemas are now kept on
+disk per server, so agent construction is a local operation:
+
+- A cached entry is used as long as its cache version and endpoint match;
+  entries older than MCP_TOOL_CACHE_TTL are still served, and a background
+  thread refreshes them
+- Each entry records the server's reported name/version and a hash of the
+  tool schemas; a corrupt or outdated entry is ignored and a changed tool set
+  is logged on refresh
+- When an MCP server is unreachable, the last known schemas keep being
+  served; discovery only has to succeed once per endpoint
+
+Tool calls still go to the live MCP server; only discovery is cached.
+
+Environment variables:
+    MCP_TOOL_CACHE_DIR   Cache directory (default: cache/mcp_tools)
+    MCP_TOOL_CACHE_TTL   Seconds before a background refresh (default: 3600)
+    POSTMAN_MCP_ENDPOINT / GITHUB_MCP_ENDPOINT / JIRA_MCP_ENDPOINT
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MCP_TOOL_CACHE_DIR = os.getenv("MCP_TOOL_CACHE_DIR", os.path.join("cache", "mcp_tools"))
+MCP_TOOL_CACHE_TTL = float(os.getenv("MCP_TOOL_CACHE_TTL", "3600"))
+MCP_DISCOVERY_TIMEOUT = float(os.getenv("MCP_DISCOVERY_TIMEOUT", "30"))
+
+# Crash safety net for the cross-worker refresh lease, which is normally
+# released as soon as the refresh finishes
+REFRESH_LEASE_SECONDS = MCP_DISCOVERY_TIMEOUT * 4
+
+# Bump when the on-disk entry format changes
+CACHE_VERSION = 1
+
+# MCP servers known to the agents, mapped to their endpoint variables
+MCP_SERVERS = {
+    "postman": "POSTMAN_MCP_ENDPOINT",
+    "github": "GITHUB_MCP_ENDPOINT",
+    "jira": "JIRA_MCP_ENDPOINT",
+}
+
+
+def mcp_endpoint(server: str) -> Optional[str]:
+    """Return the configured endpoint for an MCP server, or None."""
+    return os.getenv(MCP_SERVERS.get(server, ""), "") or None
+
+
+def schema_hash(tools: List[Dict[str, Any]]) -> str:
+    """Order-independent hash of a list of tool schemas."""
+    canonical = json.dumps(sorted(tools, key=lambda t: t["name"]), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+async def _discover(endpoint: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async with streamablehttp_client(endpoint, headers=headers) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            init = await session.initialize()
+            tools, cursor = [], None
+            while True:
+                page = await session.list_tools(cursor) if cursor else await session.list_tools()
+                tools.extend({
+                    "name": tool.name,
+                    "description": tool.description or "",
+                    "inputSchema": tool.inputSchema,
+                } for tool in page.tools)
+                cursor = getattr(page, "nextCursor", None)
+                if not cursor:
+                    break
+    server_info = getattr(init, "serverInfo", None)
+    return {
+        "server_name": getattr(server_info, "name", None),
+        "server_version": getattr(server_info, "version", None),
+        "protocol_version": getattr(init, "protocolVersion", None),
+        "tools": tools,
+    }
+
+
+def discover_tools(endpoint: str, headers: Optional[Dict[str, str]] = None,
+                   timeout: float = MCP_DISCOVERY_TIMEOUT) -> Dict[str, Any]:
+    """List tools from a remote MCP server (blocking)."""
+    return asyncio.run(asyncio.wait_for(_discover(endpoint, headers), timeout))
+
+
+class MCPToolCache:
+    """On-disk tool schema cache with background refresh."""
+
+    def __init__(self, cache_dir: str = MCP_TOOL_CACHE_DIR, ttl: float = MCP_TOOL_CACHE_TTL,
+                 discover=discover_tools):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._discover = discover
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._refreshing: set = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "discoveries": 0, "unchanged": 0,
+                      "changed": 0, "failures": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # -- storage helpers -------------------------------------------------
+
+    def _path(self, server: str) -> str:
+        return os.path.join(self.cache_dir, f"{server}.json")
+
+    def _lock(self, server: str) -> threading.RLock:
+        with self._locks_guard:
+            return self._locks.setdefault(server, threading.RLock())
+
+    def _load(self, server: str, endpoint: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(server)
+        if entry is None:
+            try:
+                with open(self._path(server), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+        if entry.get("cache_version") != CACHE_VERSION or entry.get("endpoint") != endpoint:
+            return None
+        if entry.get("schema_hash") != schema_hash(entry.get("tools", [])):
+            logger.warning(f"Discarding corrupt MCP tool cache for {server}")
+            return None
+        self._entries[server] = entry
+        return entry
+
+    def _save(self, server: str, entry: Dict[str, Any]) -> None:
+        self._entries[server] = entry
+        # Every worker may discover at startup; each writes its own temp file
+        tmp = f"{self._path(server)}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(server))
+
+    # -- public API --------------------------------------------------------
+
+    def refresh(self, server: str, endpoint: str,
+                headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Discover tools from the server and update the cache entry."""
+        with self._lock(server):
+            discovered = self._discover(endpoint, headers)
+            self.stats["discoveries"] += 1
+            digest = schema_hash(discovered["tools"])
+            previous = self._load(server, endpoint)
+            if previous and previous["schema_hash"] == digest:
+                self.stats["unchanged"] += 1
+            elif previous:
+                self.stats["changed"] += 1
+                logger.info(f"MCP tools for {server} changed "
+                            f"({len(previous['tools'])} -> {len(discovered['tools'])} tools)")
+            entry = dict(discovered, cache_version=CACHE_VERSION, endpoint=endpoint,
+                         schema_hash=digest, fetched_at=time.time())
+            self._save(server, entry)
+            return entry
+
+    def _refresh_in_background(self, server: str, endpoint: str,
+                               headers: Optional[Dict[str, str]]) -> None:
+        with self._locks_guard:
+            if server in self._refreshing:
+                return
+            self._refreshing.add(server)
+        # One refresh per server across worker processes
+        from shared_cache import get_shared_cache
+        lease = f"mcp-refresh:{server}"
+        try:
+            leased = get_shared_cache().set(lease, os.getpid(), ex=REFRESH_LEASE_SECONDS, nx=True)
+        except Exception:
+            leased = True
+        if not leased:
+            with self._locks_guard:
+                self._refreshing.discard(server)
+            return
+
+        def run():
+            try:
+                self.refresh(server, endpoint, headers)
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.warning(f"Background MCP tool refresh for {server} failed: {e}")
+            finally:
+                with self._locks_guard:
+                    self._refreshing.discard(server)
+                try:
+                    get_shared_cache().delete(lease)
+                except Exception as e:
+                    logger.debug(f"Could not release MCP refresh lease for {server}: {e}")
+
+        threading.Thread(target=run, name=f"mcp-refresh-{server}", daemon=True).start()
+
+    def get_tools(self, server: str, endpoint: Optional[str] = None,
+                  headers: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Return tool schemas for an MCP server, preferring the local cache.
+
+        Discovery runs synchronously only when nothing usable is cached.
+        """
+        endpoint = endpoint or mcp_endpoint(server)
+        if not endpoint:
+            raise ValueError(f"No MCP endpoint configured for '{server}' ({MCP_SERVERS.get(server)})")
+
+        entry = self._load(server, endpoint)
+        if entry is None:
+            with self._lock(server):
+                # Another thread may have discovered the tools while we waited
+                entry = self._load(server, endpoint)
+                if entry is None:
+                    try:
+                        entry = self.refresh(server, endpoint, headers)
+                    except Exception:
+                        self.stats["failures"] += 1
+                        raise
+                else:
+                    self.stats["hits"] += 1
+        elif time.time() - entry["fetched_at"] > self.ttl:
+            # Another worker process may already have refreshed the file
+            self._entries.pop(server, None)
+            entry = self._load(server, endpoint) or entry
+            if time.time() - entry["fetched_at"] > self.ttl:
+                self.stats["stale_hits"] += 1
+                self._refresh_in_background(server, endpoint, headers)
+            else:
+                self.stats["hits"] += 1
+        else:
+            self.stats["hits"] += 1
+        return entry["tools"]
+
+    def cached_tools(self, server: str, endpoint: Optional[str] = None,
+                     headers: Optional[Dict[str, str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return cached tool schemas without ever discovering on the calling thread.
+
+        A missing or stale entry starts a background refresh; a miss returns None.
+        """
+        endpoint = endpoint or mcp_endpoint(server)
+        if not endpoint:
+            return None
+        entry = self._load(server, endpoint)
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+            self._refresh_in_background(server, endpoint, headers)
+        if entry is None:
+            return None
+        self.stats["hits"] += 1
+        return entry["tools"]
+
+    def status(self) -> Dict[str, Any]:
+        servers = {
+            server: {
+                "tools": len(entry["tools"]),
+                "server_version": entry.get("server_version"),
+                "schema_hash": entry["schema_hash"][:12],
+                "age_s": round(time.time() - entry["fetched_at"], 1),
+            }
+            for server, entry in self._entries.items()
+        }
+        return {"servers": servers, "stats": dict(self.stats)}
+
+
+def cached_agent_tools(server: str, mcp_client=None, endpoint: Optional[str] = None,
+                       headers: Optional[Dict[str, str]] = None) -> list:
+    """
+    Build strands MCPAgentTool objects from cached schemas.
+
+    Equivalent to mcp_client.list_tools_sync(), without the network round-trip.
+    Calls go through mcp_client, or through the shared session pool
+    (mcp_pool) when no client is given.
+    """
+    from mcp.types import Tool
+    from strands.tools.mcp import MCPAgentTool
+
+    if mcp_client is None:
+        from mcp_pool import get_mcp_pool
+        mcp_client = get_mcp_pool().client(endpoint or server, headers)
+
+    return [MCPAgentTool(Tool(**schema), mcp_client)
+            for schema in get_mcp_tool_cache().get_tools(server, endpoint, headers)]
+
+
+_cache: Optional[MCPToolCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_mcp_tool_cache() -> MCPToolCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MCPToolCache()
+        return _cache
+
+
+def warm_mcp_tools(servers: Optional[List[str]] = None) -> str:
+    """Load (or discover) tool schemas for every configured MCP server."""
+    cache = get_mcp_tool_cache()
+    loaded, failed = [], []
+    for server in servers or list(MCP_SERVERS):
+        if not mcp_endpoint(server):
+            continue
+        try:
+            loaded.append(f"{server}={len(cache.get_tools(server))}")
+        except Exception as e:
+            logger.warning(f"Could not load MCP tools for {server}: {e}")
+            failed.append(server)
+    if failed and not loaded:
+        raise RuntimeError(f"MCP tool discovery failed for {', '.join(failed)}")
+    return f"tools: {', '.join(loaded) or 'no MCP endpoints configured'}"
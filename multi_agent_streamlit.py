@@ -73,9 +73,13 @@ from components.chat_components import ChatComponents
 from components.sidebar_components import SidebarComponents
 from utils.session_manager import SessionManager
 from config.app_config import AppConfig
+from agent_worker import AgentCallWorker, agent_query_url
+from chat_history import browser_session_id, cap_history, render_archived
 import streamlit as st
+import json
 import sys
 import os
+import time
 
 # Add the frontend directory to the Python path
 frontend_path = os.path.dirname(__file__)
@@ -91,15 +95,97 @@ st.set_page_config(
 )
 
 
+@st.cache_resource
+def get_app_config():
+    """Application config, built once per server process."""
+    return AppConfig()
+
+
+@st.cache_resource
+def get_agent_worker():
+    """Background worker for agent HTTP calls, shared by all sessions."""
+    return AgentCallWorker()
+
+
+def get_session_manager():
+    """Build the session manager once per browser session instead of on every rerun."""
+    if "session_manager_instance" not in st.session_state:
+        session_manager = SessionManager()
+        session_manager.initialize_session()
+        st.session_state.session_manager_instance = session_manager
+    return st.session_state.session_manager_instance
+
+
+def get_component(key, factory):
+    """Cache a UI component object in session state."""
+    if key not in st.session_state:
+        st.session_state[key] = factory()
+    return st.session_state[key]
+
+
+def poll_agent_job(session_manager):
+    """Show progress of the pending agent call, and store its result when done."""
+    worker = get_agent_worker()
+    job = worker.get(st.session_state.get("pending_agent_job"))
+    if job is None:
+        st.session_state.pop("pending_agent_job", None)
+        return True
+
+    if not job.done:
+        with st.chat_message("assistant"):
+            st.markdown(f"⏳ {job.progress} ({job.elapsed:.0f}s)")
+        return False
+
+    worker.pop(job.id)
+    st.session_state.pop("pending_agent_job", None)
+    if job.error is not None:
+        content = f"Sorry, I encountered an error: {job.error}"
+    elif isinstance(job.result, str):
+        content = job.result
+    else:
+        content = json.dumps(job.result, indent=2, default=str)
+    session_manager.add_message_to_current_chat("assistant", content)
+    st.rerun()
+    return True
+
+
+if hasattr(st, "fragment"):
+    # Only the progress fragment reruns while waiting, not the whole chat page
+    _poll_agent_job_fragment = st.fragment(run_every=1)(poll_agent_job)
+else:
+    _poll_agent_job_fragment = None
+
+
+def handle_agent_response(session_manager, current_chat_history):
+    """Start the agent call for the latest user message in the background and poll it."""
+    worker = get_agent_worker()
+    if worker.get(st.session_state.get("pending_agent_job")) is None:
+        agent_name = st.session_state.get("selected_agent", "Supervisor Agent")
+        url = agent_query_url(agent_name)
+        if url is None:
+            # No server URL configured for this agent: use the blocking API service
+            APIService(session_manager).handle_api_call()
+            return
+        job = worker.submit(
+            agent_name, url, current_chat_history[-1]["content"], st.session_state.get("session_id"))
+        st.session_state.pending_agent_job = job.id
+
+    if _poll_agent_job_fragment is not None:
+        _poll_agent_job_fragment(session_manager)
+    elif not poll_agent_job(session_manager):
+        # Older Streamlit without fragments: poll by rerunning the script
+        time.sleep(1)
+        st.rerun()
+
+
 def main():
     """Main application function."""
     try:
         # Apply CSS styles
         CSSStyles.apply_styles()
 
-        # Initialize session manager
-        session_manager = SessionManager()
-        session_manager.initialize_session()
+        # Session manager and components are built once per session, not per rerun
+        session_manager = get_session_manager()
         
 
         # Force sidebar to always be visible by ensuring session state is properly initialized
@@ -140,7 +226,7 @@ def main():
 
         # Initialize and render sidebar - this should always happen
         try:
-            sidebar = SidebarComponents(session_manager)
+            sidebar = get_component("sidebar_components", lambda: SidebarComponents(session_manager))
             sidebar.render()
         except Exception as sidebar_error:
             # Fallback sidebar rendering if there's an error
@@ -165,13 +251,21 @@ def main():
                 st.write(f"Selected Agent: {st.session_state.get('selected_agent', 'Not set')}")
                 st.write(f"Session ID: {st.session_state.get('session_id', 'Not set')[:8]}...")
                 st.write(f"Sidebar Initialized: {st.session_state.get('sidebar_initialized', False)}")
-                st.write(f"Available Agents: {session_manager.config.get_agent_list()}")
+                st.write(f"Available Agents: {get_app_config().get_agent_list()}")
 
         # Initialize chat components
-        chat = ChatComponents(session_manager)
+        chat = get_component("chat_components", lambda: ChatComponents(session_manager))
 
         # Render hero section
         chat.render_hero_section()
+
+        # Bound in-memory history; older messages move to the on-disk archive,
+        # which stays readable through the "Load older messages" control
+        archive_id = st.session_state.get("session_id") or browser_session_id()
+        history = session_manager.get_current_chat_history()
+        if history:
+            cap_history(history, archive_id)
+        render_archived(archive_id)
         
         # Handle chat interaction - always render chat interface
         # The sidebar should always be visible regardless of agent selection
@@ -185,13 +279,12 @@ def main():
             session_manager.add_message_to_current_chat("user", user_input)
             st.rerun()
 
-        # Handle API response
+        # Handle API response without blocking the script thread
         current_chat_history = session_manager.get_current_chat_history()
         if (current_chat_history and 
             current_chat_history[-1]["role"] == "user"):
             
-            api_service = APIService(session_manager)
-            api_service.handle_api_call()
+            handle_agent_response(session_manager, current_chat_history)
             
     except Exception as e:
         st.error(f"Application error: {str(e)}")
@@ -0,0 +1,214 @@
+"""
+Page-parallel PDF text extraction for large BRD documents.
+
+Pages are split into contiguous ranges and extracted on a process pool, so
+long PDFs use every core instead of blocking one request thread. Each page is
+extracted with pdfplumber and falls back to PyPDF2 when pdfplumber fails.
+Extracted pages are cached per (document sha, page number) in memory and on
+disk, and iter_pages() yields pages as soon as they are ready so callers can
+stream them to the agent.
+
+Environment variables:
+    PDF_WORKERS              Process pool size (default: CPU count divided by SERVE_WORKERS);
+                             with a single worker extraction runs inline, which is faster
+                             than shipping the document to one pool process
+    PDF_PARALLEL_MIN_PAGES   Below this page count extraction runs inline (default: 8)
+    PDF_PAGE_CACHE_DIR       Page cache directory (default: cache/pdf_pages)
+    PDF_PAGE_MEMO_MAX        Pages kept in the in-memory cache (default: 5000)
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each serve.py worker process has its own pool, so they split the cores
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or max(
+    1, (os.cpu_count() or 2) // max(1, int(os.getenv("SERVE_WORKERS", "1"))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_PAGE_CACHE_DIR = os.getenv("PDF_PAGE_CACHE_DIR", os.path.join("cache", "pdf_pages"))
+PDF_PAGE_MEMO_MAX = int(os.getenv("PDF_PAGE_MEMO_MAX", "5000"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_memo: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared extraction process pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def count_pages(content: bytes) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(io.BytesIO(content)).pages)
+
+
+def _extract_with_pypdf2(content: bytes, pages: List[int]) -> Dict[int, str]:
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(content))
+    return {i: reader.pages[i].extract_text() or "" for i in pages}
+
+
+def extract_page_range(content: bytes, start: int, end: int) -> Dict[int, str]:
+    """
+    Extract pages [start, end) of a PDF. Runs inside pool workers.
+
+    Opens the document once per range with pdfplumber; pages pdfplumber
+    cannot handle (or the whole range, if it cannot open the file) are
+    retried with PyPDF2.
+    """
+    texts: Dict[int, str] = {}
+    failed: List[int] = []
+    try:
+        import pdfplumber
+        with pdfplumber.open(io.BytesIO(content)) as pdf:
+            for i in range(start, end):
+                try:
+                    texts[i] = pdf.pages[i].extract_text() or ""
+                except Exception:
+                    failed.append(i)
+    except Exception:
+        failed = [i for i in range(start, end) if i not in texts]
+    if failed:
+        try:
+            texts.update(_extract_with_pypdf2(content, failed))
+        except Exception as e:
+            logger.error(f"PyPDF2 fallback failed for pages {failed[0]}-{failed[-1]}: {e}")
+            texts.update({i: "" for i in failed})
+    return texts
+
+
+def _page_cache_path(doc_sha: str, page: int) -> str:
+    return os.path.join(PDF_PAGE_CACHE_DIR, doc_sha, f"{page:05d}.txt")
+
+
+def _cached_page(doc_sha: str, page: int) -> Optional[str]:
+    with _memo_lock:
+        text = _memo.get((doc_sha, page))
+        if text is not None:
+            _memo.move_to_end((doc_sha, page))
+    if text is not None:
+        return text
+    path = _page_cache_path(doc_sha, page)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        _remember(doc_sha, page, text)
+        return text
+    return None
+
+
+def _remember(doc_sha: str, page: int, text: str) -> None:
+    with _memo_lock:
+        _memo[(doc_sha, page)] = text
+        while len(_memo) > PDF_PAGE_MEMO_MAX:
+            _memo.popitem(last=False)
+
+
+def _store_page(doc_sha: str, page: int, text: str) -> None:
+    _remember(doc_sha, page, text)
+    path = _page_cache_path(doc_sha, page)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _ranges(pages: List[int], workers: int) -> List[Tuple[int, int]]:
+    """Group missing pages into contiguous ranges, about two per worker."""
+    if not pages:
+        return []
+    size = max(1, -(-len(pages) // (workers * 2)))
+    ranges = []
+    start = prev = pages[0]
+    for page in pages[1:]:
+        if page != prev + 1 or page - start >= size:
+            ranges.append((start, prev + 1))
+            start = page
+        prev = page
+    ranges.append((start, prev + 1))
+    return ranges
+
+
+def iter_pages(content: bytes, doc_sha: Optional[str] = None, ordered: bool = True,
+               use_cache: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page of a PDF.
+
+    Cached pages are yielded immediately; the rest are extracted on the
+    process pool. With ordered=True pages come out in document order as soon
+    as every earlier page is done; otherwise in completion order.
+    """
+    doc_sha = doc_sha or hashlib.sha256(content).hexdigest()
+    total = count_pages(content)
+
+    ready: Dict[int, str] = {}
+    missing: List[int] = []
+    for page in range(total):
+        text = _cached_page(doc_sha, page) if use_cache else None
+        if text is None:
+            missing.append(page)
+        else:
+            ready[page] = text
+
+    next_page = 0
+
+    def drain() -> Iterator[Tuple[int, str]]:
+        nonlocal next_page
+        if ordered:
+            while next_page in ready:
+                yield next_page, ready.pop(next_page)
+                next_page += 1
+        else:
+            for page in sorted(ready):
+                yield page, ready.pop(page)
+
+    yield from drain()
+
+    if not missing:
+        return
+
+    if PDF_WORKERS <= 1 or len(missing) < PDF_PARALLEL_MIN_PAGES:
+        for start, end in _ranges(missing, 1):
+            for page, text in extract_page_range(content, start, end).items():
+                if use_cache:
+                    _store_page(doc_sha, page, text)
+                ready[page] = text
+        yield from drain()
+        return
+
+    pool = get_process_pool()
+    futures = [pool.submit(extract_page_range, content, start, end)
+               for start, end in _ranges(missing, PDF_WORKERS)]
+    for future in as_completed(futures):
+        for page, text in future.result().items():
+            if use_cache:
+                _store_page(doc_sha, page, text)
+            ready[page] = text
+        yield from drain()
+
+
+def extract_pdf_text(content: bytes, doc_sha: Optional[str] = None) -> str:
+    """Extract the full text of a PDF using the page-parallel pipeline."""
+    return "\n\n".join(text for _, text in iter_pages(content, doc_sha))
@@ -0,0 +1,186 @@
+"""
+Bedrock prompt caching for the static parts of agent requests.
+
+The agent system prompts (GitHub, JIRA, supervisor) and the MCP tool
+definitions are identical on every turn, and within one agent run each
+Converse call repeats the whole conversation so far (the first user message
+with the swagger/BRD excerpt, earlier tool calls and results). This module
+adds Bedrock cache checkpoints so those prefixes are read from the prompt
+cache instead of being processed again:
+
+- after the system prompt
+- after the tool definitions
+- after the conversation prefix (every message but the latest)
+
+A checkpoint is only placed when the prefix is long enough to be cached
+(PROMPT_CACHE_MIN_TOKENS) and the model supports caching; requests that
+already carry checkpoints are left alone. The caller's messages are copied,
+never modified, so checkpoints do not accumulate in agent history.
+
+Usage reported by Bedrock (cacheReadInputTokens / cacheWriteInputTokens) is
+collected from Converse and ConverseStream responses; get_prompt_cache_stats()
+returns hit rate and tokens served from the cache.
+
+It is installed on governed boto sessions (bedrock_gateway).
+
+Environment variables:
+    PROMPT_CACHING           on | off (default: on)
+    PROMPT_CACHE_MIN_TOKENS  Minimum estimated prefix size (default: 1024)
+    PROMPT_CACHE_MODELS      Comma-separated model id substrings that support caching
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List
+
+from prompt_compaction import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHING = os.getenv("PROMPT_CACHING", "on").lower() not in ("off", "false", "0")
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+PROMPT_CACHE_MODELS = [m.strip() for m in os.getenv(
+    "PROMPT_CACHE_MODELS",
+    "claude-3-7-sonnet,claude-sonnet-4,claude-opus-4,claude-3-5-haiku,claude-haiku-4,nova",
+).split(",") if m.strip()]
+
+# Bedrock allows at most four checkpoints per request
+MAX_CACHE_POINTS = 4
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+# Cache reads are billed at a tenth of the input token price
+CACHE_READ_PRICE_RATIO = 0.1
+
+_stats_lock = threading.Lock()
+_totals = {"requests": 0, "cached_requests": 0, "cache_points": 0, "hits": 0,
+           "input_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0}
+
+
+def supports_caching(model_id: str) -> bool:
+    return any(pattern in model_id for pattern in PROMPT_CACHE_MODELS)
+
+
+def _size(value: Any) -> int:
+    return estimate_tokens(json.dumps(value, default=str, ensure_ascii=False))
+
+
+def _count_cache_points(blocks: List[Dict[str, Any]]) -> int:
+    return sum(1 for block in blocks if isinstance(block, dict) and "cachePoint" in block)
+
+
+def add_cache_points(params: Dict[str, Any], min_tokens: int = PROMPT_CACHE_MIN_TOKENS) -> int:
+    """
+    Insert cache checkpoints into Converse parameters in place.
+
+    Only the top-level lists are replaced, so structures shared with the
+    caller are not modified. Returns the number of checkpoints added.
+    """
+    system = params.get("system") or []
+    tools = (params.get("toolConfig") or {}).get("tools") or []
+    messages = params.get("messages") or []
+    existing = (_count_cache_points(system) + _count_cache_points(tools)
+                + sum(_count_cache_points(m.get("content") or []) for m in messages))
+    if existing:
+        return 0
+
+    added = 0
+    # Checkpoints cover everything before them (tools, then system, then messages)
+    prefix = _size(tools)
+    if tools and prefix >= min_tokens:
+        params["toolConfig"] = dict(params["toolConfig"], tools=list(tools) + [CACHE_POINT])
+        added += 1
+    prefix += _size(system)
+    if system and prefix >= min_tokens:
+        params["system"] = list(system) + [CACHE_POINT]
+        added += 1
+    if len(messages) > 1:
+        prefix += _size(messages[:-1])
+        if prefix >= min_tokens and added < MAX_CACHE_POINTS:
+            index = len(messages) - 2
+            previous = messages[index]
+            messages = list(messages)
+            messages[index] = dict(previous, content=list(previous.get("content") or []) + [CACHE_POINT])
+            params["messages"] = messages
+            added += 1
+    return added
+
+
+def record_usage(usage: Dict[str, Any], cache_points: int) -> None:
+    read = usage.get("cacheReadInputTokens", 0) or 0
+    write = usage.get("cacheWriteInputTokens", 0) or 0
+    with _stats_lock:
+        _totals["requests"] += 1
+        _totals["input_tokens"] += usage.get("inputTokens", 0) or 0
+        _totals["cache_read_tokens"] += read
+        _totals["cache_write_tokens"] += write
+        if cache_points:
+            _totals["cached_requests"] += 1
+            _totals["cache_points"] += cache_points
+            if read:
+                _totals["hits"] += 1
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """Cumulative prompt cache usage for this process."""
+    with _stats_lock:
+        totals = dict(_totals)
+    cached = totals["cached_requests"]
+    totals["enabled"] = PROMPT_CACHING
+    totals["hit_rate"] = round(totals["hits"] / cached, 3) if cached else 0.0
+    totals["tokens_saved"] = int(totals["cache_read_tokens"] * (1 - CACHE_READ_PRICE_RATIO))
+    return totals
+
+
+class _UsageObservingStream:
+    """Wraps a ConverseStream event stream to pick up the final usage metadata."""
+
+    def __init__(self, stream, cache_points: int):
+        self._stream = stream
+        self._cache_points = cache_points
+
+    def __iter__(self):
+        for event in self._stream:
+            if "metadata" in event:
+                record_usage(event["metadata"].get("usage") or {}, self._cache_points)
+            yield event
+
+    def close(self):
+        self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _PromptCacheHooks:
+    """botocore event handlers; the checkpoint count travels in the request context."""
+
+    def before_parameter_build(self, params, model, context=None, **kwargs):
+        if model.name not in ("Converse", "ConverseStream"):
+            return
+        added = 0
+        if PROMPT_CACHING and supports_caching(params.get("modelId", "")):
+            added = add_cache_points(params)
+        if context is not None:
+            context["prompt_cache_points"] = added
+
+    def after_call(self, http_response, parsed, model, context=None, **kwargs):
+        if model.name not in ("Converse", "ConverseStream") or http_response.status_code >= 400:
+            return
+        cache_points = (context or {}).get("prompt_cache_points", 0)
+        if "usage" in parsed:
+            record_usage(parsed["usage"], cache_points)
+        elif "stream" in parsed:
+            parsed["stream"] = _UsageObservingStream(parsed["stream"], cache_points)
+
+
+_hooks = _PromptCacheHooks()
+
+
+def install_prompt_caching(boto_session) -> None:
+    """Add cache checkpoints to Converse calls of clients created from boto_session."""
+    events = boto_session.events
+    events.register("before-parameter-build.bedrock-runtime", _hooks.before_parameter_build,
+                    unique_id="prompt-cache-before-parameter-build")
+    events.register("after-call.bedrock-runtime", _hooks.after_call,
+                    unique_id="prompt-cache-after-call")
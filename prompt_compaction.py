@@ -0,0 +1,210 @@
+"""
+Compaction of large tool results before they are sent to Bedrock.
+
+BRD documents, swagger specs and raw SmartLinx responses are often far larger
+than what the model needs. This module shrinks them while keeping structure:
+
+- JWTs and other long opaque tokens are replaced by a short placeholder
+- Fields not declared in an optional JSON schema are dropped
+- Null/empty fields and duplicate list items are removed
+- Long lists keep their first items plus an omitted-count marker
+- Long strings and free text keep head and tail with a truncation marker
+
+Every compaction reports bytes and estimated tokens saved, and cumulative
+totals are available from get_compaction_stats().
+"""
+
+import functools
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_MAX_CHARS = int(os.getenv("COMPACTION_MAX_CHARS", "12000"))
+COMPACTION_MAX_STRING = int(os.getenv("COMPACTION_MAX_STRING", "1500"))
+COMPACTION_MAX_LIST = int(os.getenv("COMPACTION_MAX_LIST", "20"))
+
+_JWT_PATTERN = re.compile(r"eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_INLINE_SPACE = re.compile(r"[ \t]{2,}")
+
+_stats_lock = threading.Lock()
+_totals = {"calls": 0, "bytes_before": 0, "bytes_after": 0, "tokens_saved": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate used for reporting (about 4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def redact_tokens(text: str) -> str:
+    return _JWT_PATTERN.sub(lambda m: f"<jwt:{len(m.group(0))} chars>", text)
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    head = int(limit * 0.7)
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n...[{omitted} chars omitted]...\n{text[-tail:]}"
+
+
+def compact_value(
+    value: Any,
+    schema: Optional[Dict[str, Any]] = None,
+    max_string: int = COMPACTION_MAX_STRING,
+    max_list: int = COMPACTION_MAX_LIST,
+) -> Any:
+    """
+    Recursively compact a JSON-like value.
+
+    Args:
+        value: Parsed JSON value (dict, list, scalar)
+        schema: Optional JSON schema; object properties not declared in it are dropped
+        max_string: Maximum length of any string value
+        max_list: Maximum number of list items kept
+
+    Returns:
+        The compacted value
+    """
+    if isinstance(value, str):
+        return _truncate(redact_tokens(value), max_string)
+
+    if isinstance(value, dict):
+        properties = (schema or {}).get("properties")
+        compacted = {}
+        for key, item in value.items():
+            if properties is not None and key not in properties:
+                continue
+            if item is None or item == "" or item == [] or item == {}:
+                continue
+            child_schema = properties.get(key) if properties else None
+            compacted[key] = compact_value(item, child_schema, max_string, max_list)
+        return compacted
+
+    if isinstance(value, list):
+        item_schema = (schema or {}).get("items")
+        seen = set()
+        unique = []
+        for item in value:
+            marker = json.dumps(item, sort_keys=True, default=str)
+            if marker in seen:
+                continue
+            seen.add(marker)
+            unique.append(item)
+        kept = [compact_value(item, item_schema, max_string, max_list) for item in unique[:max_list]]
+        omitted = len(value) - len(kept)
+        if omitted > 0:
+            kept.append(f"...[{omitted} more items omitted ({len(value)} total, duplicates removed)]")
+        return kept
+
+    return value
+
+
+def compact_text(text: str, max_chars: int = COMPACTION_MAX_CHARS) -> str:
+    """Compact free text: redact tokens, drop repeated lines and blank runs, truncate."""
+    text = redact_tokens(text)
+    lines = []
+    previous = None
+    for line in text.splitlines():
+        stripped = line.rstrip()
+        if stripped and stripped == previous:
+            continue
+        lines.append(_INLINE_SPACE.sub(" ", stripped))
+        previous = stripped
+    text = _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+    return _truncate(text, max_chars)
+
+
+def _record(before: int, after: int) -> None:
+    with _stats_lock:
+        _totals["calls"] += 1
+        _totals["bytes_before"] += before
+        _totals["bytes_after"] += after
+        _totals["tokens_saved"] += max(0, (before - after + 3) // 4)
+
+
+def compact_tool_result(
+    result: Any,
+    schema: Optional[Dict[str, Any]] = None,
+    max_chars: int = COMPACTION_MAX_CHARS,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Compact a tool result (JSON string, parsed JSON or free text) for the prompt.
+
+    Returns:
+        Tuple of (compacted text, stats dict with bytes/tokens before and after)
+    """
+    if isinstance(result, (dict, list)):
+        original = json.dumps(result, default=str)
+        parsed: Any = result
+    else:
+        original = result if isinstance(result, str) else str(result)
+        parsed = None
+        stripped = original.strip()
+        if stripped[:1] in ("{", "["):
+            try:
+                parsed = json.loads(stripped)
+            except json.JSONDecodeError:
+                parsed = None
+
+    if parsed is not None:
+        compacted = json.dumps(compact_value(parsed, schema), separators=(",", ":"), default=str)
+        compacted = _truncate(compacted, max_chars)
+    else:
+        compacted = compact_text(original, max_chars)
+
+    before = len(original.encode("utf-8"))
+    after = len(compacted.encode("utf-8"))
+    _record(before, after)
+    stats = {
+        "bytes_before": before,
+        "bytes_after": after,
+        "bytes_saved": before - after,
+        "tokens_before": estimate_tokens(original),
+        "tokens_after": estimate_tokens(compacted),
+    }
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+    return compacted, stats
+
+
+def compacting_tool(
+    schema: Optional[Dict[str, Any]] = None,
+    max_chars: int = COMPACTION_MAX_CHARS,
+) -> Callable:
+    """
+    Decorator that compacts the return value of a tool function.
+
+    Apply beneath the agent framework's tool decorator so the model only ever
+    sees the compacted result, e.g.:
+
+        @tool
+        @compacting_tool(max_chars=8000)
+        def s3_swagger_tool(query: str) -> str: ...
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            compacted, stats = compact_tool_result(result, schema, max_chars)
+            logger.info(
+                f"Compacted {fn.__name__} result: {stats['bytes_before']} -> {stats['bytes_after']} bytes "
+                f"(~{stats['tokens_saved']} tokens saved)")
+            return compacted
+        return wrapper
+    return decorator
+
+
+def get_compaction_stats() -> Dict[str, Any]:
+    """Cumulative compaction totals for this process."""
+    with _stats_lock:
+        totals = dict(_totals)
+    before = totals["bytes_before"]
+    totals["bytes_saved"] = before - totals["bytes_after"]
+    totals["ratio"] = round(totals["bytes_after"] / before, 3) if before else 1.0
+    return totals
@@ -0,0 +1,201 @@
+"""
+Routing stage in front of the JIRA and supervisor agents.
+
+Every query used to run the full Sonnet agent loop, including one-step
+lookups such as the chatbot sidebar examples ("TBAPI-1", "List all JIRA
+projects"). QueryRouter classifies a query before it reaches the agent:
+
+- tool     a direct lookup (a bare issue key, "get details for TBAPI-1",
+           "list all projects") is answered by calling the MCP tool through
+           the shared session pool, with no LLM call at all
+- fast     greetings and "what can you do" questions go to a small model
+           (ROUTER_FAST_MODEL_ID) without tools
+- agent    everything else, and any shortcut that fails, runs the agent
+
+Tool routes are only used when the tool is present in the cached schemas of
+the MCP server (mcp_tool_cache), so a renamed tool degrades to the agent
+instead of failing. Latency is recorded per route.
+
+Environment variables:
+    QUERY_ROUTING              on | off (default: on)
+    ROUTER_FAST_MODEL_ID       Bedrock model for the fast route; empty disables it
+    ROUTER_JIRA_ISSUE_TOOL     MCP tool for issue lookups (default: jira_get_issue)
+    ROUTER_JIRA_PROJECTS_TOOL  MCP tool for project listing (default: jira_get_all_projects)
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUERY_ROUTING = os.getenv("QUERY_ROUTING", "on").lower() not in ("off", "false", "0")
+ROUTER_FAST_MODEL_ID = os.getenv("ROUTER_FAST_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+ROUTER_JIRA_ISSUE_TOOL = os.getenv("ROUTER_JIRA_ISSUE_TOOL", "jira_get_issue")
+ROUTER_JIRA_PROJECTS_TOOL = os.getenv("ROUTER_JIRA_PROJECTS_TOOL", "jira_get_all_projects")
+
+_ISSUE_KEY = re.compile(r"\b([A-Z][A-Z0-9]+-\d+)\b")
+# Words that may surround an issue key in a plain lookup ("show me the details for TBAPI-1")
+_LOOKUP_WORDS = {"get", "show", "fetch", "view", "open", "display", "me", "the", "details", "detail",
+                 "for", "of", "on", "issue", "ticket", "info", "information", "about", "please", "jira"}
+_LIST_PROJECTS = re.compile(
+    r"^(?:please\s+)?(?:list|show|get|fetch|display)\s+(?:me\s+)?(?:all\s+)?(?:the\s+)?(?:available\s+)?"
+    r"(?:jira\s+)?projects?(?:\s+in\s+jira)?\s*[.?!]?$", re.IGNORECASE)
+_SMALL_TALK = re.compile(
+    r"^(?:hi|hello|hey|thanks|thank you|good (?:morning|afternoon|evening)|"
+    r"what can you do|who are you|help|how do i use (?:this|you))\s*[.?!]*$", re.IGNORECASE)
+
+
+class Route:
+    """Outcome of classifying a query."""
+
+    def __init__(self, name: str, kind: str, tool: Optional[str] = None,
+                 arguments: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.tool = tool
+        self.arguments = arguments or {}
+
+
+AGENT_ROUTE = Route("agent", "agent")
+
+
+def format_tool_result(result: Dict[str, Any]) -> str:
+    """Render a direct MCP tool result (strands tool result format) as markdown."""
+    texts = [item.get("text", "") for item in result.get("content", [])]
+    parts = []
+    for text in texts:
+        try:
+            parsed = json.loads(text)
+        except (TypeError, ValueError):
+            parts.append(text)
+            continue
+        parts.append("```json\n" + json.dumps(parsed, indent=2, ensure_ascii=False) + "\n```")
+    return "\n\n".join(parts)
+
+
+class QueryRouter:
+    """Classifies queries and answers simple ones without the full agent loop."""
+
+    def __init__(self, service: str, tool_server: Optional[str] = "jira", capabilities: str = "",
+                 fast_model_id: Optional[str] = ROUTER_FAST_MODEL_ID, enabled: bool = QUERY_ROUTING):
+        self.service = service
+        self.tool_server = tool_server
+        self.capabilities = capabilities
+        self.fast_model_id = fast_model_id
+        self.enabled = enabled
+        self._latencies: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._fast_client = None
+
+    def _tool_available(self, tool: str) -> bool:
+        if not self.tool_server:
+            return False
+        from mcp_tool_cache import get_mcp_tool_cache
+        # Routing must stay cheap: only a cached entry counts, and a miss is
+        # filled by the background refresh for later queries
+        try:
+            tools = get_mcp_tool_cache().cached_tools(self.tool_server)
+        except Exception as e:
+            logger.debug(f"Tool schemas for {self.tool_server} unavailable: {e}")
+            return False
+        return any(t["name"] == tool for t in tools or [])
+
+    def classify(self, query: str) -> Route:
+        if not self.enabled:
+            return AGENT_ROUTE
+        text = query.strip()
+
+        keys = _ISSUE_KEY.findall(text)
+        if len(keys) == 1:
+            rest = re.sub(r"[^\w\s-]", " ", _ISSUE_KEY.sub(" ", text)).lower().split()
+            if all(word in _LOOKUP_WORDS for word in rest) and self._tool_available(ROUTER_JIRA_ISSUE_TOOL):
+                return Route("issue_lookup", "tool", ROUTER_JIRA_ISSUE_TOOL, {"issue_key": keys[0]})
+
+        if _LIST_PROJECTS.match(text) and self._tool_available(ROUTER_JIRA_PROJECTS_TOOL):
+            return Route("list_projects", "tool", ROUTER_JIRA_PROJECTS_TOOL)
+
+        if self.fast_model_id and _SMALL_TALK.match(text):
+            return Route("small_talk", "fast")
+
+        return AGENT_ROUTE
+
+    def _call_tool(self, route: Route) -> str:
+        from mcp_pool import get_mcp_pool
+        result = get_mcp_pool().client(self.tool_server).call_tool_sync(
+            f"router-{route.name}", route.tool, route.arguments)
+        if result["status"] != "success":
+            raise RuntimeError(format_tool_result(result) or f"Tool {route.tool} failed")
+        return format_tool_result(result)
+
+    def _call_fast_model(self, query: str) -> str:
+        if self._fast_client is None:
+            # Governed client: the call goes through the shared Bedrock gateway
+            from bedrock_gateway import governed_bedrock_client
+            self._fast_client = governed_bedrock_client()
+        system = f"You are the front desk of the {self.service}. Answer briefly. {self.capabilities}".strip()
+        response = self._fast_client.converse(
+            modelId=self.fast_model_id,
+            system=[{"text": system}],
+            messages=[{"role": "user", "content": [{"text": query}]}],
+            inferenceConfig={"maxTokens": 512, "temperature": 0.2},
+        )
+        return "".join(block.get("text", "") for block in response["output"]["message"]["content"])
+
+    def _record(self, route: str, elapsed_ms: float, outcome: str) -> None:
+        with self._lock:
+            self._latencies.setdefault(route, deque(maxlen=500)).append(elapsed_ms)
+            counts = self._counts.setdefault(route, {"requests": 0, "fallbacks": 0, "errors": 0})
+            counts["requests"] += 1
+            if outcome != "ok":
+                counts[outcome] += 1
+
+    def run(self, query: str, agent_fn: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Answer a query through its route; returns (result, route name).
+
+        agent_fn runs the full agent and is used for the agent route and as
+        the fallback when a shortcut fails.
+        """
+        started = time.perf_counter()
+        route = self.classify(query)
+        if route.kind != "agent":
+            try:
+                if route.kind == "tool":
+                    result = self._call_tool(route)
+                else:
+                    result = self._call_fast_model(query)
+                if result:
+                    self._record(route.name, (time.perf_counter() - started) * 1000, "ok")
+                    return result, route.name
+            except Exception as e:
+                logger.warning(f"[{self.service}] {route.name} shortcut failed, using the agent: {e}")
+            self._record(route.name, (time.perf_counter() - started) * 1000, "fallbacks")
+            route = AGENT_ROUTE
+
+        try:
+            result = agent_fn()
+        except Exception:
+            self._record(route.name, (time.perf_counter() - started) * 1000, "errors")
+            raise
+        self._record(route.name, (time.perf_counter() - started) * 1000, "ok")
+        return result, route.name
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for name, samples in self._latencies.items():
+                ordered = sorted(samples)
+                routes[name] = dict(
+                    self._counts[name],
+                    avg_ms=round(sum(ordered) / len(ordered), 1),
+                    p50_ms=round(ordered[len(ordered) // 2], 1),
+                    p95_ms=round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                )
+        return {"enabled": self.enabled, "routes": routes}
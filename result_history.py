@@ -0,0 +1,360 @@
+"""
+Columnar history of test case results.
+
+Execution reports (/execute, /cases/differential) used to be returned once
+and then lost, so flaky-test and performance questions meant running the
+suite again. Every executed case is now appended to a Parquet store:
+
+- One immutable file per recorded run, partitioned by day
+  (result_history/date=YYYY-MM-DD/<run_id>.parquet), so appends from several
+  worker processes never touch the same file
+- Columns: run_id, suite, recorded_at, case_id, case_name, method, endpoint,
+  status_code, passed, skipped, elapsed_ms, error
+- Endpoints are normalized to "METHOD /path" with ids replaced by {id}, so
+  runs against different org levels aggregate together
+- compact() merges the files of finished days into one file per day
+
+Queries load the store into one in-memory DataFrame that is extended with
+new files only, then answer pass-rate and latency trends per endpoint, flaky
+cases (cases that both passed and failed) and latency regressions (recent
+median against the baseline median) with pandas group-bys.
+
+Environment variables:
+    RESULT_HISTORY_DIR        Store directory (default: result_history)
+    RESULT_HISTORY            on | off (default: on)
+    RESULT_HISTORY_MAX_ERROR  Characters of an error message kept (default: 500)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RESULT_HISTORY_DIR = os.getenv("RESULT_HISTORY_DIR", "result_history")
+RESULT_HISTORY = os.getenv("RESULT_HISTORY", "on").lower() not in ("off", "false", "0")
+RESULT_HISTORY_MAX_ERROR = int(os.getenv("RESULT_HISTORY_MAX_ERROR", "500"))
+
+COLUMNS = ["run_id", "suite", "recorded_at", "case_id", "case_name", "method", "endpoint",
+           "status_code", "passed", "skipped", "elapsed_ms", "error"]
+COMPACTED_FILE = "compacted.parquet"
+
+_PARTITION = re.compile(r"^date=(\d{4}-\d{2}-\d{2})$")
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$", re.IGNORECASE)
+_LEADING_PLACEHOLDER = re.compile(r"^\{\{[^}]+\}\}")
+# Run ids become file names
+_RUN_ID = re.compile(r"^[A-Za-z0-9_.-]{1,100}$")
+
+
+def endpoint_label(method: str, url: str) -> str:
+    """Normalize a case request to "METHOD /path" without host, query string or ids."""
+    path = _LEADING_PLACEHOLDER.sub("", url or "")
+    if "://" in path:
+        path = path.split("://", 1)[1]
+        path = path[path.find("/"):] if "/" in path else "/"
+    segments = [s for s in path.split("?", 1)[0].split("/") if s]
+    path = "/" + "/".join("{id}" if _ID_SEGMENT.match(s) else s for s in segments)
+    return f"{(method or 'GET').upper()} {path}"
+
+
+def _rows(report: Dict[str, Any], run_id: str, suite: str, recorded_at: datetime,
+          cases: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    operations = {c.get("id"): c.get("operation") for c in cases or [] if c.get("operation")}
+    rows = []
+    for result in report.get("results", []):
+        if result.get("reused"):
+            # Carried over from an earlier run by change_impact; already recorded then
+            continue
+        error = str(result.get("error") or "; ".join(str(f) for f in result.get("failures") or []))
+        rows.append({
+            "run_id": run_id,
+            "suite": suite,
+            "recorded_at": recorded_at,
+            "case_id": result["id"],
+            "case_name": result.get("name", result["id"]),
+            "method": result.get("method", "GET"),
+            "endpoint": operations.get(result["id"]) or endpoint_label(result.get("method"), result.get("url")),
+            "status_code": result.get("status_code"),
+            "passed": bool(result.get("passed")),
+            "skipped": bool(result.get("skipped")),
+            "elapsed_ms": result.get("elapsed_ms"),
+            "error": error[:RESULT_HISTORY_MAX_ERROR] or None,
+        })
+    return rows
+
+
+class ResultHistory:
+    """Append-only Parquet store of case results with trend queries."""
+
+    def __init__(self, directory: str = RESULT_HISTORY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._frames: Dict[str, Any] = {}
+        self._frame = None
+        self.stats = {"runs_recorded": 0, "rows_recorded": 0, "files_loaded": 0, "compactions": 0}
+
+    # -- writing -----------------------------------------------------------
+
+    def record(self, report: Dict[str, Any], suite: str = "default", run_id: Optional[str] = None,
+               cases: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        """
+        Append the executed results of a CaseExecutor / run_differential report.
+
+        Args:
+            report: Report with a "results" list; results marked reused are skipped
+            suite: Suite name the run belongs to
+            run_id: Optional id ([A-Za-z0-9_.-]); a new one is generated otherwise
+            cases: Optional case list; a case's "operation" overrides the derived endpoint
+
+        Returns:
+            The run id, or None when there was nothing to record
+
+        Raises:
+            ValueError: If run_id is malformed or already recorded
+        """
+        import pandas as pd
+
+        recorded_at = datetime.now(timezone.utc)
+        if run_id is not None:
+            if not _RUN_ID.match(run_id) or run_id.strip(".") == "":
+                raise ValueError(f"Invalid run id '{run_id}'; use letters, digits, '_', '.' and '-'")
+            if self._run_exists(run_id):
+                raise ValueError(f"Run '{run_id}' is already recorded")
+        run_id = run_id or f"{recorded_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        rows = _rows(report, run_id, suite, recorded_at, cases)
+        if not rows:
+            return None
+        frame = pd.DataFrame(rows, columns=COLUMNS).astype({
+            "status_code": "Int64", "elapsed_ms": "float64", "passed": "bool", "skipped": "bool"})
+        partition = os.path.join(self.directory, f"date={recorded_at:%Y-%m-%d}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, f"{run_id}.parquet")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        try:
+            # link() fails when the file exists, so a concurrent writer cannot replace a run
+            os.link(tmp_path, path)
+        except FileExistsError:
+            raise ValueError(f"Run '{run_id}' is already recorded")
+        finally:
+            os.remove(tmp_path)
+        with self._lock:
+            self.stats["runs_recorded"] += 1
+            self.stats["rows_recorded"] += len(rows)
+        logger.info(f"Recorded {len(rows)} results of run {run_id} ({suite})")
+        return run_id
+
+    def compact(self, before: Optional[str] = None) -> int:
+        """Merge each finished day's run files into one file; returns the number of days compacted."""
+        import pandas as pd
+
+        today = before or f"{datetime.now(timezone.utc):%Y-%m-%d}"
+        compacted = 0
+        for day, partition in self._partitions():
+            if day >= today:
+                continue
+            files = sorted(f for f in os.listdir(partition) if f.endswith(".parquet"))
+            if len(files) < 2:
+                continue
+            frame = pd.concat([pd.read_parquet(os.path.join(partition, f)) for f in files], ignore_index=True)
+            target = os.path.join(partition, COMPACTED_FILE)
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            frame.to_parquet(tmp_path, index=False)
+            # A reader listing the day in between counts it twice until its next refresh
+            os.replace(tmp_path, target)
+            for name in files:
+                if name != COMPACTED_FILE:
+                    os.remove(os.path.join(partition, name))
+            compacted += 1
+        with self._lock:
+            self.stats["compactions"] += compacted
+            if compacted:
+                self._frames.clear()
+                self._frame = None
+        return compacted
+
+    def _run_exists(self, run_id: str) -> bool:
+        if any(os.path.exists(os.path.join(partition, f"{run_id}.parquet"))
+               for _, partition in self._partitions()):
+            return True
+        # Compacted days no longer have one file per run
+        frame = self.frame()
+        return not frame.empty and bool((frame["run_id"] == run_id).any())
+
+    # -- reading -----------------------------------------------------------
+
+    def _partitions(self):
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        return [(m.group(1), os.path.join(self.directory, name))
+                for name in names for m in [_PARTITION.match(name)] if m]
+
+    def frame(self, since: Optional[datetime] = None):
+        """All recorded rows (optionally since a time) as one DataFrame; new files are loaded incrementally."""
+        import pandas as pd
+
+        with self._lock:
+            paths = [os.path.join(partition, name)
+                     for _, partition in self._partitions()
+                     for name in sorted(os.listdir(partition)) if name.endswith(".parquet")]
+            current = set(paths)
+            stale = [path for path in self._frames if path not in current]
+            for path in stale:
+                del self._frames[path]
+            added = [path for path in paths if path not in self._frames]
+            for path in added:
+                try:
+                    self._frames[path] = pd.read_parquet(path, columns=COLUMNS)
+                except (FileNotFoundError, OSError) as e:
+                    # Removed by a concurrent compaction; the merged file is picked up next time
+                    logger.debug(f"Skipping history file {path}: {e}")
+            self.stats["files_loaded"] += len(added)
+            if added or stale or self._frame is None:
+                frames = list(self._frames.values())
+                self._frame = (pd.concat(frames, ignore_index=True) if frames
+                               else pd.DataFrame(columns=COLUMNS))
+            frame = self._frame
+        if since is not None and not frame.empty:
+            frame = frame[frame["recorded_at"] >= pd.Timestamp(since)]
+        return frame
+
+    def _filtered(self, endpoint: Optional[str], suite: Optional[str], days: Optional[float]):
+        since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+        frame = self.frame(since)
+        if endpoint:
+            frame = frame[frame["endpoint"] == endpoint]
+        if suite:
+            frame = frame[frame["suite"] == suite]
+        # Skipped cases never reached the API, so they say nothing about it
+        return frame[~frame["skipped"]]
+
+    def pass_rate_trend(self, endpoint: Optional[str] = None, suite: Optional[str] = None,
+                        days: Optional[float] = 30, bucket: str = "1D") -> List[Dict[str, Any]]:
+        """Pass rate per endpoint and time bucket."""
+        frame = self._filtered(endpoint, suite, days)
+        if frame.empty:
+            return []
+        grouped = frame.groupby(["endpoint", frame["recorded_at"].dt.floor(bucket)]).agg(
+            runs=("run_id", "nunique"), cases=("case_id", "size"), passed=("passed", "sum"))
+        grouped["pass_rate"] = (grouped["passed"] / grouped["cases"]).round(4)
+        return _records(grouped.reset_index().rename(columns={"recorded_at": "bucket"}))
+
+    def latency_trend(self, endpoint: Optional[str] = None, suite: Optional[str] = None,
+                      days: Optional[float] = 30, bucket: str = "1D") -> List[Dict[str, Any]]:
+        """Latency percentiles (ms) per endpoint and time bucket."""
+        frame = self._filtered(endpoint, suite, days).dropna(subset=["elapsed_ms"])
+        if frame.empty:
+            return []
+        grouped = frame.groupby(["endpoint", frame["recorded_at"].dt.floor(bucket)])["elapsed_ms"].agg(
+            requests="size", mean="mean", p50="median",
+            p95=lambda s: s.quantile(0.95), max="max").round(1)
+        return _records(grouped.reset_index().rename(columns={"recorded_at": "bucket"}))
+
+    def flaky_cases(self, suite: Optional[str] = None, days: Optional[float] = 30,
+                    min_runs: int = 3) -> List[Dict[str, Any]]:
+        """Cases that both passed and failed, ranked by how often their outcome flipped between runs."""
+        frame = self._filtered(None, suite, days)
+        if frame.empty:
+            return []
+        frame = frame.sort_values("recorded_at")
+        keys = ["suite", "case_id"]
+        frame = frame.assign(flipped=frame.groupby(keys)["passed"].transform(
+            lambda s: s.ne(s.shift()).astype(int).cumsum() - 1))
+        grouped = frame.groupby(keys).agg(
+            endpoint=("endpoint", "last"), case_name=("case_name", "last"), runs=("run_id", "nunique"),
+            pass_rate=("passed", "mean"), flips=("flipped", "max"), last_error=("error", "last"),
+            last_seen=("recorded_at", "max"))
+        grouped = grouped[(grouped["runs"] >= min_runs) & (grouped["pass_rate"] > 0) & (grouped["pass_rate"] < 1)]
+        grouped["flip_rate"] = (grouped["flips"] / (grouped["runs"] - 1)).round(4)
+        grouped["pass_rate"] = grouped["pass_rate"].round(4)
+        return _records(grouped.sort_values(["flip_rate", "runs"], ascending=False).reset_index())
+
+    def latency_regressions(self, suite: Optional[str] = None, recent_days: float = 1,
+                            baseline_days: float = 14, threshold: float = 1.5,
+                            min_samples: int = 5) -> List[Dict[str, Any]]:
+        """Endpoints whose recent median latency exceeds threshold x the baseline median."""
+        import pandas as pd
+
+        frame = self._filtered(None, suite, recent_days + baseline_days).dropna(subset=["elapsed_ms"])
+        if frame.empty:
+            return []
+        cutoff = pd.Timestamp(datetime.now(timezone.utc) - timedelta(days=recent_days))
+        window = frame["recorded_at"].ge(cutoff).map({True: "recent", False: "baseline"})
+        stats = frame.groupby(["endpoint", window])["elapsed_ms"].agg(["median", "size"]).unstack()
+        if "recent" not in stats["median"] or "baseline" not in stats["median"]:
+            return []
+        stats.columns = [f"{window_name}_{stat}" for stat, window_name in stats.columns]
+        stats = stats[(stats["recent_size"] >= min_samples) & (stats["baseline_size"] >= min_samples)]
+        stats = stats.assign(ratio=(stats["recent_median"] / stats["baseline_median"]).round(3))
+        stats = stats[stats["ratio"] >= threshold].sort_values("ratio", ascending=False)
+        return _records(stats.round(1).reset_index())
+
+    def summary(self) -> Dict[str, Any]:
+        frame = self.frame()
+        summary = dict(self.stats, rows=len(frame), directory=self.directory)
+        if not frame.empty:
+            summary.update(runs=int(frame["run_id"].nunique()), endpoints=int(frame["endpoint"].nunique()),
+                           first=frame["recorded_at"].min().isoformat(),
+                           last=frame["recorded_at"].max().isoformat())
+        return summary
+
+
+def _records(frame) -> List[Dict[str, Any]]:
+    """DataFrame rows as JSON-friendly dicts (timestamps as ISO strings, NaN as None)."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    records = frame.to_dict(orient="records")
+    for record in records:
+        for key, value in record.items():
+            if hasattr(value, "isoformat"):
+                record[key] = value.isoformat()
+            elif hasattr(value, "item"):
+                record[key] = value.item()
+    return records
+
+
+_history: Optional[ResultHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_result_history() -> ResultHistory:
+    """Return the process-wide result history store."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = ResultHistory()
+        return _history
+
+
+def warm_result_history() -> str:
+    """Compact finished days (one worker at a time) and load the store into memory."""
+    history = get_result_history()
+    from shared_cache import get_shared_cache
+    try:
+        leased = get_shared_cache().set("result-history-compact", os.getpid(), ex=3600, nx=True)
+    except Exception:
+        leased = True
+    compacted = history.compact() if leased else 0
+    rows = len(history.frame())
+    return f"{rows} results loaded, {compacted} days compacted"
+
+
+def record_report(report: Dict[str, Any], suite: str = "default",
+                  cases: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+    """Record a report unless history is disabled; failures are logged, never raised."""
+    if not RESULT_HISTORY:
+        return None
+    started = time.perf_counter()
+    try:
+        run_id = get_result_history().record(report, suite=suite, cases=cases)
+    except Exception as e:
+        logger.warning(f"Could not record test results: {e}")
+        return None
+    logger.debug(f"Result history write took {(time.perf_counter() - started) * 1000:.1f} ms")
+    return run_id
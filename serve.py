@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Production runner for the agent servers.
+
+Runs one of the FastAPI apps under N uvicorn worker processes instead of
+the single-process development mode of the `__main__` blocks, so CPU-bound
+work (JSON parsing, response formatting, PDF extraction) uses every core:
+
+- Workers default to WEB_CONCURRENCY, or the CPU count of the container
+- The parent process hosts the shared cache tier (shared_cache) on a Unix
+  socket; session histories default to it so a conversation can land on
+  any worker
+- Workers are recycled gracefully after SERVE_MAX_REQUESTS requests (with
+  jitter so they do not restart together); uvicorn replaces exited workers
+- SERVE_WORKERS tells the workers how many siblings they have, so per-server
+  limits (bedrock_gateway) are split between them
+
+Usage:
+    python serve.py supervisor_agent_server:app --port 8004 [--workers 4]
+"""
+
+import argparse
+import inspect
+import logging
+import os
+import tempfile
+
+import uvicorn
+
+from shared_cache import start_cache_server
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("serve")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an agent server with multiple worker processes")
+    parser.add_argument("app", help="Application import path, e.g. github_agent_server:app")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1)
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("SERVE_MAX_REQUESTS", "1000")))
+    parser.add_argument("--max-requests-jitter", type=int,
+                        default=int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "200")))
+    parser.add_argument("--timeout-keep-alive", type=int, default=600)
+    parser.add_argument("--timeout-graceful-shutdown", type=int, default=60)
+    args = parser.parse_args()
+
+    # Workers inherit the environment, so the socket path and defaults reach them
+    socket_path = os.getenv("SHARED_CACHE_SOCKET") or os.path.join(
+        tempfile.gettempdir(), f"agent-cache-{args.port}.sock")
+    os.environ["SHARED_CACHE_SOCKET"] = socket_path
+    os.environ["SERVE_WORKERS"] = str(args.workers)
+    if args.workers > 1:
+        # The in-memory session store is per process; the shared cache speaks its Redis subset
+        os.environ.setdefault("SESSION_STORE", "redis")
+    cache_server = start_cache_server(socket_path)
+
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "timeout_keep_alive": args.timeout_keep_alive,
+        "timeout_graceful_shutdown": args.timeout_graceful_shutdown,
+    }
+    if args.max_requests > 0:
+        options["limit_max_requests"] = args.max_requests
+        # Older uvicorn releases recycle without jitter
+        if "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters:
+            options["limit_max_requests_jitter"] = args.max_requests_jitter
+
+    logger.info(f"Serving {args.app} on {args.host}:{args.port} with {args.workers} workers")
+    try:
+        uvicorn.run(args.app, **options)
+    finally:
+        cache_server.shutdown()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Conversation store for session_id history.
+
+Keeps per-session conversation turns outside the agent process so history is
+bounded in memory, survives restarts (SQLite) and can be shared between
+replicas (Redis). Prompts sent to Bedrock only carry a windowed view of the
+history: recent turns verbatim, older turns collapsed into a short summary.
+
+Backend selection (environment variables):
+    SESSION_STORE          memory | sqlite | redis (default: memory)
+    SESSION_DB_PATH        SQLite file path (default: sessions/sessions.db)
+    REDIS_URL              Redis URL; without it (or without the redis package)
+                           the shared worker cache (serve.py) or an in-process
+                           Redis-compatible stand-in is used
+    SESSION_MAX_SESSIONS   Sessions kept by the in-memory LRU (default: 500)
+    SESSION_MAX_MESSAGES   Messages retained per session (default: 50)
+    SESSION_TTL_SECONDS    Idle expiry for Redis sessions (default: 86400)
+    SESSION_WINDOW_TURNS   Recent messages sent verbatim (default: 6)
+    SESSION_WINDOW_CHARS   Character budget for the history block (default: 6000)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from prompt_compaction import compact_tool_result
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "500"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_WINDOW_TURNS = int(os.getenv("SESSION_WINDOW_TURNS", "6"))
+SESSION_WINDOW_CHARS = int(os.getenv("SESSION_WINDOW_CHARS", "6000"))
+
+
+def _message(role: str, content: str) -> Dict[str, Any]:
+    return {"role": role, "content": content, "ts": round(time.time(), 3)}
+
+
+class SessionStore:
+    """Base interface for conversation stores."""
+
+    def __init__(self, max_messages: int = SESSION_MAX_MESSAGES):
+        self.max_messages = max_messages
+
+    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> None:
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store with LRU eviction of whole sessions."""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS,
+                 max_messages: int = SESSION_MAX_MESSAGES):
+        super().__init__(max_messages)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(history)
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            history = self._sessions.setdefault(session_id, [])
+            history.append(_message(role, content))
+            del history[:-self.max_messages]
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                logger.debug(f"Evicted session {evicted} from in-memory store")
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Durable store backed by a local SQLite file."""
+
+    def __init__(self, path: str = os.getenv("SESSION_DB_PATH", "sessions/sessions.db"),
+                 max_messages: int = SESSION_MAX_MESSAGES):
+        super().__init__(max_messages)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " role TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " ts REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+
+    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, ts FROM messages WHERE session_id = ? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        return [{"role": role, "content": content, "ts": ts} for role, content, ts in rows]
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        message = _message(role, content)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO messages (session_id, role, content, ts) VALUES (?, ?, ?, ?)",
+                (session_id, message["role"], message["content"], message["ts"]),
+            )
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages),
+            )
+
+    def clear(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the redis client used by
+    RedisSessionStore (rpush, lrange, ltrim, expire, delete).
+
+    Lets the Redis code path run in local development without a server.
+    Expired keys are dropped when read, and writes sweep every expired key
+    at most once per SWEEP_INTERVAL, so abandoned sessions do not pile up.
+    """
+
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self):
+        self._lists: Dict[str, List[str]] = {}
+        self._expiry: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    def _purge(self, key: str) -> None:
+        deadline = self._expiry.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._lists.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def _sweep(self) -> None:
+        # Called with the lock held
+        now = time.time()
+        if now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        for key in [key for key, deadline in self._expiry.items() if deadline <= now]:
+            self._purge(key)
+
+    def rpush(self, key: str, *values: str) -> int:
+        with self._lock:
+            self._sweep()
+            self._purge(key)
+            items = self._lists.setdefault(key, [])
+            items.extend(values)
+            return len(items)
+
+    def lrange(self, key: str, start: int, end: int) -> List[str]:
+        with self._lock:
+            self._purge(key)
+            items = self._lists.get(key, [])
+            stop = None if end == -1 else end + 1
+            return list(items[start:stop])
+
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        with self._lock:
+            items = self._lists.get(key)
+            if items is not None:
+                stop = None if end == -1 else end + 1
+                self._lists[key] = items[start:stop]
+            return True
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if key not in self._lists:
+                return False
+            self._expiry[key] = time.time() + seconds
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                removed += self._lists.pop(key, None) is not None
+                self._expiry.pop(key, None)
+            return removed
+
+
+class RedisSessionStore(SessionStore):
+    """Shared store for multiple replicas, one Redis list per session."""
+
+    def __init__(self, client: Any = None, ttl_seconds: int = SESSION_TTL_SECONDS,
+                 max_messages: int = SESSION_MAX_MESSAGES, prefix: str = "session:"):
+        super().__init__(max_messages)
+        self.client = client if client is not None else _redis_client()
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        raw = self.client.lrange(self._key(session_id), 0, -1)
+        history = []
+        for item in raw:
+            if isinstance(item, bytes):
+                item = item.decode("utf-8")
+            history.append(json.loads(item))
+        return history
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        key = self._key(session_id)
+        self.client.rpush(key, json.dumps(_message(role, content)))
+        self.client.ltrim(key, -self.max_messages, -1)
+        self.client.expire(key, self.ttl_seconds)
+
+    def clear(self, session_id: str) -> None:
+        self.client.delete(self._key(session_id))
+
+
+def _redis_client() -> Any:
+    """
+    Connect to REDIS_URL when possible; otherwise use the cache tier shared
+    by the worker processes (serve.py), or LocalRedis in a single process.
+    """
+    url = os.getenv("REDIS_URL")
+    if url:
+        try:
+            import redis
+            return redis.Redis.from_url(url)
+        except ImportError:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using local stand-in")
+    if os.getenv("SHARED_CACHE_SOCKET"):
+        from shared_cache import get_shared_cache
+        return get_shared_cache()
+    return LocalRedis()
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store configured by SESSION_STORE."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("SESSION_STORE", "memory").lower()
+            if backend == "sqlite":
+                _store = SQLiteSessionStore()
+            elif backend == "redis":
+                _store = RedisSessionStore()
+            else:
+                _store = InMemorySessionStore()
+            logger.info(f"Using {type(_store).__name__} for session history")
+        return _store
+
+
+def summarize_messages(messages: List[Dict[str, Any]], max_chars: int = 1000) -> str:
+    """Cheap extractive summary: the first line of each older message."""
+    lines = []
+    for message in messages:
+        first_line = message["content"].strip().splitlines()[0] if message["content"].strip() else ""
+        lines.append(f"- {message['role']}: {first_line[:160]}")
+    summary = "\n".join(lines)
+    if len(summary) > max_chars:
+        summary = "...\n" + summary[-max_chars:]
+    return summary
+
+
+def window_history(
+    history: List[Dict[str, Any]],
+    max_turns: int = SESSION_WINDOW_TURNS,
+    max_chars: int = SESSION_WINDOW_CHARS,
+    summarize: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+) -> Dict[str, Any]:
+    """
+    Split history into a summary of older turns and a bounded list of recent turns.
+
+    Recent messages are kept newest-first until either max_turns or the
+    max_chars budget is hit; everything older is handed to the summarizer.
+    """
+    recent: List[Dict[str, Any]] = []
+    used = 0
+    for message in reversed(history):
+        size = len(message["content"])
+        if len(recent) >= max_turns or (recent and used + size > max_chars):
+            break
+        if size > max_chars:
+            # A single oversized turn still has to fit the budget
+            message = dict(message, content=message["content"][:max_chars] + " ...[truncated]")
+            size = max_chars
+        recent.insert(0, message)
+        used += size
+    older = history[:len(history) - len(recent)]
+    summary = (summarize or summarize_messages)(older) if older else ""
+    return {"summary": summary, "recent": recent}
+
+
+def build_contextual_prompt(query: str, history: List[Dict[str, Any]]) -> str:
+    """Prefix the query with a bounded view of the conversation so far."""
+    if not history:
+        return query
+    window = window_history(history)
+    parts = ["Conversation so far:"]
+    if window["summary"]:
+        parts.append("Earlier turns (summarized):\n" + window["summary"])
+    for message in window["recent"]:
+        parts.append(f"{message['role']}: {message['content']}")
+    parts.append(f"\nCurrent request:\n{query}")
+    return "\n\n".join(parts)
+
+
+def prepare_session_query(session_id: Optional[str], query: str) -> str:
+    """Return the prompt to send to the agent for this session turn."""
+    if not session_id:
+        return query
+    try:
+        return build_contextual_prompt(query, get_session_store().get_history(session_id))
+    except Exception as e:
+        logger.warning(f"Could not load history for session {session_id}: {e}")
+        return query
+
+
+def record_session_turn(session_id: Optional[str], query: str, response: Any) -> None:
+    """Persist a completed user/assistant turn for the session."""
+    if not session_id:
+        return
+    try:
+        store = get_session_store()
+        # Stored turns are replayed into later prompts, so keep them compact
+        text, _ = compact_tool_result(response)
+        store.append(session_id, "user", query)
+        store.append(session_id, "assistant", text)
+    except Exception as e:
+        logger.warning(f"Could not record history for session {session_id}: {e}")
@@ -0,0 +1,235 @@
+"""
+Cache tier shared by the worker processes of one server.
+
+In multi-process mode (serve.py) every uvicorn worker would otherwise hold
+its own copy of the swagger spec, session histories and MCP refresh state.
+The serve.py parent process runs a small cache server on a Unix socket and
+the workers talk to it with SharedCacheClient:
+
+- Key/value entries with optional expiry (get / set(ex=, nx=) / delete)
+- The Redis list subset used by RedisSessionStore (rpush, lrange, ltrim,
+  expire), so session histories are shared between workers
+- Values travel as JSON, one request per line
+
+Without SHARED_CACHE_SOCKET (single-process mode) get_shared_cache() returns
+an in-process CacheBackend with the same interface, so callers do not need
+to know how the server is deployed. The backend stores values as JSON, so a
+caller mutating what get() returned never changes the cached entry, exactly
+as in multi-process mode.
+
+Environment variables:
+    SHARED_CACHE_SOCKET   Unix socket of the cache server (set by serve.py)
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Optional
+
+from session_store import LocalRedis
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_SOCKET = os.getenv("SHARED_CACHE_SOCKET", "")
+
+# Operations a client may invoke on the server
+ALLOWED_OPS = {"get", "set", "delete", "rpush", "lrange", "ltrim", "expire", "ping"}
+
+
+class CacheBackend(LocalRedis):
+    """LocalRedis plus expiring key/value entries, stored as serialized JSON."""
+
+    def __init__(self):
+        super().__init__()
+        self._values = {}
+
+    def _purge(self, key: str) -> None:
+        deadline = self._expiry.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._lists.pop(key, None)
+            self._values.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            self._purge(key)
+            raw = self._values.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ex: Optional[float] = None, nx: bool = False) -> bool:
+        """Store a value; with nx=True only if the key does not exist (a lease)."""
+        raw = json.dumps(value)
+        with self._lock:
+            self._sweep()
+            self._purge(key)
+            if nx and key in self._values:
+                return False
+            self._values[key] = raw
+            if ex:
+                self._expiry[key] = time.time() + ex
+            else:
+                self._expiry.pop(key, None)
+            return True
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if key not in self._lists and key not in self._values:
+                return False
+            self._expiry[key] = time.time() + seconds
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                found = self._lists.pop(key, None) is not None
+                found = (self._values.pop(key, None) is not None) or found
+                self._expiry.pop(key, None)
+                removed += found
+            return removed
+
+    def ping(self) -> bool:
+        return True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        backend = self.server.backend
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request["op"]
+                if op not in ALLOWED_OPS:
+                    raise ValueError(f"Unsupported operation '{op}'")
+                response = {"ok": getattr(backend, op)(*request.get("args", []), **request.get("kwargs", {}))}
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def start_cache_server(path: str) -> socketserver.BaseServer:
+    """Serve a CacheBackend on a Unix socket from a background thread."""
+    if os.path.exists(path):
+        os.remove(path)
+    server = _Server(path, _Handler)
+    os.chmod(path, 0o600)
+    server.backend = CacheBackend()
+    threading.Thread(target=server.serve_forever, name="shared-cache", daemon=True).start()
+    logger.info(f"Shared cache listening on {path}")
+    return server
+
+
+class SharedCacheClient:
+    """Client for the cache server; one connection per thread."""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+        return conn
+
+    def _reset(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def _call(self, op: str, *args, **kwargs) -> Any:
+        payload = (json.dumps({"op": op, "args": args, "kwargs": kwargs}) + "\n").encode("utf-8")
+        for attempt in range(2):
+            try:
+                sock, reader = self._connection()
+                sock.sendall(payload)
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("shared cache closed the connection")
+                break
+            except OSError:
+                self._reset()
+                if attempt:
+                    raise
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Shared cache {op} failed: {response['error']}")
+        return response["ok"]
+
+    def get(self, key: str) -> Any:
+        return self._call("get", key)
+
+    def set(self, key: str, value: Any, ex: Optional[float] = None, nx: bool = False) -> bool:
+        return self._call("set", key, value, ex=ex, nx=nx)
+
+    def delete(self, *keys: str) -> int:
+        return self._call("delete", *keys)
+
+    def rpush(self, key: str, *values: str) -> int:
+        return self._call("rpush", key, *values)
+
+    def lrange(self, key: str, start: int, end: int):
+        return self._call("lrange", key, start, end)
+
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        return self._call("ltrim", key, start, end)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        return self._call("expire", key, seconds)
+
+    def ping(self) -> bool:
+        return self._call("ping")
+
+
+_cache: Any = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Cache shared by all workers of this server (in-process when running single-process)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.getenv("SHARED_CACHE_SOCKET", SHARED_CACHE_SOCKET)
+            if path and os.path.exists(path):
+                _cache = SharedCacheClient(path)
+                logger.info(f"Using shared cache at {path}")
+            else:
+                _cache = CacheBackend()
+        return _cache
+
+
+def cached(key: str, ttl: float, compute) -> Any:
+    """Return the shared value for key, computing and storing it on a miss."""
+    cache = get_shared_cache()
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Shared cache read failed for {key}: {e}")
+        return compute()
+    if value is None:
+        value = compute()
+        try:
+            cache.set(key, value, ex=ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+    return value
@@ -0,0 +1,125 @@
+"""
+Background startup and readiness tracking for the agent servers.
+
+Heavy initialization (importing the agent stack, creating the agent, MCP tool
+discovery, AWS credential/secret resolution) runs concurrently on a thread
+pool after the server starts listening. /health answers immediately so the
+container is considered alive; /ready reports 503 until every required
+startup task has finished, so the load balancer only routes traffic to warm
+replicas.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_TIMEOUT_SECONDS", "300"))
+
+
+class Readiness:
+    """Runs named startup tasks in parallel and records their outcome."""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Any] = {}
+        self._required: Dict[str, bool] = {}
+        self._event = threading.Event()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+
+    def start(self, tasks: Dict[str, Callable[[], Any]], optional: tuple = ()) -> None:
+        """
+        Start every task concurrently in background threads.
+
+        Tasks named in `optional` may fail without blocking readiness
+        (e.g. a cache warm-up that has a slower fallback path); readiness is
+        decided by the required tasks alone, so optional ones keep running in
+        the background after the service reports ready.
+        """
+        self._started_at = time.time()
+        for name in tasks:
+            self.tasks[name] = {"status": "running"}
+            self._required[name] = name not in optional
+        if not any(self._required.values()):
+            with self._lock:
+                self._set_ready()
+        if not tasks:
+            return
+        pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="startup")
+        for name, fn in tasks.items():
+            pool.submit(self._run, name, fn)
+        pool.shutdown(wait=False)
+
+    def _run(self, name: str, fn: Callable[[], Any]) -> None:
+        started = time.time()
+        try:
+            self.results[name] = fn()
+            status = {"status": "ok"}
+        except Exception as e:
+            logger.error(f"Startup task '{name}' failed: {e}")
+            status = {"status": "failed", "error": str(e)}
+        status["duration_s"] = round(time.time() - started, 3)
+        with self._lock:
+            self.tasks[name] = status
+            required_done = all(task["status"] != "running" for task_name, task in self.tasks.items()
+                                if self._required[task_name])
+            if required_done and not self._event.is_set():
+                total = round(time.time() - self._started_at, 3)
+                logger.info(f"{self.service} required startup finished in {total}s: {self.tasks}")
+                self._set_ready()
+        logger.info(f"Startup task '{name}' {status['status']} in {status['duration_s']}s")
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._event.is_set() and all(
+                task["status"] == "ok" for name, task in self.tasks.items() if self._required[name])
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            tasks = {name: dict(task) for name, task in self.tasks.items()}
+        return {"service": self.service, "ready": self.ready, "tasks": tasks}
+
+    def _set_ready(self) -> None:
+        # Called with the lock held; wakes every waiting request on its own loop
+        self._event.set()
+        for loop, waiter in self._waiters:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                pass  # the waiting loop has already closed
+        self._waiters.clear()
+
+    async def wait(self, timeout: float = STARTUP_TIMEOUT_SECONDS) -> bool:
+        """Wait (without blocking the event loop or parking a thread) until the required startup tasks finish."""
+        waiter = asyncio.Event()
+        with self._lock:
+            if self._event.is_set():
+                waiter.set()
+            else:
+                self._waiters.append((asyncio.get_running_loop(), waiter))
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters = [(loop, w) for loop, w in self._waiters if w is not waiter]
+        return self.ready
+
+
+def warm_aws_credentials() -> str:
+    """
+    Resolve AWS credentials and build the shared governed Bedrock client off the
+    request path; governed_bedrock_client() callers (the router's fast path) reuse it.
+    """
+    from bedrock_gateway import warm_bedrock_client
+    return "credentials resolved" if warm_bedrock_client() else "no credentials found"
@@ -1,12 +1,27 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import uuid
 import time
 import logging
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from src.agent.supervisor_agent import execute_supervisor_agent_with_retry
+from session_store import prepare_session_query, record_session_turn
+from fast_json import CompressionMiddleware, FastJSONResponse
+from bedrock_gateway import get_bedrock_gateway
+from brd_cache import get_brd_cache
+from change_impact import run_differential
+from endpoint_spec import ENDPOINT_SPEC_TOP_K, get_endpoint_spec
+from mcp_pool import get_mcp_pool
+from mcp_tool_cache import get_mcp_tool_cache, warm_mcp_tools
+from prompt_cache import get_prompt_cache_stats
+from prompt_compaction import compact_tool_result, estimate_tokens, get_compaction_stats
+from query_router import QueryRouter
+from result_history import get_result_history, record_report, warm_result_history
+from case_executor import CaseExecutor, EXECUTOR_MAX_CONCURRENCY, EXECUTOR_PER_HOST_LIMIT, parse_cases
+from swagger_cases import describe_generated, generate_cases, load_swagger
+from startup import Readiness, warm_aws_credentials
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +34,41 @@ app = FastAPI(
     title="Supervisor Agent API",
     description="API for routing tasks to Jira and Test Case Creation agents via the Supervisor Agent",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
+# Large agent results are compressed (br/gzip) when the client accepts it
+app.add_middleware(CompressionMiddleware)
+
+# The agent stack is imported in the background at startup (see load_supervisor_agent)
+execute_supervisor_agent_with_retry = None
+
+readiness = Readiness("supervisor-agent")
+
+# Direct JIRA lookups and small talk are answered without a supervisor run
+query_router = QueryRouter(
+    "API test supervisor", tool_server="jira",
+    capabilities="It reads BRDs from GitHub, works with JIRA issues and generates and runs API test cases.")
+
+
+def load_supervisor_agent():
+    """Import the supervisor agent stack off the critical startup path"""
+    global execute_supervisor_agent_with_retry
+    from src.agent.supervisor_agent import execute_supervisor_agent_with_retry as supervisor_fn
+    execute_supervisor_agent_with_retry = supervisor_fn
+    return "agent stack loaded"
+
+
+@app.on_event("startup")
+async def startup_event():
+    readiness.start({
+        "agent": load_supervisor_agent,
+        "aws_credentials": warm_aws_credentials,
+        "mcp_tools": lambda: warm_mcp_tools(None),
+        "endpoint_spec": get_endpoint_spec,
+        "result_history": warm_result_history,
+    }, optional=("aws_credentials", "mcp_tools", "endpoint_spec", "result_history"))
+
 
 class QueryRequest(BaseModel):
     query: str
@@ -31,22 +79,135 @@ class QueryResponse(BaseModel):
     result: str
     execution_time: float
     session_id: str
+    route: Optional[str] = None
+
+
+class ExecuteRequest(BaseModel):
+    cases: List[Dict[str, Any]]
+    context: Optional[Dict[str, Any]] = None
+    max_concurrency: int = EXECUTOR_MAX_CONCURRENCY
+    per_host_limit: int = EXECUTOR_PER_HOST_LIMIT
+    review_failures: bool = False
+    suite: str = "default"
+
+
+class HistoryResult(BaseModel):
+    id: str
+    name: Optional[str] = None
+    method: str = "GET"
+    url: Optional[str] = None
+    passed: bool
+    skipped: bool = False
+    status_code: Optional[int] = None
+    elapsed_ms: Optional[float] = None
+    error: Optional[str] = None
+    failures: Optional[List[str]] = None
+
+
+class RecordRunRequest(BaseModel):
+    results: List[HistoryResult]
+    suite: str = "default"
+    run_id: Optional[str] = None
+
+
+class SwaggerCasesRequest(BaseModel):
+    bucket: Optional[str] = None
+    key: Optional[str] = None
+    base_url: Optional[str] = None
+    operations: Optional[List[str]] = None
+    auth_case_id: Optional[str] = None
+    auth_headers: Optional[Dict[str, str]] = None
+
+
+class DifferentialRequest(BaseModel):
+    suite: str = "default"
+    bucket: Optional[str] = None
+    key: Optional[str] = None
+    base_url: Optional[str] = None
+    auth_case_id: Optional[str] = None
+    auth_headers: Optional[Dict[str, str]] = None
+    brd_text: Optional[str] = None
+    brd_repo: Optional[str] = None
+    brd_path: Optional[str] = None
+    brd_ref: str = "main"
+    cases: Optional[List[Dict[str, Any]]] = None
+    context: Optional[Dict[str, Any]] = None
+    regenerate_brd: bool = True
+    full: bool = False
+    rerun_failed: bool = True
+    dry_run: bool = False
+    max_concurrency: int = EXECUTOR_MAX_CONCURRENCY
+    per_host_limit: int = EXECUTOR_PER_HOST_LIMIT
+    review_failures: bool = False
+
+
+class SpecSearchRequest(BaseModel):
+    query: str
+    top_k: int = ENDPOINT_SPEC_TOP_K
+
+
+def with_spec_context(query, prompt):
+    """Prefix the prompt with the endpoint spec sections relevant to the query"""
+    spec = get_endpoint_spec()
+    context = spec.relevant_context(query) if spec else ""
+    return f"{context}\n\n{prompt}" if context else prompt
+
+
+def review_failed_cases(failed):
+    """Ask the supervisor agent to analyse only the cases whose assertions failed"""
+    details, _ = compact_tool_result(failed)
+    prompt = (
+        "The following API test cases failed their deterministic assertions. "
+        "For each case, explain the most likely cause and whether it indicates an "
+        "API defect or a wrong test expectation.\n\n" + details
+    )
+    if execute_supervisor_agent_with_retry is None:
+        load_supervisor_agent()
+    return asyncio.run(execute_supervisor_agent_with_retry(prompt, None))
+
+
+def regenerate_brd_cases(sections):
+    """Ask the supervisor agent for business-rule cases covering only the changed BRD sections"""
+    text = "\n\n".join(f"## {heading}\n{body}" for heading, body in sections.items())
+    prompt = (
+        "The following BRD sections changed since the last regression run. Generate business-rule "
+        "API test cases for these sections only, as a JSON array in the case_executor format. "
+        "Give every case a unique \"id\" and a \"brd_sections\" list naming the section headings "
+        "it covers, exactly as written below.\n\n" + text
+    )
+    if execute_supervisor_agent_with_retry is None:
+        load_supervisor_agent()
+    result = asyncio.run(execute_supervisor_agent_with_retry(with_spec_context(text, prompt), None))
+    return parse_cases(str(result))
 
 
 @app.post("/query", response_model=QueryResponse)
 async def supervisor_task(request: QueryRequest):
     start_time = time.time()
     logger.info(f"[API] Received query: {request.query[:100]}... (session: {request.session_id})")
+
+    if not await readiness.wait():
+        raise HTTPException(status_code=503, detail="Supervisor agent is not ready")
     
     try:
         # Log progress
         logger.info(f"[API] Starting supervisor agent execution...")
         
+        # Conversation history comes from the session store as a bounded window;
+        # store access can block on Redis or SQLite, so it runs on the thread pool
+        prompt = await asyncio.get_event_loop().run_in_executor(
+            thread_pool, prepare_session_query, request.session_id, request.query)
+
         # Run the supervisor agent in a thread pool to avoid blocking
-        result = await asyncio.get_event_loop().run_in_executor(
+        result, route = await asyncio.get_event_loop().run_in_executor(
             thread_pool,
-            lambda: asyncio.run(execute_supervisor_agent_with_retry(request.query, request.session_id))
+            lambda: query_router.run(
+                request.query,
+                lambda: asyncio.run(execute_supervisor_agent_with_retry(
+                    with_spec_context(request.query, prompt), request.session_id)))
         )
+        await asyncio.get_event_loop().run_in_executor(
+            thread_pool, record_session_turn, request.session_id, request.query, result)
         
         execution_time = time.time() - start_time
         logger.info(f"[API] Task completed in {execution_time:.2f} seconds")
@@ -54,7 +215,8 @@ async def supervisor_task(request: QueryRequest):
         return QueryResponse(
             result=result,
             execution_time=round(execution_time, 2),
-            session_id=request.session_id
+            session_id=request.session_id,
+            route=route
         )
     except asyncio.TimeoutError:
         execution_time = time.time() - start_time
@@ -69,11 +231,214 @@ async def supervisor_task(request: QueryRequest):
             status_code=500, detail=f"Error processing task: {str(e)}")
 
 
+@app.post("/execute")
+async def execute_test_cases(request: ExecuteRequest):
+    """Run generated test cases locally with concurrency and dependency ordering"""
+    try:
+        executor = CaseExecutor(max_concurrency=request.max_concurrency,
+                                per_host_limit=request.per_host_limit)
+        logger.info(f"[API] Executing {len(request.cases)} test cases "
+                    f"(concurrency: {executor.max_concurrency}, per host: {executor.per_host_limit})")
+        report = await executor.run(
+            request.cases,
+            request.context,
+            review_failures=review_failed_cases if request.review_failures else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"[API] Test run finished: {report['passed']}/{report['total']} passed "
+                f"in {report['duration_s']:.2f} seconds")
+    report["run_id"] = await asyncio.get_event_loop().run_in_executor(
+        thread_pool, lambda: record_report(report, request.suite, request.cases))
+    return report
+
+
+@app.post("/cases/swagger")
+async def swagger_cases(request: SwaggerCasesRequest):
+    """Generate boilerplate negative cases straight from the swagger, without an LLM call"""
+    start_time = time.time()
+    try:
+        spec = await asyncio.get_event_loop().run_in_executor(
+            thread_pool, lambda: load_swagger(request.bucket, request.key))
+        cases = generate_cases(
+            spec,
+            url=request.base_url,
+            auth_headers=request.auth_headers,
+            auth_case_id=request.auth_case_id,
+            operations=request.operations,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[API] Swagger case generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating cases: {str(e)}")
+    return {
+        "cases": cases,
+        "count": len(cases),
+        "prompt_note": describe_generated(cases),
+        "execution_time": round(time.time() - start_time, 2),
+    }
+
+
+@app.post("/cases/differential")
+async def differential_cases(request: DifferentialRequest):
+    """Regenerate and run only the cases affected by swagger/BRD changes since the suite's last run"""
+    loop = asyncio.get_event_loop()
+    try:
+        spec = await loop.run_in_executor(thread_pool, lambda: load_swagger(request.bucket, request.key))
+        brd_text = request.brd_text
+        if brd_text is None and request.brd_repo and request.brd_path:
+            brd = await loop.run_in_executor(
+                thread_pool,
+                lambda: get_brd_cache().get_text(request.brd_repo, request.brd_path, request.brd_ref))
+            brd_text = brd["text"]
+        executor = CaseExecutor(max_concurrency=request.max_concurrency,
+                                per_host_limit=request.per_host_limit)
+        report = await run_differential(
+            executor,
+            request.suite,
+            spec,
+            brd_text=brd_text,
+            cases=request.cases,
+            generate_options={"url": request.base_url, "auth_headers": request.auth_headers,
+                              "auth_case_id": request.auth_case_id},
+            regenerate_brd=regenerate_brd_cases if request.regenerate_brd else None,
+            context=request.context,
+            review_failures=review_failed_cases if request.review_failures else None,
+            full=request.full,
+            rerun_failed=request.rerun_failed,
+            dry_run=request.dry_run,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[API] Differential run failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error in differential run: {str(e)}")
+    plan = report["plan"]
+    logger.info(f"[API] Differential run '{request.suite}': {len(plan['affected'])} affected of "
+                f"{plan['total_cases']} cases (full run: {plan['full_run']})")
+    if not request.dry_run:
+        # Reused results were recorded by the run that produced them
+        report["run_id"] = await loop.run_in_executor(
+            thread_pool, lambda: record_report(report, request.suite, request.cases))
+    return report
+
+
+@app.post("/history/runs")
+async def record_history_run(request: RecordRunRequest):
+    """Record results produced outside this server (e.g. Postman runs) in the case_executor result format"""
+    try:
+        run_id = await asyncio.get_event_loop().run_in_executor(
+            thread_pool,
+            lambda: get_result_history().record(
+                {"results": [result.model_dump(exclude_none=True) for result in request.results]},
+                request.suite, request.run_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"run_id": run_id, "recorded": len(request.results)}
+
+
+async def query_history(query):
+    try:
+        return await asyncio.get_event_loop().run_in_executor(thread_pool, query)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/history/pass-rate")
+async def history_pass_rate(endpoint: Optional[str] = None, suite: Optional[str] = None,
+                            days: float = 30, bucket: str = "1D"):
+    """Pass rate per endpoint and time bucket"""
+    return await query_history(lambda: get_result_history().pass_rate_trend(endpoint, suite, days, bucket))
+
+
+@app.get("/history/latency")
+async def history_latency(endpoint: Optional[str] = None, suite: Optional[str] = None,
+                          days: float = 30, bucket: str = "1D"):
+    """Latency percentiles per endpoint and time bucket"""
+    return await query_history(lambda: get_result_history().latency_trend(endpoint, suite, days, bucket))
+
+
+@app.get("/history/flaky")
+async def history_flaky(suite: Optional[str] = None, days: float = 30, min_runs: int = 3):
+    """Cases whose outcome flips between runs"""
+    return await query_history(lambda: get_result_history().flaky_cases(suite, days, min_runs))
+
+
+@app.get("/history/regressions")
+async def history_regressions(suite: Optional[str] = None, recent_days: float = 1,
+                              baseline_days: float = 14, threshold: float = 1.5):
+    """Endpoints whose recent median latency regressed against the baseline"""
+    return await query_history(lambda: get_result_history().latency_regressions(
+        suite, recent_days, baseline_days, threshold))
+
+
+@app.post("/spec/search")
+async def spec_search(request: SpecSearchRequest):
+    """Endpoint spec sections relevant to a task, as indexed entries and prompt text"""
+    spec = await asyncio.get_event_loop().run_in_executor(thread_pool, get_endpoint_spec)
+    if spec is None:
+        raise HTTPException(status_code=404, detail="No endpoint specification document found")
+    matches = spec.search(request.query, request.top_k)
+    context = spec.relevant_context(request.query, request.top_k)
+    return {
+        "matches": [
+            {"id": entry["id"], "title": entry["title"], "method": entry["method"],
+             "path": entry["path"], "score": score}
+            for entry, score in matches
+        ],
+        "prompt": context,
+        "prompt_tokens": estimate_tokens(context),
+        "document_tokens": spec.index["source_tokens"],
+    }
+
+
 @app.get("/health")
 def health():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/ready")
+def ready():
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/metrics/compaction")
+def compaction_metrics():
+    return get_compaction_stats()
+
+
+@app.get("/metrics/mcp-tools")
+def mcp_tool_metrics():
+    return get_mcp_tool_cache().status()
+
+
+@app.get("/metrics/mcp-pool")
+def mcp_pool_metrics():
+    return get_mcp_pool().metrics()
+
+
+@app.get("/metrics/bedrock")
+def bedrock_metrics():
+    return get_bedrock_gateway().metrics()
+
+
+@app.get("/metrics/prompt-cache")
+def prompt_cache_metrics():
+    return get_prompt_cache_stats()
+
+
+@app.get("/metrics/routing")
+def routing_metrics():
+    return query_router.metrics()
+
+
+@app.get("/metrics/result-history")
+async def result_history_metrics():
+    return await query_history(lambda: get_result_history().summary())
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("supervisor_agent_server:app",
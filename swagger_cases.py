@@ -0,0 +1,299 @@
+"""
+Swagger-driven generation of boilerplate negative test cases.
+
+Cases that follow mechanically from the API description do not need an LLM
+round-trip. This module walks a Swagger 2.0 / OpenAPI 3.x document and emits,
+per operation:
+
+- missing authentication (for secured operations)
+- each required query/header parameter missing
+- each required body field missing
+- each body field sent with the wrong JSON type
+- each enum field sent with an out-of-range value
+
+The cases use the case_executor format with compiled assertions, so they can
+be executed directly. Only business-rule cases derived from the BRD are left
+for the LLM; describe_generated() produces a short summary to tell it which
+cases already exist.
+"""
+
+import copy
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from shared_cache import cached
+
+logger = logging.getLogger(__name__)
+
+SWAGGER_CACHE_TTL = float(os.getenv("SWAGGER_CACHE_TTL", "300"))
+HTTP_METHODS = ("get", "post", "put", "patch", "delete")
+VALIDATION_STATUSES = [400, 422]
+AUTH_STATUSES = [401, 403]
+DEFAULT_AUTH_HEADERS = {"Authorization": "Bearer {{token}}"}
+
+_WRONG_TYPE_VALUES = {
+    "string": 12345,
+    "integer": "not-a-number",
+    "number": "not-a-number",
+    "boolean": "not-a-boolean",
+    "array": "not-an-array",
+    "object": "not-an-object",
+}
+_FORMAT_SAMPLES = {
+    "date-time": "2024-01-01T00:00:00Z",
+    "date": "2024-01-01",
+    "email": "qa@example.com",
+    "uuid": "00000000-0000-4000-8000-000000000000",
+    "uri": "https://example.com",
+}
+
+
+def load_swagger(bucket: Optional[str] = None, key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load the swagger document from S3 (S3_SWAGGER_BUCKET / S3_SWAGGER_KEY by default).
+
+    The parsed document is kept in the shared worker cache for SWAGGER_CACHE_TTL seconds.
+    """
+    bucket = bucket or os.getenv("S3_SWAGGER_BUCKET")
+    key = key or os.getenv("S3_SWAGGER_KEY")
+    if not bucket or not key:
+        raise ValueError("S3_SWAGGER_BUCKET and S3_SWAGGER_KEY must be set")
+
+    def fetch() -> Dict[str, Any]:
+        import boto3
+        s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-west-2"))
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"].read().decode("utf-8")
+        return parse_swagger(body)
+
+    return cached(f"swagger:{bucket}/{key}", SWAGGER_CACHE_TTL, fetch)
+
+
+def parse_swagger(text: str) -> Dict[str, Any]:
+    """Parse a swagger document from JSON or YAML text."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        import yaml
+        return yaml.safe_load(text)
+
+
+def _resolve_ref(spec: Dict[str, Any], ref: str) -> Dict[str, Any]:
+    if not ref.startswith("#/"):
+        raise ValueError(f"Only local $ref values are supported, got '{ref}'")
+    node: Any = spec
+    for part in ref[2:].split("/"):
+        node = node[part.replace("~1", "/").replace("~0", "~")]
+    return node
+
+
+def deref(spec: Dict[str, Any], node: Any, seen: Optional[frozenset] = None) -> Any:
+    """Inline local $ref values, stopping at recursive references."""
+    seen = seen or frozenset()
+    if isinstance(node, dict):
+        if "$ref" in node:
+            ref = node["$ref"]
+            if ref in seen:
+                return {"type": "object"}
+            return deref(spec, _resolve_ref(spec, ref), seen | {ref})
+        if "allOf" in node:
+            merged: Dict[str, Any] = {"type": "object", "properties": {}, "required": []}
+            for part in node["allOf"]:
+                part = deref(spec, part, seen)
+                merged["properties"].update(part.get("properties", {}))
+                merged["required"].extend(part.get("required", []))
+            return merged
+        return {k: deref(spec, v, seen) for k, v in node.items()}
+    if isinstance(node, list):
+        return [deref(spec, v, seen) for v in node]
+    return node
+
+
+def sample_value(schema: Dict[str, Any]) -> Any:
+    """Build a valid-looking value for a schema."""
+    for key in ("example", "default"):
+        if key in schema:
+            return copy.deepcopy(schema[key])
+    if schema.get("enum"):
+        return schema["enum"][0]
+    schema_type = schema.get("type") or ("object" if "properties" in schema else "string")
+    if schema_type == "object":
+        return {name: sample_value(prop) for name, prop in (schema.get("properties") or {}).items()}
+    if schema_type == "array":
+        return [sample_value(schema.get("items") or {})]
+    if schema_type == "integer":
+        return int(schema.get("minimum", 1))
+    if schema_type == "number":
+        return float(schema.get("minimum", 1.5))
+    if schema_type == "boolean":
+        return True
+    return _FORMAT_SAMPLES.get(schema.get("format"), "string")
+
+
+def base_url(spec: Dict[str, Any]) -> str:
+    """Derive the API base URL from servers (OpenAPI 3) or host/basePath (Swagger 2)."""
+    if spec.get("servers"):
+        return spec["servers"][0]["url"].rstrip("/")
+    scheme = (spec.get("schemes") or ["https"])[0]
+    host = spec.get("host", "")
+    return f"{scheme}://{host}{spec.get('basePath', '')}".rstrip("/")
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _operation_parts(spec: Dict[str, Any], path_item: Dict[str, Any],
+                     operation: Dict[str, Any]) -> Dict[str, Any]:
+    # An operation parameter overrides a path-level one with the same (name, in)
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for p in path_item.get("parameters", []) + operation.get("parameters", []):
+        p = deref(spec, p)
+        merged[(p.get("name"), p.get("in"))] = p
+    params = list(merged.values())
+    body_schema = None
+    for p in params:
+        if p.get("in") == "body":
+            body_schema = p.get("schema") or {}
+    request_body = deref(spec, operation.get("requestBody") or {})
+    content = request_body.get("content") or {}
+    if content:
+        media = content.get("application/json") or next(iter(content.values()))
+        body_schema = media.get("schema") or {}
+    return {
+        "params": [p for p in params if p.get("in") in ("query", "path", "header")],
+        "body": body_schema,
+    }
+
+
+def _param_value(param: Dict[str, Any]) -> Any:
+    return sample_value(param.get("schema") or param)
+
+
+def generate_cases(
+    spec: Dict[str, Any],
+    url: Optional[str] = None,
+    auth_headers: Optional[Dict[str, str]] = None,
+    auth_case_id: Optional[str] = None,
+    operations: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Generate negative test cases for every operation in a swagger document.
+
+    Args:
+        spec: Parsed swagger / OpenAPI document
+        url: Base URL override (defaults to the one declared in the spec)
+        auth_headers: Headers that authenticate a request; may use {{token}}
+        auth_case_id: Id of the auth case the generated cases depend on
+        operations: Optional path substrings; only matching paths are used
+
+    Returns:
+        Test cases in case_executor format
+    """
+    root = (url or base_url(spec)).rstrip("/")
+    auth_headers = auth_headers if auth_headers is not None else DEFAULT_AUTH_HEADERS
+    global_security = spec.get("security")
+    cases: List[Dict[str, Any]] = []
+    # Slugs can collide (/a/{id} vs /a/id, x_api vs x-api); ids must stay unique
+    used_ids: set = set()
+
+    for path, path_item in (spec.get("paths") or {}).items():
+        if operations and not any(op in path for op in operations):
+            continue
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if not operation:
+                continue
+            parts = _operation_parts(spec, path_item, operation)
+            op_id = f"{method}-{_slug(path)}"
+            secured = bool(operation.get("security", global_security))
+
+            path_values = {p["name"]: _param_value(p) for p in parts["params"] if p["in"] == "path"}
+            query = {p["name"]: _param_value(p) for p in parts["params"]
+                     if p["in"] == "query" and p.get("required")}
+            headers = {p["name"]: str(_param_value(p)) for p in parts["params"]
+                       if p["in"] == "header" and p.get("required")}
+            body_schema = parts["body"]
+            body = sample_value(body_schema) if body_schema is not None else None
+            full_url = root + re.sub(r"\{(\w+)\}", lambda m: str(path_values.get(m.group(1), "1")), path)
+
+            def case(suffix: str, description: str, statuses: List[int], *,
+                     case_headers: Optional[Dict[str, str]] = None,
+                     case_query: Optional[Dict[str, Any]] = None,
+                     case_body: Any = body, authenticated: bool = True) -> Dict[str, Any]:
+                merged_headers = dict(auth_headers if (secured and authenticated) else {})
+                merged_headers.update(headers if case_headers is None else case_headers)
+                base_id = f"{op_id}-{suffix}"
+                case_id, count = base_id, 2
+                while case_id in used_ids:
+                    case_id, count = f"{base_id}-{count}", count + 1
+                used_ids.add(case_id)
+                generated = {
+                    "id": case_id,
+                    "name": f"{method.upper()} {path}: {description}",
+                    "method": method.upper(),
+                    "url": full_url,
+                    "headers": merged_headers,
+                    "params": query if case_query is None else case_query,
+                    "assertions": [{"path": "$status", "op": "in", "value": statuses,
+                                    "description": description}],
+                    "source": "swagger",
+                }
+                if case_body is not None:
+                    generated["json"] = case_body
+                if auth_case_id and secured and authenticated:
+                    generated["depends_on"] = [auth_case_id]
+                return generated
+
+            if secured:
+                cases.append(case("missing-auth", "request without authentication is rejected",
+                                  AUTH_STATUSES, authenticated=False))
+
+            for param in parts["params"]:
+                if not param.get("required") or param["in"] == "path":
+                    continue
+                name = param["name"]
+                if param["in"] == "query":
+                    reduced = {k: v for k, v in query.items() if k != name}
+                    cases.append(case(f"missing-query-{_slug(name)}", f"missing required query parameter '{name}'",
+                                      VALIDATION_STATUSES, case_query=reduced))
+                else:
+                    reduced = {k: v for k, v in headers.items() if k != name}
+                    cases.append(case(f"missing-header-{_slug(name)}", f"missing required header '{name}'",
+                                      VALIDATION_STATUSES, case_headers=reduced))
+
+            # Array bodies (e.g. bulk sort-override updates) are mutated through their first item
+            item_schema, item, wrap = body_schema, body, (lambda mutated: mutated)
+            if isinstance(body, list) and body and body_schema and body_schema.get("items"):
+                item_schema, item = body_schema["items"], body[0]
+                wrap = lambda mutated: [mutated] + body[1:]  # noqa: E731
+
+            if isinstance(item, dict) and item_schema:
+                properties = item_schema.get("properties") or {}
+                for name in item_schema.get("required") or []:
+                    reduced = {k: v for k, v in item.items() if k != name}
+                    cases.append(case(f"missing-field-{_slug(name)}", f"missing required field '{name}'",
+                                      VALIDATION_STATUSES, case_body=wrap(reduced)))
+                for name, prop in properties.items():
+                    prop_type = prop.get("type")
+                    if prop_type in _WRONG_TYPE_VALUES:
+                        cases.append(case(f"wrong-type-{_slug(name)}", f"field '{name}' with wrong type",
+                                          VALIDATION_STATUSES,
+                                          case_body=wrap(dict(item, **{name: _WRONG_TYPE_VALUES[prop_type]}))))
+                    if prop.get("enum"):
+                        cases.append(case(f"invalid-enum-{_slug(name)}", f"field '{name}' outside its enum",
+                                          VALIDATION_STATUSES,
+                                          case_body=wrap(dict(item, **{name: "__INVALID_ENUM_VALUE__"}))))
+
+    logger.info(f"Generated {len(cases)} swagger-derived test cases")
+    return cases
+
+
+def describe_generated(cases: List[Dict[str, Any]]) -> str:
+    """Compact summary of generated cases for the LLM prompt, so it skips them."""
+    lines = ["The following negative cases are already generated from the swagger; "
+             "do not generate them again, only add business-rule cases from the BRD:"]
+    lines.extend(f"- {c['name']}" for c in cases)
+    return "\n".join(lines)